@@ -3,24 +3,196 @@ AI-Enabled Smart Grid Cybersecurity Framework
 Backend Application - Chunks 0, 1, 2
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import random
 import logging
-from datetime import datetime
+import logging.handlers
+import atexit
+import bisect
+import queue
+from collections import Counter, OrderedDict, deque
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, is_dataclass
+from enum import Enum
+from datetime import datetime, timedelta, timezone
 import json
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import math
+import mmap
+import operator
 import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow exports are optional
+    pa = None
+    pq = None
+
+try:
+    import orjson
+except ImportError:  # Fast JSON codecs are optional; the stdlib json module is the fallback
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 app = Flask(__name__)
 CORS(app)
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+LOG_MODE = os.environ.get('LOG_MODE', 'standard')  # standard | structured (JSON via a queue)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+DIAG_LOG_LEVEL = os.environ.get('DIAG_LOG_LEVEL', 'INFO')  # Per-event agent diagnostics
+DIAG_SAMPLE_RATE = int(os.environ.get('DIAG_SAMPLE_RATE', 1))  # Log 1 in N normal events
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # Structured mode only
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_STANDARD_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class EventSamplingFilter(logging.Filter):
+    """Keep every anomalous event's diagnostics and 1 in `rate` of the normal ones
+    
+    Records carrying an `event_key` are sampled by its hash, so all
+    pipeline stages of one event are kept or dropped together. Stages that
+    run before detection cannot know the verdict, so an unsampled event's
+    records are held (per thread, current event only) and released if a
+    later stage marks the same event key as an anomaly.
+    """
+    
+    MAX_HELD = 16  # Held records per thread (one event's pipeline stages)
+    
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._counter = itertools.count(1)
+        self._pending = threading.local()
+    
+    def filter(self, record):
+        if self.rate <= 1 or getattr(record, "released", False):
+            return True
+        event_key = getattr(record, "event_key", None)
+        if event_key is None:
+            return getattr(record, "is_anomaly", False) or next(self._counter) % self.rate == 0
+        if zlib.crc32(event_key.encode('utf-8')) % self.rate == 0:
+            return True
+        
+        pending = self._pending
+        if getattr(pending, "key", None) != event_key:
+            pending.key, pending.records, pending.kept = event_key, [], False
+        if pending.kept:
+            return True
+        if not getattr(record, "is_anomaly", False):
+            if len(pending.records) < self.MAX_HELD:
+                pending.records.append(record)
+            return False
+        
+        # Anomaly verdict: release the event's earlier stages ahead of this record
+        held, pending.records, pending.kept = pending.records, [], True
+        for earlier in held:
+            earlier.released = True
+            logging.getLogger(earlier.name).handle(earlier)
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render records as one JSON object per line, including `extra` fields"""
+    
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Non-blocking queue handler: formatting is deferred to the listener thread
+    and records are dropped (and counted) when the queue is full"""
+    
+    dropped = 0
+    
+    def prepare(self, record):
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def configure_logging():
+    """Set up root logging and the sampled per-event diagnostics logger"""
+    if LOG_MODE == "structured":
+        output = logging.StreamHandler()
+        output.setFormatter(StructuredFormatter())
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logging.basicConfig(level=LOG_LEVEL, handlers=[DroppingQueueHandler(log_queue)])
+    else:
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+    
+    diagnostics = logging.getLogger(__name__ + ".events")
+    diagnostics.setLevel(DIAG_LOG_LEVEL)
+    diagnostics.addFilter(EventSamplingFilter(DIAG_SAMPLE_RATE))
+    return diagnostics
+
+
+diag_logger = configure_logging()
 logger = logging.getLogger(__name__)
 
+
+def log_event_diag(message, *args, event=None, is_anomaly=False, **fields):
+    """Emit a lazily formatted, sampled per-event diagnostic
+    
+    Nothing is formatted (and no `extra` dict is built) unless the
+    diagnostics logger is enabled for INFO.
+    """
+    if not diag_logger.isEnabledFor(logging.INFO):
+        return
+    extra = fields
+    if event is not None:
+        extra["component"] = event["component"]
+        extra["event_key"] = f"{event['timestamp']}|{event['component']}"
+    extra["is_anomaly"] = is_anomaly
+    diag_logger.info(message, *args, extra=extra)
+
 # ========================================================
 # GLOBAL STATE & CONFIGURATION
 # ========================================================
@@ -28,19 +200,438 @@ logger = logging.getLogger(__name__)
 # Thresholds for anomaly detection
 VOLTAGE_THRESHOLD = 15.0  # Voltage deviation threshold in volts
 LATENCY_THRESHOLD = 50.0  # Network latency threshold in ms
+FREQUENCY_THRESHOLD = 0.5  # Frequency deviation threshold in Hz
 
 # Baseline values
 BASELINE_VOLTAGE = 230.0  # Volts
 BASELINE_LATENCY = 20.0   # Milliseconds
+BASELINE_FREQUENCY = 50.0  # Hz
 
-# Event history storage
-event_history = []
-metrics = {
-    "total_events": 0,
-    "total_anomalies": 0,
-    "detection_rate": 0.0
+# Adaptive per-component envelopes (learned online from normal readings)
+# Envelopes are per worker process, so they are off by default for multi-worker deployments
+ADAPTIVE_ENVELOPES = os.environ.get('ADAPTIVE_ENVELOPES', '0') == '1'
+ENVELOPE_ALPHA = float(os.environ.get('ENVELOPE_ALPHA', 0.01))  # EWMA weight of a new reading
+ENVELOPE_MIN_SAMPLES = int(os.environ.get('ENVELOPE_MIN_SAMPLES', 30))  # Warm-up before adapting
+ENVELOPE_SIGMA = float(os.environ.get('ENVELOPE_SIGMA', 4.0))  # Threshold in standard deviations
+ENVELOPE_QUANTILE = float(os.environ.get('ENVELOPE_QUANTILE', 0.999))  # Tracked quantile of |deviation|
+ENVELOPE_MIN_VOLTAGE_THRESHOLD = float(os.environ.get('ENVELOPE_MIN_VOLTAGE_THRESHOLD', 5.0))  # Volts
+ENVELOPE_MIN_LATENCY_THRESHOLD = float(os.environ.get('ENVELOPE_MIN_LATENCY_THRESHOLD', 20.0))  # ms
+ENVELOPE_MAX_COMPONENTS = int(os.environ.get('ENVELOPE_MAX_COMPONENTS', 100000))
+
+# Stateful per-component checks (drift, N-of-M persistence, flapping, frequency)
+TEMPORAL_DETECTION = os.environ.get('TEMPORAL_DETECTION', '1') == '1'
+TEMPORAL_DRIFT_SLACK = float(os.environ.get('TEMPORAL_DRIFT_SLACK', 5.0))  # CUSUM allowance: volts of offset ignored
+TEMPORAL_DRIFT_THRESHOLD = float(os.environ.get('TEMPORAL_DRIFT_THRESHOLD', 50.0))  # CUSUM alarm: summed excess volts
+PERSISTENT_ALERTS_ONLY = os.environ.get('PERSISTENT_ALERTS_ONLY', '0') == '1'  # Suppress non-persistent anomalies
+PERSISTENCE_WINDOW = int(os.environ.get('PERSISTENCE_WINDOW', 10))  # M most recent readings per component
+PERSISTENCE_MIN = int(os.environ.get('PERSISTENCE_MIN', 3))  # N anomalies within M make one persistent
+FLAPPING_MIN_TRANSITIONS = int(os.environ.get('FLAPPING_MIN_TRANSITIONS', 4))  # Normal/anomalous flips within M
+TEMPORAL_MAX_COMPONENTS = int(os.environ.get('TEMPORAL_MAX_COMPONENTS', 100000))
+
+# Learned anomaly scoring (the model file is written offline by train_scorer.py)
+ML_SCORING = os.environ.get('ML_SCORING', '1') == '1'  # Score readings whenever a trained model exists
+ML_MODEL_PATH = os.environ.get('ML_MODEL_PATH', 'anomaly_model.npz')
+ML_SCORE_THRESHOLD = (float(os.environ['ML_SCORE_THRESHOLD'])  # Unset = the model's calibrated threshold
+                      if os.environ.get('ML_SCORE_THRESHOLD') else None)
+ML_BATCH_MAX = int(os.environ.get('ML_BATCH_MAX', 256))  # Single readings scored together across requests
+ML_BATCH_WAIT = float(os.environ.get('ML_BATCH_WAIT', 0.001))  # Longest a batch waits to fill (0 = score what is queued)
+
+# JSON codec for log lines, history payloads and responses: auto | orjson | msgspec | json
+JSON_SERIALIZER = os.environ.get('JSON_SERIALIZER', 'auto')
+
+# Severity codes: 2 * voltage_anomaly + latency_anomaly indexes both tables
+SEVERITY_LEVELS = ("NORMAL", "MEDIUM", "HIGH", "CRITICAL")
+ALERT_TYPES = ("No Anomaly", "Latency Anomaly", "Voltage Anomaly", "Voltage & Latency Anomaly")
+
+# Event log storage (segmented JSONL with a sidecar offset index)
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR', 'event_logs')
+EVENT_LOG_SEGMENT_BYTES = int(os.environ.get('EVENT_LOG_SEGMENT_BYTES', 64 * 1024 * 1024))
+EVENT_LOG_SEGMENT_SECONDS = int(os.environ.get('EVENT_LOG_SEGMENT_SECONDS', 24 * 3600))
+EVENT_LOG_MAX_SEGMENTS = int(os.environ.get('EVENT_LOG_MAX_SEGMENTS', 0)) or None  # None = keep all
+
+# Event store backend: "segments" (indexed JSONL) or "sqlite" (indexed, monthly partitions)
+EVENT_STORE = os.environ.get('EVENT_STORE', 'segments')
+EVENT_STORE_DIR = os.environ.get('EVENT_STORE_DIR', 'event_store')
+
+# Background log writer (group commit off the request thread)
+EVENT_LOG_ASYNC = os.environ.get('EVENT_LOG_ASYNC', '1') == '1'
+EVENT_LOG_FLUSH_BATCH = int(os.environ.get('EVENT_LOG_FLUSH_BATCH', 512))
+EVENT_LOG_FLUSH_INTERVAL = float(os.environ.get('EVENT_LOG_FLUSH_INTERVAL', 0.2))  # Seconds
+EVENT_LOG_FSYNC = os.environ.get('EVENT_LOG_FSYNC', 'interval')  # never | interval | batch
+EVENT_LOG_FSYNC_INTERVAL = float(os.environ.get('EVENT_LOG_FSYNC_INTERVAL', 1.0))  # Seconds
+EVENT_LOG_READ_WAIT = float(os.environ.get('EVENT_LOG_READ_WAIT', 0.05))  # Max seconds a read waits for queued writes
+
+# Bulk ingestion limits
+MAX_INGEST_BATCH = 10000  # Maximum readings accepted per /ingest request
+MAX_INGEST_BYTES = int(os.environ.get('MAX_INGEST_BYTES', 8 * 1024 * 1024))  # Maximum request body size
+MAX_SIMULATE_BATCH = 10000  # Maximum events generated per /simulate?count=N request
+app.config['MAX_CONTENT_LENGTH'] = MAX_INGEST_BYTES  # Larger bodies get 413 before they are read
+
+# Shared metrics and event history (consistent across gunicorn workers)
+METRICS_BACKEND = os.environ.get('METRICS_BACKEND', 'mmap')  # mmap | sqlite | local
+METRICS_STATE_DIR = os.environ.get('METRICS_STATE_DIR', 'grid_state')
+HISTORY_CAPACITY = int(os.environ.get('HISTORY_CAPACITY', 100))  # Events kept for /history
+HISTORY_SLOT_BYTES = int(os.environ.get('HISTORY_SLOT_BYTES', 2048))  # mmap backend slot size
+
+# Sliding windows for /metrics/windows: name -> (window seconds, bucket seconds)
+METRIC_WINDOWS = {
+    "1m": (60, 1),
+    "5m": (300, 5),
+    "1h": (3600, 60)
+}
+
+# Alert coalescing (/incidents): alerts of one component and alert type that
+# arrive less than INCIDENT_WINDOW seconds apart form one incident
+ALERT_MODE = os.environ.get('ALERT_MODE', 'events')  # events | incidents (log/history/stream one alert per incident)
+INCIDENT_WINDOW = float(os.environ.get('INCIDENT_WINDOW', 60.0))  # Seconds of quiet that close an incident
+INCIDENT_RAW_EVENTS = os.environ.get('INCIDENT_RAW_EVENTS', '0') == '1'  # incidents mode: still log every sample
+INCIDENT_MAX_OPEN = int(os.environ.get('INCIDENT_MAX_OPEN', 100000))  # Per worker; the stalest is closed first
+INCIDENT_HISTORY = int(os.environ.get('INCIDENT_HISTORY', 1000))  # Closed incidents kept per worker
+INCIDENT_LOG = os.environ.get('INCIDENT_LOG', 'incidents.jsonl')  # Closed incidents are appended here ('' = off)
+
+# Prometheus stage timings and event counters (/metrics/prometheus)
+PROMETHEUS_ENABLED = os.environ.get('PROMETHEUS_ENABLED', '1') == '1'
+PROMETHEUS_FLUSH_INTERVAL = float(os.environ.get('PROMETHEUS_FLUSH_INTERVAL', 5.0))  # Seconds, per worker
+PROMETHEUS_MAX_COMPONENTS = int(os.environ.get('PROMETHEUS_MAX_COMPONENTS', 1000))  # Label cardinality cap
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)  # Seconds
+
+# Response cache for polled endpoints (/metrics, /history, /logs)
+RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE', '1') == '1'
+RESPONSE_CACHE_ENTRIES = int(os.environ.get('RESPONSE_CACHE_ENTRIES', 256))  # Per worker
+RESPONSE_CACHE_MAX_BODY = int(os.environ.get('RESPONSE_CACHE_MAX_BODY', 1024 * 1024))  # Larger bodies only get an ETag
+
+# Live detection stream (/stream)
+STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL', 0.25))  # Seconds
+STREAM_KEEPALIVE_INTERVAL = float(os.environ.get('STREAM_KEEPALIVE_INTERVAL', 15.0))  # Seconds
+STREAM_CLIENT_BUFFER = int(os.environ.get('STREAM_CLIENT_BUFFER', 256))  # Events queued per client
+STREAM_MAX_SUBSCRIBERS = int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 500))  # Per worker
+STREAM_RING_CAPACITY = int(os.environ.get('STREAM_RING_CAPACITY', 10000))  # Shared ring the stream follows; >= largest batch
+
+# Cascade prediction (/cascade-predict)
+CASCADE_MAX_NODES = int(os.environ.get('CASCADE_MAX_NODES', 200000))
+CASCADE_MAX_EDGES = int(os.environ.get('CASCADE_MAX_EDGES', 1000000))
+CASCADE_MAX_STEPS = int(os.environ.get('CASCADE_MAX_STEPS', 100))  # Propagation waves per prediction
+CASCADE_MAX_TOPOLOGIES = int(os.environ.get('CASCADE_MAX_TOPOLOGIES', 16))  # Compiled topologies kept per worker
+CASCADE_DEFAULT_LOADING = float(os.environ.get('CASCADE_DEFAULT_LOADING', 0.6))  # Load/capacity of nodes given no load
+CASCADE_MIN_SEVERITY = os.environ.get('CASCADE_MIN_SEVERITY', 'HIGH')  # Anomalies at or above this fail a component
+CASCADE_RISK_UTILIZATION = float(os.environ.get('CASCADE_RISK_UTILIZATION', 0.9))  # Survivors reported as at risk
+
+# Threat modeling (/threat-model)
+THREAT_MODEL_ENABLED = os.environ.get('THREAT_MODEL_ENABLED', '1') == '1'  # Match live detections
+THREAT_HISTORY = int(os.environ.get('THREAT_HISTORY', 1000))  # Recent threats kept per worker
+THREAT_MAX_ANALYZE_EVENTS = int(os.environ.get('THREAT_MAX_ANALYZE_EVENTS', 1000000))  # Per POST analysis
+
+# Attack patterns: ordered steps, each matching an anomaly `kind` ("voltage",
+# "latency" or "any") at or above `min_severity` (default MEDIUM) on a
+# component related to the previous step's: "same", "adjacent" in the grid
+# topology, "other" or "any". All steps must fall within `window_seconds`.
+ATTACK_PATTERNS = {
+    "recon_then_injection": {
+        "description": "Latency spike followed by a voltage deviation on an adjacent component",
+        "severity": "HIGH",
+        "window_seconds": 60,
+        "steps": [
+            {"kind": "latency"},
+            {"kind": "voltage", "relation": "adjacent"}
+        ]
+    },
+    "lateral_voltage_manipulation": {
+        "description": "Voltage deviations spreading across three adjacent components",
+        "severity": "CRITICAL",
+        "window_seconds": 120,
+        "steps": [
+            {"kind": "voltage"},
+            {"kind": "voltage", "relation": "adjacent"},
+            {"kind": "voltage", "relation": "adjacent"}
+        ]
+    },
+    "comms_degradation_escalation": {
+        "description": "Repeated latency anomalies on one component escalating to a critical anomaly",
+        "severity": "HIGH",
+        "window_seconds": 300,
+        "steps": [
+            {"kind": "latency"},
+            {"kind": "latency", "relation": "same"},
+            {"kind": "any", "min_severity": "CRITICAL", "relation": "same"}
+        ]
+    },
+    "coordinated_critical": {
+        "description": "Critical anomalies on two different components within seconds",
+        "severity": "CRITICAL",
+        "window_seconds": 10,
+        "steps": [
+            {"kind": "any", "min_severity": "CRITICAL"},
+            {"kind": "any", "min_severity": "CRITICAL", "relation": "other"}
+        ]
+    }
 }
 
+# ========================================================
+# JSON SERIALIZATION
+# ========================================================
+
+def _json_default(obj):
+    """Serialize event records and NumPy scalars that reach a payload"""
+    if is_dataclass(obj):
+        return {name: getattr(obj, name) for name in obj.__slots__}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_float(value):
+    """Format a float as orjson and msgspec do: null for NaN and infinities,
+    plain decimals down to 1e-5, and exponents without '+' or zero padding"""
+    if value != value or value in (math.inf, -math.inf):
+        return 'null'
+    text = float.__repr__(value)
+    mantissa, _, exponent = text.partition('e')
+    if not exponent:
+        return text
+    if exponent == '-05':
+        sign = '-' if mantissa.startswith('-') else ''
+        return f"{sign}0.0000{mantissa.lstrip('-').replace('.', '')}"
+    return f"{mantissa}e{int(exponent)}"
+
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_json_default)
+_json_iterencode_floats = json.encoder._make_iterencode(
+    None, _json_default, json.encoder.encode_basestring, None, _json_float, ':', ',', False, False, True
+)
+
+
+def _json_module_dumps(obj):
+    """json-module encoding with the same bytes as orjson and msgspec
+    
+    The C encoder writes compact UTF-8 like they do, but formats exponents
+    and NaN differently. Those only occur when its output contains one of
+    the markers below, and only then is the (slower) pure-Python encoder
+    with their float format used.
+    """
+    text = _json_encoder.encode(obj)
+    if 'e-' in text or 'e+' in text or 'NaN' in text or 'Infinity' in text:
+        text = ''.join(_json_iterencode_floats(obj, 0))
+    return text.encode('utf-8')
+
+
+def select_json_codec(preference):
+    """Return (name, dumps, loads) for the preferred JSON library
+    
+    `dumps` returns compact UTF-8 bytes, identical whichever library is
+    used, and `loads` accepts bytes or str and raises ValueError on
+    malformed input.
+    """
+    if preference in ("auto", "orjson") and orjson is not None:
+        return "orjson", lambda obj: orjson.dumps(obj, default=_json_default), orjson.loads
+    
+    if preference in ("auto", "msgspec") and msgspec is not None:
+        encoder = msgspec.json.Encoder(enc_hook=_json_default)
+        decoder = msgspec.json.Decoder()
+        
+        def loads(data):
+            try:
+                return decoder.decode(data)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e)) from None
+        return "msgspec", encoder.encode, loads
+    
+    if preference not in ("auto", "json"):
+        logger.warning(f"JSON_SERIALIZER={preference} is not available; using the json module")
+    return "json", _json_module_dumps, json.loads
+
+
+JSON_CODEC, json_dumps, json_loads = select_json_codec(JSON_SERIALIZER)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by the selected codec (used by jsonify), so
+    responses have the same bytes as log lines and history payloads"""
+    
+    def dumps(self, obj, **kwargs):
+        return json_dumps(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return json_loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(json_dumps(obj), mimetype=self.mimetype)
+
+
+app.json = FastJSONProvider(app)
+
+# ========================================================
+# EVENT RECORDS
+# ========================================================
+
+class Severity(str, Enum):
+    """Detection severity; a member's position is its severity code"""
+    
+    NORMAL = "NORMAL"
+    MEDIUM = "MEDIUM"
+    HIGH = "HIGH"
+    CRITICAL = "CRITICAL"
+    
+    # Behave as the plain string everywhere (formatting, logging, JSON)
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+SEVERITIES = tuple(Severity)  # Indexed by severity code, like SEVERITY_LEVELS
+
+
+class _Record:
+    """Read-only mapping access (record["field"], record.get) for event records"""
+    
+    __slots__ = ()
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+    
+    def to_dict(self):
+        """Nested plain-dict form (the JSON shape of the record)"""
+        return {
+            name: value.to_dict() if isinstance(value, _Record) else value
+            for name, value in ((name, getattr(self, name)) for name in self.__slots__)
+        }
+
+
+@dataclass(slots=True)
+class GridEvent(_Record):
+    """A raw reading from the simulator or from ingestion"""
+    timestamp: str
+    component: str  # Interned
+    voltage: float
+    frequency: float
+    network_latency: float
+    event_type: str = "telemetry"
+    
+    @classmethod
+    def coerce(cls, raw_event):
+        """Return `raw_event` as a GridEvent: records pass through, dicts are converted"""
+        if isinstance(raw_event, cls):
+            return raw_event
+        if not isinstance(raw_event, dict):
+            raise TypeError(f"Expected a GridEvent or dict, got {type(raw_event).__name__}")
+        try:
+            return cls(raw_event["timestamp"], sys.intern(raw_event["component"]), raw_event["voltage"],
+                       raw_event["frequency"], raw_event["network_latency"],
+                       raw_event.get("event_type", "telemetry"))
+        except KeyError as e:
+            raise TypeError(f"Event dict is missing {e}") from None
+
+
+@dataclass(slots=True)
+class SystemState(_Record):
+    """A raw event fused with its component's baselines and thresholds (no field copies)"""
+    event: GridEvent
+    baseline_voltage: float
+    baseline_latency: float
+    voltage_threshold: float
+    latency_threshold: float
+    
+    @property
+    def timestamp(self):
+        return self.event.timestamp
+    
+    @property
+    def component(self):
+        return self.event.component
+    
+    @property
+    def voltage(self):
+        return self.event.voltage
+    
+    @property
+    def frequency(self):
+        return self.event.frequency
+    
+    @property
+    def network_latency(self):
+        return self.event.network_latency
+
+
+@dataclass(slots=True)
+class BehavioralMetrics(_Record):
+    voltage_deviation: float
+    latency_deviation: float
+    frequency: float
+    voltage_threshold: float
+    latency_threshold: float
+
+
+@dataclass(slots=True, frozen=True)
+class Detection(_Record):
+    """Detection outcome; one shared instance per severity code (see DETECTIONS)"""
+    is_anomaly: bool
+    severity: Severity
+    alert_type: str
+    voltage_anomaly: bool
+    latency_anomaly: bool
+    
+    @property
+    def severity_code(self):
+        return SEVERITY_CODES[self.severity]
+
+
+DETECTIONS = tuple(
+    Detection(code > 0, SEVERITIES[code], ALERT_TYPES[code], code >= 2, code % 2 == 1)
+    for code in range(len(SEVERITIES))
+)
+
+# Alerts raised by the stateful checks on readings the thresholds passed. Both are
+# HIGH, so severity-keyed consumers (threat patterns, /query) treat them like a
+# voltage anomaly: a power-quality deviation rather than a communications one.
+FREQUENCY_DETECTION = Detection(True, Severity.HIGH, "Frequency Anomaly", False, False)
+DRIFT_DETECTION = Detection(True, Severity.HIGH, "Voltage Drift", True, False)
+
+
+@dataclass(slots=True, frozen=True)
+class TemporalDetection(_Record):
+    """Stateful findings for one reading; one shared instance per combination (see TEMPORAL_DETECTIONS)"""
+    frequency_anomaly: bool
+    drift_anomaly: bool
+    persistent: bool  # An anomalous reading backed by at least PERSISTENCE_MIN recent ones
+    flapping: bool
+    recent_anomalies: int  # Anomalous readings among the component's last PERSISTENCE_WINDOW
+    
+    @property
+    def is_anomaly(self):
+        """Whether the stateful checks alone flag the reading"""
+        return self.frequency_anomaly or self.drift_anomaly
+
+
+# Indexed by frequency | drift << 1 | persistent << 2 | flapping << 3 | recent << 4
+TEMPORAL_DETECTIONS = tuple(
+    TemporalDetection(bool(key & 1), bool(key & 2), bool(key & 4), bool(key & 8), key >> 4)
+    for key in range(16 * (PERSISTENCE_WINDOW + 1))
+)
+
+
+@dataclass(slots=True)
+class ScoreDetection(_Record):
+    """Learned-model verdict for one reading"""
+    score: float  # Higher is more anomalous
+    is_anomaly: bool  # Score above the model's threshold
+
+
+@dataclass(slots=True)
+class ProcessedEvent(_Record):
+    """A processed event as returned by the API, logged and broadcast"""
+    event: GridEvent
+    behavioral_metrics: BehavioralMetrics
+    detection: Detection
+    temporal: TemporalDetection = None  # None with TEMPORAL_DETECTION off
+    ml: ScoreDetection = None  # None without a trained model
+
+
 # ========================================================
 # CHUNK 1: SMART GRID EVENT SIMULATION
 # ========================================================
@@ -59,6 +650,8 @@ class SmartGridSimulator:
         "Distribution_Line_D2"
     ]
     
+    BATCH_INTERVAL = 0.01  # Default seconds between the readings of a generated batch
+    
     @staticmethod
     def generate_event():
         """Generate a random grid event (70% normal, 30% attack)"""
@@ -79,41 +672,441 @@ class SmartGridSimulator:
             network_latency = random.uniform(10, 35)
             event_type = "normal"
         
-        event = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "component": component,
-            "voltage": round(voltage, 2),
-            "frequency": round(frequency, 2),
-            "network_latency": round(network_latency, 2),
-            "event_type": event_type
-        }
+        event = GridEvent(
+            datetime.utcnow().isoformat(),
+            component,
+            round(voltage, 2),
+            round(frequency, 2),
+            round(network_latency, 2),
+            event_type
+        )
         
-        logger.info(f"Generated {event_type} event for {component}")
+        log_event_diag("Generated %s event for %s", event_type, component, event=event)
         return event
+    
+    @staticmethod
+    def generate_columns(count, seed=None, attack_ratio=0.3, components=None,
+                         baselines=None, start=None, interval=None):
+        """Generate `count` events as columnar NumPy arrays in one vectorized pass
+        
+        `baselines` maps component -> (baseline_voltage, baseline_latency) and
+        defaults to the global baselines. Timestamps advance by `interval`
+        seconds per event (default BATCH_INTERVAL), starting at `start` (a
+        naive UTC or aware datetime) or, without one, ending now. The same
+        `seed` always yields the same readings.
+        """
+        rng = np.random.default_rng(seed)
+        components = list(components or SmartGridSimulator.COMPONENTS)
+        baselines = baselines or {}
+        
+        component_index = rng.integers(0, len(components), size=count)
+        is_attack = rng.random(count) < attack_ratio
+        
+        baseline_voltage = np.array([baselines.get(c, (BASELINE_VOLTAGE, BASELINE_LATENCY))[0] for c in components])
+        baseline_latency = np.array([baselines.get(c, (BASELINE_VOLTAGE, BASELINE_LATENCY))[1] for c in components])
+        
+        # Same ranges as generate_event, shifted by each component's baselines
+        voltage = baseline_voltage[component_index] + np.where(
+            is_attack, rng.uniform(-30, 30, count), rng.uniform(-5, 5, count))
+        frequency = np.where(is_attack, rng.uniform(48.5, 51.5, count), rng.uniform(49.8, 50.2, count))
+        network_latency = baseline_latency[component_index] - BASELINE_LATENCY + np.where(
+            is_attack, rng.uniform(10, 150, count), rng.uniform(10, 35, count))
+        
+        if interval is None:
+            interval = SmartGridSimulator.BATCH_INTERVAL
+        if start is None:
+            start = datetime.now(timezone.utc) - timedelta(seconds=interval * max(count - 1, 0))
+        if start.tzinfo is not None:
+            start = start.astimezone(timezone.utc)
+        start = np.datetime64(start.replace(tzinfo=None), 'us')
+        offsets = (np.arange(count) * interval * 1e6).astype('timedelta64[us]')
+        
+        return {
+            "timestamp": np.datetime_as_string(start + offsets, unit='us'),
+            "component": np.array(components)[component_index],
+            "voltage": np.round(voltage, 2),
+            "frequency": np.round(frequency, 2),
+            "network_latency": np.round(network_latency, 2),
+            "event_type": np.where(is_attack, "attack", "normal")
+        }
+    
+    @staticmethod
+    def generate_batch(count, **options):
+        """Generate `count` events (see generate_columns for options) as GridEvent records"""
+        columns = SmartGridSimulator.generate_columns(count, **options)
+        return list(map(
+            GridEvent,
+            columns["timestamp"].tolist(),
+            map(sys.intern, columns["component"].tolist()),
+            columns["voltage"].tolist(),
+            columns["frequency"].tolist(),
+            columns["network_latency"].tolist(),
+            columns["event_type"].tolist()
+        ))
+    
+    @staticmethod
+    def stream(rate=None, batch_size=1000, seed=None, **options):
+        """Yield events forever, paced to `rate` events/sec when given
+        
+        Events are generated `batch_size` at a time with timestamps spaced
+        1/rate apart; the seed advances per batch so the stream is reproducible.
+        """
+        rng = np.random.default_rng(seed)
+        interval = 1.0 / rate if rate else None
+        next_batch_at = time.monotonic()
+        
+        while True:
+            batch_seed = int(rng.integers(0, 2**63 - 1))
+            yield from SmartGridSimulator.generate_batch(
+                batch_size, seed=batch_seed, interval=interval, **options
+            )
+            
+            if rate:
+                next_batch_at += batch_size / rate
+                delay = next_batch_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
 
 
 # ========================================================
 # CHUNK 2: PERCEPTUAL DETECTION LAYER
 # ========================================================
 
+class EnvelopeStore:
+    """Online per-component behavioral envelopes with O(1) updates
+    
+    Keeps an exponentially weighted mean and variance of voltage and
+    latency per component (exact running statistics during warm-up, then
+    EWMA with weight `alpha` so the envelope follows slow drift), plus a
+    streaming estimate of the `quantile` of the absolute deviation from
+    the mean. Once a component has `min_samples` normal readings, its
+    baselines are the learned means and its thresholds are the larger of
+    `sigma` standard deviations and the deviation quantile (never below
+    the configured floors), so heavy-tailed components whose variance
+    understates their spread get wider envelopes; before that the global
+    baselines and thresholds apply. Memory is bounded by `max_components`,
+    evicting the least recently seen component.
+    
+    Envelopes live in the worker process: with several workers each one
+    learns from the share of traffic it serves.
+    """
+    
+    QUANTILE_STEP = 0.05  # Quantile estimate step per exceedance, in standard deviations
+    
+    def __init__(self, alpha, min_samples, sigma, quantile, min_voltage_threshold,
+                 min_latency_threshold, max_components):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.sigma = sigma
+        self.quantile = quantile
+        self.min_voltage_threshold = min_voltage_threshold
+        self.min_latency_threshold = min_latency_threshold
+        self.max_components = max_components
+        
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()  # component -> slot, least recently seen first
+        self._capacity = 0
+        self._grow(min(1024, max_components))
+    
+    def _grow(self, capacity):
+        def extend(array):
+            grown = np.zeros(capacity)
+            grown[:self._capacity] = array
+            return grown
+        
+        if self._capacity == 0:
+            self._count = np.zeros(capacity)
+            self._mean = np.zeros((2, capacity))  # rows: voltage, latency
+            self._var = np.zeros((2, capacity))
+            self._quantile = np.zeros((2, capacity))  # |deviation| quantile estimates
+        else:
+            self._count = extend(self._count)
+            self._mean = np.vstack([extend(self._mean[0]), extend(self._mean[1])])
+            self._var = np.vstack([extend(self._var[0]), extend(self._var[1])])
+            self._quantile = np.vstack([extend(self._quantile[0]), extend(self._quantile[1])])
+        self._capacity = capacity
+    
+    def _slot(self, component):
+        """Slot of a component, allocating (or recycling the LRU one) if new"""
+        slot = self._slots.get(component)
+        if slot is not None:
+            self._slots.move_to_end(component)
+            return slot
+        
+        if len(self._slots) < self._capacity:
+            slot = len(self._slots)
+        elif self._capacity < self.max_components:
+            slot = len(self._slots)
+            self._grow(min(self._capacity * 2, self.max_components))
+        else:
+            _, slot = self._slots.popitem(last=False)
+        
+        self._count[slot] = 0
+        self._mean[:, slot] = 0.0
+        self._var[:, slot] = 0.0
+        self._quantile[:, slot] = 0.0
+        self._slots[component] = slot
+        return slot
+    
+    def _envelope(self, slots):
+        """Baselines and thresholds for known slots (-1 = unknown component)"""
+        known = slots >= 0
+        safe = np.where(known, slots, 0)
+        warmed = known & (self._count[safe] >= self.min_samples)
+        
+        spread = np.maximum(self.sigma * np.sqrt(self._var[:, safe]), self._quantile[:, safe])
+        return (
+            np.where(warmed, self._mean[0, safe], BASELINE_VOLTAGE),
+            np.where(warmed, self._mean[1, safe], BASELINE_LATENCY),
+            np.where(warmed, np.maximum(spread[0], self.min_voltage_threshold), VOLTAGE_THRESHOLD),
+            np.where(warmed, np.maximum(spread[1], self.min_latency_threshold), LATENCY_THRESHOLD)
+        )
+    
+    def lookup(self, components):
+        """Return (baseline_voltage, baseline_latency, voltage_threshold, latency_threshold) arrays"""
+        names, inverse = np.unique(np.asarray(components, dtype=object).astype(str), return_inverse=True)
+        with self._lock:
+            slots = np.array([self._slots.get(name, -1) for name in names.tolist()], dtype=np.int64)
+            envelope = self._envelope(slots)
+        return tuple(values[inverse] for values in envelope)
+    
+    def lookup_one(self, component):
+        """Envelope of a single component as four floats"""
+        with self._lock:
+            slot = self._slots.get(component, -1)
+            envelope = self._envelope(np.array([slot]))
+        return tuple(float(values[0]) for values in envelope)
+    
+    def update(self, components, voltage, latency):
+        """Fold normal readings into the envelopes, one group merge per component"""
+        if len(components) == 0:
+            return
+        
+        names, inverse = np.unique(np.asarray(components, dtype=object).astype(str), return_inverse=True)
+        values = np.vstack([np.asarray(voltage, dtype=np.float64), np.asarray(latency, dtype=np.float64)])
+        
+        # Per-component batch count, mean and variance
+        batch_count = np.bincount(inverse, minlength=len(names)).astype(np.float64)
+        batch_mean = np.vstack([np.bincount(inverse, row, len(names)) for row in values]) / batch_count
+        batch_var = np.vstack([
+            np.bincount(inverse, (row - batch_mean[i][inverse]) ** 2, len(names))
+            for i, row in enumerate(values)
+        ]) / batch_count
+        
+        with self._lock:
+            slots = np.array([self._slot(name) for name in names.tolist()], dtype=np.int64)
+            count = self._count[slots]
+            
+            # Exact (Chan) merge while warming up, EWMA weighting afterwards
+            old_weight = np.minimum(count / (count + batch_count), (1.0 - self.alpha) ** batch_count)
+            new_weight = 1.0 - old_weight
+            old_mean = self._mean[:, slots]
+            
+            self._mean[:, slots] = old_weight * old_mean + new_weight * batch_mean
+            self._var[:, slots] = (
+                old_weight * self._var[:, slots]
+                + new_weight * batch_var
+                + old_weight * new_weight * (old_mean - batch_mean) ** 2
+            )
+            self._count[slots] = count + batch_count
+            
+            # Frugal streaming quantile: every reading above the estimate steps it up,
+            # every reading below steps it down by (1 - q) / q as much, so it settles
+            # where a fraction 1 - q of readings exceed it. Bounded per batch.
+            std = np.sqrt(self._var[:, slots])
+            estimate = self._quantile[:, slots]
+            deviation = np.abs(values - self._mean[:, slots][:, inverse])
+            above = np.vstack([
+                np.bincount(inverse, (deviation[i] > estimate[i][inverse]).astype(np.float64), len(names))
+                for i in range(2)
+            ])
+            change = self.QUANTILE_STEP * std * (above - (batch_count - above) * (1.0 - self.quantile) / self.quantile)
+            self._quantile[:, slots] = np.maximum(estimate + np.clip(change, -self.sigma * std, self.sigma * std), 0.0)
+    
+    def snapshot(self, component=None):
+        """Current envelope statistics, for one component or all of them"""
+        with self._lock:
+            names = [component] if component is not None else list(self._slots)
+            result = {}
+            for name in names:
+                slot = self._slots.get(name)
+                if slot is None:
+                    continue
+                baseline_v, baseline_l, threshold_v, threshold_l = (
+                    float(values[0]) for values in self._envelope(np.array([slot]))
+                )
+                result[name] = {
+                    "samples": int(self._count[slot]),
+                    "mean_voltage": round(float(self._mean[0, slot]), 3),
+                    "std_voltage": round(float(np.sqrt(self._var[0, slot])), 3),
+                    "mean_latency": round(float(self._mean[1, slot]), 3),
+                    "std_latency": round(float(np.sqrt(self._var[1, slot])), 3),
+                    "quantile_voltage_deviation": round(float(self._quantile[0, slot]), 3),
+                    "quantile_latency_deviation": round(float(self._quantile[1, slot]), 3),
+                    "baseline_voltage": round(baseline_v, 2),
+                    "baseline_latency": round(baseline_l, 2),
+                    "voltage_threshold": round(threshold_v, 2),
+                    "latency_threshold": round(threshold_l, 2),
+                    "adaptive": bool(self._count[slot] >= self.min_samples)
+                }
+        return result
+
+
+envelope_store = EnvelopeStore(
+    alpha=ENVELOPE_ALPHA,
+    min_samples=ENVELOPE_MIN_SAMPLES,
+    sigma=ENVELOPE_SIGMA,
+    quantile=ENVELOPE_QUANTILE,
+    min_voltage_threshold=ENVELOPE_MIN_VOLTAGE_THRESHOLD,
+    min_latency_threshold=ENVELOPE_MIN_LATENCY_THRESHOLD,
+    max_components=ENVELOPE_MAX_COMPONENTS
+)
+
+
+class TemporalStateTable:
+    """Bounded per-component detection state for stateful checks in O(1) per reading
+    
+    Per component it keeps a two-sided CUSUM of the voltage offset from
+    the baseline over the readings that passed the voltage threshold, plus
+    a bitmask of the anomaly flags of the last `window` readings. The
+    CUSUM adds up how far each offset exceeds `drift_slack` volts (above
+    or below the baseline) and alarms once either sum reaches
+    `drift_threshold`, so a slow ramp that never crosses the threshold is
+    still caught while zero-mean noise inside the slack never accumulates.
+    The sums are capped at twice the threshold, so an alarm clears within
+    a few readings once the voltage returns. A reading is anomalous if the
+    thresholds, the frequency check or the drift check flag it. The
+    bitmask's popcount gives N-of-M persistence, and the popcount of its
+    adjacent-bit flips gives flapping. Memory is bounded by
+    `max_components`, evicting the least recently seen component.
+    """
+    
+    def __init__(self, drift_slack, drift_threshold, window, min_persistent, min_transitions, max_components):
+        self.drift_slack = drift_slack
+        self.drift_threshold = drift_threshold
+        self.window_mask = (1 << window) - 1
+        self.transition_mask = (1 << (window - 1)) - 1  # Flips between the last `window` readings
+        self.min_persistent = min_persistent
+        self.min_transitions = min_transitions
+        self.max_components = max_components
+        
+        self._lock = threading.Lock()
+        self._states = OrderedDict()  # component -> [cusum_high, cusum_low, flags], least recently seen first
+    
+    def update(self, components, voltage_offsets, frequencies, severity_codes):
+        """Advance each reading's component state in order; returns a TemporalDetection per reading
+        
+        `voltage_offsets` are signed voltage minus baseline, `severity_codes`
+        the threshold verdicts.
+        """
+        slack, threshold, cap = self.drift_slack, self.drift_threshold, 2 * self.drift_threshold
+        window_mask, transition_mask = self.window_mask, self.transition_mask
+        min_persistent, min_transitions = self.min_persistent, self.min_transitions
+        states = self._states
+        results = []
+        append = results.append
+        
+        with self._lock:
+            for component, offset, frequency, code in zip(components, voltage_offsets, frequencies, severity_codes):
+                state = states.get(component)
+                if state is None:
+                    state = states[component] = [0.0, 0.0, 0]
+                    if len(states) > self.max_components:
+                        states.popitem(last=False)
+                else:
+                    states.move_to_end(component)
+                
+                high, low, flags = state
+                if code < 2:  # Only readings within the voltage threshold accumulate drift
+                    state[0] = high = min(max(high + offset - slack, 0.0), cap)
+                    state[1] = low = min(max(low - offset - slack, 0.0), cap)
+                
+                frequency_anomaly = not -FREQUENCY_THRESHOLD <= frequency - BASELINE_FREQUENCY <= FREQUENCY_THRESHOLD
+                drift_anomaly = high >= threshold or low >= threshold
+                anomalous = code > 0 or frequency_anomaly or drift_anomaly
+                state[2] = flags = ((flags << 1) | anomalous) & window_mask
+                
+                recent = flags.bit_count()
+                append(TEMPORAL_DETECTIONS[
+                    frequency_anomaly
+                    | drift_anomaly << 1
+                    | (anomalous and recent >= min_persistent) << 2
+                    | (((flags ^ (flags >> 1)) & transition_mask).bit_count() >= min_transitions) << 3
+                    | recent << 4
+                ])
+        return results
+    
+    def export_states(self):
+        """Raw per-component state, least recently seen first (to resume in another process)"""
+        with self._lock:
+            return [(component, list(state)) for component, state in self._states.items()]
+    
+    def import_states(self, states):
+        """Replace all state with states from export_states()"""
+        with self._lock:
+            self._states = OrderedDict((component, list(state)) for component, state in states)
+    
+    def snapshot(self, component=None):
+        """Current state per component (or for one component)"""
+        with self._lock:
+            if component is not None:
+                items = [(component, self._states[component])] if component in self._states else []
+            else:
+                items = list(self._states.items())
+            return {
+                name: {
+                    "drift_high": round(high, 2),  # Summed volts above baseline + slack
+                    "drift_low": round(low, 2),  # Summed volts below baseline - slack
+                    "recent_anomalies": flags.bit_count()
+                }
+                for name, (high, low, flags) in items
+            }
+
+
+temporal_state = TemporalStateTable(
+    drift_slack=TEMPORAL_DRIFT_SLACK,
+    drift_threshold=TEMPORAL_DRIFT_THRESHOLD,
+    window=PERSISTENCE_WINDOW,
+    min_persistent=PERSISTENCE_MIN,
+    min_transitions=FLAPPING_MIN_TRANSITIONS,
+    max_components=TEMPORAL_MAX_COMPONENTS
+)
+
+
 class DataFusionAgent:
     """Agent 1: Structures raw event data into system state"""
     
     @staticmethod
     def process(raw_event):
-        """Fuse and structure incoming event data"""
-        system_state = {
-            "timestamp": raw_event["timestamp"],
-            "component": raw_event["component"],
-            "voltage": raw_event["voltage"],
-            "frequency": raw_event["frequency"],
-            "network_latency": raw_event["network_latency"],
-            "baseline_voltage": BASELINE_VOLTAGE,
-            "baseline_latency": BASELINE_LATENCY
-        }
+        """Fuse and structure incoming event data (a GridEvent record or dict)"""
+        raw_event = GridEvent.coerce(raw_event)
+        if ADAPTIVE_ENVELOPES:
+            system_state = SystemState(raw_event, *envelope_store.lookup_one(raw_event.component))
+        else:
+            system_state = SystemState(raw_event, BASELINE_VOLTAGE, BASELINE_LATENCY,
+                                       VOLTAGE_THRESHOLD, LATENCY_THRESHOLD)
         
-        logger.info(f"Data Fusion: Processed event from {raw_event['component']}")
+        log_event_diag("Data Fusion: Processed event from %s", raw_event.component, event=raw_event)
         return system_state
+    
+    @staticmethod
+    def process_batch(raw_events):
+        """Fuse a batch of raw events (GridEvent records or dicts) into columnar NumPy arrays"""
+        count = len(raw_events)
+        field = operator.attrgetter if count and isinstance(raw_events[0], GridEvent) else operator.itemgetter
+        columns = {
+            "component": list(map(field("component"), raw_events)),
+            "voltage": np.fromiter(map(field("voltage"), raw_events), dtype=np.float64, count=count),
+            "frequency": np.fromiter(map(field("frequency"), raw_events), dtype=np.float64, count=count),
+            "network_latency": np.fromiter(map(field("network_latency"), raw_events), dtype=np.float64, count=count)
+        }
+        
+        if ADAPTIVE_ENVELOPES:
+            (columns["baseline_voltage"], columns["baseline_latency"],
+             columns["voltage_threshold"], columns["latency_threshold"]) = envelope_store.lookup(columns["component"])
+        
+        logger.info("Data Fusion: Processed batch of %d events", count)
+        return columns
 
 
 class BehavioralEnvelopeAgent:
@@ -122,259 +1115,4098 @@ class BehavioralEnvelopeAgent:
     @staticmethod
     def analyze(system_state):
         """Calculate deviations from baseline values"""
-        voltage_deviation = abs(system_state["voltage"] - system_state["baseline_voltage"])
-        latency_deviation = abs(system_state["network_latency"] - system_state["baseline_latency"])
+        event = system_state.event
+        voltage_deviation = abs(event.voltage - system_state.baseline_voltage)
+        latency_deviation = abs(event.network_latency - system_state.baseline_latency)
         
-        behavioral_metrics = {
-            "voltage_deviation": round(voltage_deviation, 2),
-            "latency_deviation": round(latency_deviation, 2),
-            "frequency": system_state["frequency"]
-        }
+        behavioral_metrics = BehavioralMetrics(
+            round(voltage_deviation, 2),
+            round(latency_deviation, 2),
+            event.frequency,
+            round(system_state.voltage_threshold, 2),
+            round(system_state.latency_threshold, 2)
+        )
         
-        logger.info(f"Behavioral Envelope: V_dev={voltage_deviation:.2f}V, L_dev={latency_deviation:.2f}ms")
+        log_event_diag("Behavioral Envelope: V_dev=%.2fV, L_dev=%.2fms",
+                       voltage_deviation, latency_deviation, event=system_state,
+                       voltage_deviation=voltage_deviation, latency_deviation=latency_deviation)
         return behavioral_metrics
+    
+    @staticmethod
+    def analyze_batch(columns):
+        """Calculate deviations for a columnar batch in one vectorized pass
+        
+        Baselines and thresholds may be per-event arrays or scalars; missing
+        ones default to the global configuration.
+        """
+        baseline_voltage = columns.get("baseline_voltage", BASELINE_VOLTAGE)
+        baseline_latency = columns.get("baseline_latency", BASELINE_LATENCY)
+        shape = columns["voltage"].shape
+        return {
+            "voltage_deviation": np.round(np.abs(columns["voltage"] - baseline_voltage), 2),
+            "latency_deviation": np.round(np.abs(columns["network_latency"] - baseline_latency), 2),
+            "frequency": columns["frequency"],
+            "voltage_threshold": np.broadcast_to(np.round(columns.get("voltage_threshold", VOLTAGE_THRESHOLD), 2), shape),
+            "latency_threshold": np.broadcast_to(np.round(columns.get("latency_threshold", LATENCY_THRESHOLD), 2), shape)
+        }
 
 
 class AnomalyDetectionAgent:
     """Agent 3: Applies deterministic rules to detect anomalies"""
     
     @staticmethod
-    def detect(behavioral_metrics):
-        """Apply threshold-based anomaly detection"""
-        voltage_anomaly = behavioral_metrics["voltage_deviation"] > VOLTAGE_THRESHOLD
-        latency_anomaly = behavioral_metrics["latency_deviation"] > LATENCY_THRESHOLD
+    def detect(behavioral_metrics, event=None):
+        """Apply threshold-based anomaly detection (`event` keys the diagnostic record)"""
+        voltage_anomaly = behavioral_metrics.voltage_deviation > behavioral_metrics.voltage_threshold
+        latency_anomaly = behavioral_metrics.latency_deviation > behavioral_metrics.latency_threshold
         
-        is_anomaly = voltage_anomaly or latency_anomaly
+        # Severity code indexes the shared (immutable) detection records
+        detection_result = DETECTIONS[2 * voltage_anomaly + latency_anomaly]
         
-        # Determine severity
-        if is_anomaly:
-            if voltage_anomaly and latency_anomaly:
-                severity = "CRITICAL"
-                alert_type = "Voltage & Latency Anomaly"
-            elif voltage_anomaly:
-                severity = "HIGH"
-                alert_type = "Voltage Anomaly"
-            else:
-                severity = "MEDIUM"
-                alert_type = "Latency Anomaly"
-        else:
-            severity = "NORMAL"
-            alert_type = "No Anomaly"
+        log_event_diag("Anomaly Detection: %s - Severity: %s", detection_result.alert_type, detection_result.severity,
+                       event=event, is_anomaly=detection_result.is_anomaly, severity=detection_result.severity)
+        return detection_result
+    
+    @staticmethod
+    def detect_batch(batch_metrics):
+        """Apply threshold masks and severity codes to a columnar batch"""
+        voltage_anomaly = batch_metrics["voltage_deviation"] > batch_metrics.get("voltage_threshold", VOLTAGE_THRESHOLD)
+        latency_anomaly = batch_metrics["latency_deviation"] > batch_metrics.get("latency_threshold", LATENCY_THRESHOLD)
+        severity_code = (voltage_anomaly.astype(np.int8) << 1) | latency_anomaly
         
-        detection_result = {
-            "is_anomaly": is_anomaly,
-            "severity": severity,
-            "alert_type": alert_type,
+        logger.info("Anomaly Detection: %d anomalies in batch of %d",
+                    np.count_nonzero(severity_code), severity_code.size)
+        return {
+            "is_anomaly": severity_code > 0,
+            "severity_code": severity_code,
             "voltage_anomaly": voltage_anomaly,
             "latency_anomaly": latency_anomaly
         }
+    
+    @staticmethod
+    def track(system_state, detection_result):
+        """Evaluate the stateful per-component checks for one reading"""
+        event = system_state.event
+        return temporal_state.update(
+            (event.component,), (event.voltage - system_state.baseline_voltage,), (event.frequency,),
+            (detection_result.severity_code,)
+        )[0]
+    
+    @staticmethod
+    def track_batch(columns, batch_detection):
+        """Evaluate the stateful per-component checks for a columnar batch, in reading order"""
+        return temporal_state.update(
+            columns["component"],
+            (columns["voltage"] - columns.get("baseline_voltage", BASELINE_VOLTAGE)).tolist(),
+            columns["frequency"].tolist(),
+            batch_detection["severity_code"].tolist()
+        )
+    
+    @staticmethod
+    def combine(detection_result, temporal_result):
+        """Final detection for a reading from its threshold and stateful verdicts
         
-        logger.info(f"Anomaly Detection: {alert_type} - Severity: {severity}")
+        A frequency deviation or voltage drift on a reading the thresholds
+        passed raises its own alert. With PERSISTENT_ALERTS_ONLY, an anomaly
+        not backed by PERSISTENCE_MIN recent ones is reported as normal.
+        """
+        if temporal_result is None:
+            return detection_result
+        if PERSISTENT_ALERTS_ONLY and not temporal_result.persistent:
+            return DETECTIONS[0]
+        if detection_result.is_anomaly:
+            return detection_result
+        if temporal_result.frequency_anomaly:
+            return FREQUENCY_DETECTION
+        if temporal_result.drift_anomaly:
+            return DRIFT_DETECTION
         return detection_result
 
 
+class AnomalyScoringAgent:
+    """Agent 4: Scores readings with the learned model, alongside the threshold rules
+    
+    The model is loaded on first use, so startup never waits on it. Single
+    readings go through a MicroBatcher shared by all request threads;
+    batches are scored directly.
+    """
+    
+    _scorer = None
+    _batcher = None
+    _loaded = False
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def get_scorer():
+        """Return the trained scorer, loading it on first use (None without a model)"""
+        if not AnomalyScoringAgent._loaded:
+            with AnomalyScoringAgent._lock:
+                if not AnomalyScoringAgent._loaded:
+                    AnomalyScoringAgent._scorer = AnomalyScoringAgent._load()
+                    AnomalyScoringAgent._loaded = True
+        return AnomalyScoringAgent._scorer
+    
+    @staticmethod
+    def _load():
+        if not ML_SCORING:
+            return None
+        if not os.path.exists(ML_MODEL_PATH):
+            logger.info(f"No anomaly model at {ML_MODEL_PATH}; learned scoring is off (see train_scorer.py)")
+            return None
+        try:
+            scorer = load_scorer(ML_MODEL_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not load anomaly model {ML_MODEL_PATH}: {e}")
+            return None
+        if ML_SCORE_THRESHOLD is not None:
+            scorer.threshold = ML_SCORE_THRESHOLD
+        AnomalyScoringAgent._batcher = MicroBatcher(scorer, ML_BATCH_MAX, ML_BATCH_WAIT)
+        logger.info(f"Loaded {scorer.kind} anomaly model from {ML_MODEL_PATH} (threshold {scorer.threshold:.4f})")
+        return scorer
+    
+    @staticmethod
+    def score(raw_event):
+        """Score one reading (None without a model)"""
+        scorer = AnomalyScoringAgent.get_scorer()
+        if scorer is None:
+            return None
+        score = AnomalyScoringAgent._batcher.score((raw_event.voltage, raw_event.frequency, raw_event.network_latency))
+        return None if score is None else ScoreDetection(score, score > scorer.threshold)
+    
+    @staticmethod
+    def score_batch(columns):
+        """Score a columnar batch (None without a model)"""
+        scorer = AnomalyScoringAgent.get_scorer()
+        if scorer is None:
+            return None
+        scores = scorer.score(np.column_stack([columns[name] for name in SCORER_FEATURES]))
+        threshold = scorer.threshold
+        return [ScoreDetection(score, score > threshold) for score in scores.tolist()]
+    
+    @staticmethod
+    def status():
+        """Model and micro-batching state for /scorer"""
+        scorer = AnomalyScoringAgent.get_scorer()
+        status = {"enabled": ML_SCORING, "model_path": ML_MODEL_PATH, "loaded": scorer is not None}
+        if scorer is not None:
+            status.update(scorer.describe())
+            status["batching"] = AnomalyScoringAgent._batcher.stats()
+        return status
+
+
 class PerceptualLayer:
     """Orchestrates the perceptual detection layer processing"""
     
     @staticmethod
     def process_event(raw_event):
-        """Process event through the complete perceptual layer"""
+        """Process event (a GridEvent record or dict) through the complete perceptual layer"""
         
         # Step 1: Data Fusion
-        system_state = DataFusionAgent.process(raw_event)
+        with pipeline_metrics.time("DataFusionAgent.process"):
+            system_state = DataFusionAgent.process(raw_event)
+            raw_event = system_state.event
         
         # Step 2: Behavioral Analysis
-        behavioral_metrics = BehavioralEnvelopeAgent.analyze(system_state)
+        with pipeline_metrics.time("BehavioralEnvelopeAgent.analyze"):
+            behavioral_metrics = BehavioralEnvelopeAgent.analyze(system_state)
         
-        # Step 3: Anomaly Detection
-        detection_result = AnomalyDetectionAgent.detect(behavioral_metrics)
+        # Step 3: Anomaly Detection, then stateful checks against the component's recent readings
+        with pipeline_metrics.time("AnomalyDetectionAgent.detect"):
+            threshold_result = AnomalyDetectionAgent.detect(behavioral_metrics, raw_event)
+            temporal_result = AnomalyDetectionAgent.track(system_state, threshold_result) if TEMPORAL_DETECTION else None
+            detection_result = AnomalyDetectionAgent.combine(threshold_result, temporal_result)
         
-        # Combine results
-        processed_result = {
-            "event": raw_event,
-            "behavioral_metrics": behavioral_metrics,
-            "detection": detection_result
-        }
+        # Step 4: Learned scoring (micro-batched with concurrent requests)
+        with pipeline_metrics.time("AnomalyScoringAgent.score"):
+            score_result = AnomalyScoringAgent.score(raw_event)
         
-        return processed_result
-
-
-# ========================================================
-# LOGGING SYSTEM
-# ========================================================
-
-class EventLogger:
-    """Structured logging system for grid events"""
-    
-    LOG_FILE = "event_logs.jsonl"
+        # Step 5: Learn the component envelope from readings within the thresholds
+        if ADAPTIVE_ENVELOPES and not threshold_result.is_anomaly:
+            envelope_store.update([raw_event.component], [raw_event.voltage], [raw_event.network_latency])
+        
+        # Combine results (the raw event is shared, not copied)
+        return ProcessedEvent(raw_event, behavioral_metrics, detection_result, temporal_result, score_result)
     
     @staticmethod
-    def log_event(event_data):
-        """Log event to JSONL file"""
-        log_entry = {
-            "timestamp": event_data["event"]["timestamp"],
-            "component": event_data["event"]["component"],
-            "voltage": event_data["event"]["voltage"],
-            "frequency": event_data["event"]["frequency"],
-            "network_latency": event_data["event"]["network_latency"],
-            "voltage_deviation": event_data["behavioral_metrics"]["voltage_deviation"],
-            "latency_deviation": event_data["behavioral_metrics"]["latency_deviation"],
-            "is_anomaly": event_data["detection"]["is_anomaly"],
-            "severity": event_data["detection"]["severity"],
-            "alert_type": event_data["detection"]["alert_type"]
-        }
-        
-        # Append to JSONL file
-        with open(EventLogger.LOG_FILE, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
-        
-        logger.info(f"Event logged: {log_entry['alert_type']}")
+    def process_columns(columns):
+        """Run columnar readings through the behavioral and detection agents"""
+        batch_metrics = BehavioralEnvelopeAgent.analyze_batch(columns)
+        batch_detection = AnomalyDetectionAgent.detect_batch(batch_metrics)
+        return batch_metrics, batch_detection
     
     @staticmethod
-    def get_logs(limit=None):
-        """Retrieve logged events"""
-        if not os.path.exists(EventLogger.LOG_FILE):
+    def process_batch(raw_events):
+        """Process a batch of events (GridEvent records or dicts) through the perceptual layer"""
+        if not raw_events:
             return []
+        if not all(isinstance(raw_event, GridEvent) for raw_event in raw_events):
+            raw_events = list(map(GridEvent.coerce, raw_events))
+        
+        columns = DataFusionAgent.process_batch(raw_events)
+        batch_metrics, batch_detection = PerceptualLayer.process_columns(columns)
+        
+        if ADAPTIVE_ENVELOPES:
+            normal = ~batch_detection["is_anomaly"]
+            envelope_store.update(
+                np.asarray(columns["component"], dtype=object)[normal],
+                columns["voltage"][normal],
+                columns["network_latency"][normal]
+            )
+        
+        if TEMPORAL_DETECTION:
+            temporal_results = AnomalyDetectionAgent.track_batch(columns, batch_detection)
+        else:
+            temporal_results = itertools.repeat(None)
+        
+        score_results = AnomalyScoringAgent.score_batch(columns) or itertools.repeat(None)
+        combine = AnomalyDetectionAgent.combine
         
-        logs = []
-        with open(EventLogger.LOG_FILE, 'r') as f:
-            for line in f:
-                logs.append(json.loads(line.strip()))
+        # Materialize per-event results in the same shape as process_event
+        rows = zip(
+            raw_events,
+            batch_metrics["voltage_deviation"].tolist(),
+            batch_metrics["latency_deviation"].tolist(),
+            batch_metrics["frequency"].tolist(),
+            batch_metrics["voltage_threshold"].tolist(),
+            batch_metrics["latency_threshold"].tolist(),
+            batch_detection["severity_code"].tolist(),
+            temporal_results,
+            score_results
+        )
         
-        if limit:
-            return logs[-limit:]
-        return logs
+        return [
+            ProcessedEvent(
+                raw_event,
+                BehavioralMetrics(voltage_deviation, latency_deviation, frequency,
+                                  voltage_threshold, latency_threshold),
+                combine(DETECTIONS[code], temporal_result),
+                temporal_result,
+                score_result
+            )
+            for (raw_event, voltage_deviation, latency_deviation, frequency,
+                 voltage_threshold, latency_threshold, code, temporal_result, score_result) in rows
+        ]
 
 
 # ========================================================
-# METRICS TRACKING
+# LEARNED ANOMALY SCORING
 # ========================================================
 
-def update_metrics(is_anomaly):
-    """Update global metrics"""
-    metrics["total_events"] += 1
-    if is_anomaly:
-        metrics["total_anomalies"] += 1
-    
-    if metrics["total_events"] > 0:
-        metrics["detection_rate"] = round(
-            (metrics["total_anomalies"] / metrics["total_events"]) * 100, 2
-        )
+SCORER_FEATURES = ("voltage", "frequency", "network_latency")  # Model input columns, in order
+SCORERS = {}  # kind -> AnomalyScorer subclass, for loading model files
 
 
-# ========================================================
-# API ENDPOINTS
-# ========================================================
+def register_scorer(cls):
+    """Class decorator making a scorer loadable from model files by its `kind`"""
+    SCORERS[cls.kind] = cls
+    return cls
 
-@app.route('/', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "running",
-        "message": "AI-Enabled Smart Grid Cybersecurity Framework",
-        "version": "1.0.0",
-        "chunks_active": [0, 1, 2]
+
+def _average_path_length(n):
+    """c(n): average path length of an unsuccessful search in a BST of n points"""
+    n = np.asarray(n, dtype=np.float64)
+    safe = np.maximum(n, 2.0)
+    c = 2.0 * (np.log(safe - 1.0) + np.euler_gamma) - 2.0 * (safe - 1.0) / safe
+    return np.where(n > 2, c, np.where(n == 2, 1.0, 0.0))
+
+
+class AnomalyScorer:
+    """Base class for learned scorers over rows of SCORER_FEATURES
+    
+    Subclasses set `kind`, learn their parameters in `fit` and keep them
+    as NumPy arrays in `self.arrays`. A model file holds those arrays plus
+    the kind and the score threshold, so loading one never unpickles code.
+    """
+    
+    kind = None
+    
+    def __init__(self, arrays, threshold=None):
+        self.arrays = arrays
+        self.threshold = threshold
+    
+    @classmethod
+    def fit(cls, features, seed=None, **params):
+        """Learn a model from an (n, len(SCORER_FEATURES)) array of training rows"""
+        raise NotImplementedError
+    
+    def score(self, features):
+        """Anomaly scores for an (n, len(SCORER_FEATURES)) array; higher is more anomalous"""
+        raise NotImplementedError
+    
+    def calibrate(self, features, quantile):
+        """Set the threshold to the `quantile` of the training rows' scores"""
+        self.threshold = float(np.quantile(self.score(features), quantile))
+        return self.threshold
+    
+    def describe(self):
+        return {"kind": self.kind, "threshold": self.threshold, "features": list(SCORER_FEATURES)}
+    
+    def save(self, path):
+        """Write the model file (atomically replacing an existing one)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, kind=np.array(self.kind), threshold=np.array(self.threshold, dtype=np.float64), **self.arrays)
+        os.replace(tmp_path, path)
+
+
+def load_scorer(path):
+    """Load a model file written by AnomalyScorer.save"""
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data["kind"])
+        if kind not in SCORERS:
+            raise ValueError(f"Unknown scorer kind '{kind}'")
+        arrays = {name: data[name] for name in data.files if name not in ("kind", "threshold")}
+        return SCORERS[kind](arrays, float(data["threshold"]))
+
+
+@register_scorer
+class IsolationForestScorer(AnomalyScorer):
+    """Isolation Forest: anomalous readings are isolated by fewer random splits
+    
+    Trees are stored as flat node arrays: split feature and value, the left
+    child (the right one follows it), depth and training size. A leaf is
+    its own left child with an infinite split value, so scoring walks every
+    row down every tree at once, one branch-free vectorized level per step.
+    """
+    
+    kind = "isolation_forest"
+    CHUNK_ROWS = 2048  # Rows walked together (rows x trees node indices in memory)
+    
+    def __init__(self, arrays, threshold=None):
+        super().__init__(arrays, threshold)
+        self.feature = arrays["feature"].astype(np.intp)
+        self.split = arrays["split"]
+        self.left = arrays["left"].astype(np.intp)
+        self.roots = arrays["roots"].astype(np.intp)
+        self.max_depth = int(arrays["max_depth"])
+        # Path length of a row ending at each node (leaves): its depth plus the unbuilt subtree's
+        self._path = arrays["depth"] + _average_path_length(arrays["size"])
+        self._norm = float(_average_path_length(int(arrays["sample_size"])))
+    
+    @classmethod
+    def fit(cls, features, seed=None, trees=100, sample_size=256):
+        features = np.asarray(features, dtype=np.float64)
+        rng = np.random.default_rng(seed)
+        sample_size = min(sample_size, len(features))
+        max_depth = int(np.ceil(np.log2(max(sample_size, 2))))
+        feature, split, left, depths, size, roots = [], [], [], [], [], []
+        
+        def add_node(rows, depth):
+            feature.append(0)
+            split.append(np.inf)
+            left.append(len(left))
+            depths.append(depth)
+            size.append(len(rows))
+            return len(feature) - 1
+        
+        for _ in range(trees):
+            sample = features[rng.choice(len(features), sample_size, replace=False)]
+            rows = np.arange(sample_size)
+            roots.append(add_node(rows, 0))
+            pending = [(roots[-1], rows, 0)]
+            while pending:
+                node, rows, depth = pending.pop()
+                if depth >= max_depth or len(rows) <= 1:
+                    continue
+                values = sample[rows]
+                low, high = values.min(axis=0), values.max(axis=0)
+                splittable = np.flatnonzero(high > low)
+                if not splittable.size:
+                    continue
+                column = int(rng.choice(splittable))
+                value = rng.uniform(low[column], high[column])
+                goes_left = values[:, column] < value
+                feature[node], split[node] = column, value
+                left[node] = add_node(rows[goes_left], depth + 1)
+                add_node(rows[~goes_left], depth + 1)
+                pending.append((left[node], rows[goes_left], depth + 1))
+                pending.append((left[node] + 1, rows[~goes_left], depth + 1))
+        
+        return cls({
+            "feature": np.array(feature, dtype=np.int16),
+            "split": np.array(split, dtype=np.float64),
+            "left": np.array(left, dtype=np.int32),
+            "depth": np.array(depths, dtype=np.int16),
+            "size": np.array(size, dtype=np.int32),
+            "roots": np.array(roots, dtype=np.int32),
+            "sample_size": np.array(sample_size),
+            "max_depth": np.array(max_depth)
+        })
+    
+    def score(self, features):
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(SCORER_FEATURES))
+        scores = np.empty(len(features))
+        for start in range(0, len(features), self.CHUNK_ROWS):
+            scores[start:start + self.CHUNK_ROWS] = self._score_rows(features[start:start + self.CHUNK_ROWS])
+        return scores
+    
+    def _score_rows(self, features):
+        count, trees = len(features), len(self.roots)
+        values = np.ascontiguousarray(features.T).ravel()  # Feature-major, so feature f of row r is f * count + r
+        rows = np.repeat(np.arange(count), trees)
+        node = np.tile(self.roots, count)
+        
+        for _ in range(self.max_depth):
+            goes_right = values[self.feature[node] * count + rows] >= self.split[node]
+            node = self.left[node] + goes_right
+        
+        path = self._path[node].reshape(count, trees).mean(axis=1)
+        return np.exp2(-path / self._norm)
+    
+    def describe(self):
+        return {**super().describe(), "trees": len(self.roots), "sample_size": int(self.arrays["sample_size"])}
+
+
+@register_scorer
+class AutoencoderScorer(AnomalyScorer):
+    """Autoencoder: anomalous readings reconstruct poorly through a bottleneck
+    
+    Standardized readings pass through tanh layers narrowing to `code`
+    units and back to a linear output; the score is the mean squared
+    reconstruction error in standard deviations. Trained with mini-batch
+    Adam in NumPy.
+    """
+    
+    kind = "autoencoder"
+    
+    def __init__(self, arrays, threshold=None):
+        super().__init__(arrays, threshold)
+        self.mean = arrays["mean"]
+        self.scale = arrays["scale"]
+        self.layers = [(arrays[f"w{i}"], arrays[f"b{i}"]) for i in range(int(arrays["layers"]))]
+    
+    @staticmethod
+    def _forward(layers, x):
+        """Activations of every layer (input first); tanh on all but the output"""
+        activations = [x]
+        for i, (weights, bias) in enumerate(layers):
+            x = x @ weights + bias
+            if i < len(layers) - 1:
+                x = np.tanh(x)
+            activations.append(x)
+        return activations
+    
+    @classmethod
+    def fit(cls, features, seed=None, hidden=8, code=2, epochs=20, batch_size=256, learning_rate=0.005):
+        features = np.asarray(features, dtype=np.float64)
+        rng = np.random.default_rng(seed)
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0
+        x = (features - mean) / scale
+        
+        sizes = (x.shape[1], hidden, code, hidden, x.shape[1])
+        layers = [(rng.normal(0.0, np.sqrt(1.0 / fan_in), (fan_in, fan_out)), np.zeros(fan_out))
+                  for fan_in, fan_out in zip(sizes, sizes[1:])]
+        moments = [[np.zeros_like(p) for p in layer for _ in (0, 1)] for layer in layers]
+        beta1, beta2, step = 0.9, 0.999, 0
+        
+        for _ in range(epochs):
+            for batch in np.array_split(rng.permutation(len(x)), max(len(x) // batch_size, 1)):
+                step += 1
+                activations = cls._forward(layers, x[batch])
+                grad = 2.0 * (activations[-1] - x[batch]) / batch.size / x.shape[1]
+                for i in reversed(range(len(layers))):
+                    if i < len(layers) - 1:
+                        grad = grad * (1.0 - activations[i + 1] ** 2)
+                    weights, bias = layers[i]
+                    gradients = (activations[i].T @ grad, grad.sum(axis=0))
+                    grad = grad @ weights.T
+                    m_w, v_w, m_b, v_b = moments[i]
+                    for param, g, m, v in ((weights, gradients[0], m_w, v_w), (bias, gradients[1], m_b, v_b)):
+                        m *= beta1
+                        m += (1 - beta1) * g
+                        v *= beta2
+                        v += (1 - beta2) * g * g
+                        param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + 1e-8)
+        
+        arrays = {"mean": mean, "scale": scale, "layers": np.array(len(layers))}
+        for i, (weights, bias) in enumerate(layers):
+            arrays[f"w{i}"], arrays[f"b{i}"] = weights, bias
+        return cls(arrays)
+    
+    def score(self, features):
+        x = (np.asarray(features, dtype=np.float64).reshape(-1, len(SCORER_FEATURES)) - self.mean) / self.scale
+        return ((self._forward(self.layers, x)[-1] - x) ** 2).mean(axis=1)
+    
+    def describe(self):
+        return {**super().describe(), "layers": [weights.shape[1] for weights, _ in self.layers]}
+
+
+class _ScoreRequest:
+    __slots__ = ("row", "score", "finished", "done")
+    
+    def __init__(self, row):
+        self.row = row
+        self.score = None
+        self.finished = False
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Scores single readings from concurrent request threads in shared batches
+    
+    Callers queue a feature row. Whichever caller finds no batch in flight
+    becomes the leader: it waits up to `max_wait` seconds for more rows
+    (less once `max_batch` are queued), scores everything queued in one
+    vectorized call, repeating until its own row is done, and hands
+    leadership to the next waiter. Without the wait, readings from
+    requests that arrive a little apart are rarely queued together. There
+    is no thread handoff, and a reading waits for at most the batch in
+    progress plus its own.
+    """
+    
+    def __init__(self, scorer, max_batch=256, max_wait=0.001):
+        self.scorer = scorer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._filled = threading.Condition(self._lock)  # Notified once max_batch rows are queued
+        self._leader = threading.Lock()
+        self.batches = 0
+        self.scored = 0
+        self.largest = 0
+    
+    def score(self, row):
+        """Score one feature row (None if scoring failed)"""
+        request = _ScoreRequest(row)
+        with self._lock:
+            self._pending.append(request)
+            if len(self._pending) == self.max_batch:
+                self._filled.notify()
+        
+        while True:
+            if self._leader.acquire(blocking=False):
+                try:
+                    while not request.finished:
+                        self._score_pending()
+                finally:
+                    self._leader.release()
+                # Wake the oldest waiter to lead the next batch
+                with self._lock:
+                    if self._pending:
+                        self._pending[0].done.set()
+                return request.score
+            
+            # Woken either with a score or to take over as leader
+            request.done.wait()
+            request.done.clear()
+            if request.finished:
+                return request.score
+    
+    def _score_pending(self):
+        with self._lock:
+            if self.max_wait and len(self._pending) < self.max_batch:
+                self._filled.wait_for(lambda: len(self._pending) >= self.max_batch, self.max_wait)
+            batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+        
+        try:
+            scores = self.scorer.score(np.array([request.row for request in batch])).tolist()
+        except Exception as e:
+            logger.error(f"Anomaly scoring failed for a batch of {len(batch)}: {str(e)}")
+            scores = [None] * len(batch)
+        for request, score in zip(batch, scores):
+            request.score = score
+            request.finished = True
+            request.done.set()
+        
+        with self._lock:
+            self.batches += 1
+            self.scored += len(batch)
+            self.largest = max(self.largest, len(batch))
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "scored": self.scored,
+                "mean_batch_size": round(self.scored / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest,
+                "queued": len(self._pending),
+                "max_batch": self.max_batch,
+                "max_wait_seconds": self.max_wait
+            }
+
+
+# ========================================================
+# BULK INGESTION
+# ========================================================
+
+class IngestValidationError(ValueError):
+    """Raised when an ingested reading cannot be normalized"""
+
+
+def normalize_reading(reading):
+    """Normalize one externally supplied meter/PMU reading into a raw event"""
+    if not isinstance(reading, dict):
+        raise IngestValidationError("reading must be a JSON object")
+    
+    component = reading.get("component")
+    if not isinstance(component, str) or not component:
+        raise IngestValidationError("missing or invalid 'component'")
+    
+    values = {}
+    for field in ("voltage", "frequency", "network_latency"):
+        value = reading.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise IngestValidationError(f"missing or non-numeric '{field}'")
+        value = float(value)
+        if not math.isfinite(value):
+            raise IngestValidationError(f"non-finite '{field}'")
+        values[field] = value
+    
+    event_type = reading.get("event_type", "telemetry")
+    if not isinstance(event_type, str):
+        raise IngestValidationError("invalid 'event_type' (expected a string)")
+    
+    timestamp = reading.get("timestamp") or datetime.utcnow().isoformat()
+    try:
+        parse_timestamp(str(timestamp))
+    except ValueError:
+        raise IngestValidationError("invalid 'timestamp' (expected ISO-8601)")
+    
+    return GridEvent(
+        str(timestamp),
+        sys.intern(component),
+        values["voltage"],
+        values["frequency"],
+        values["network_latency"],
+        event_type
+    )
+
+
+def parse_ingest_body(body, content_type):
+    """Parse a JSON array or NDJSON request body into a list of readings"""
+    text = body.decode('utf-8')
+    
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        return [json_loads(line) for line in text.splitlines() if line.strip()]
+    
+    payload = json_loads(text)
+    if isinstance(payload, dict) and "events" in payload:
+        payload = payload["events"]
+    if not isinstance(payload, list):
+        raise IngestValidationError("body must be a JSON array or NDJSON")
+    return payload
+
+
+# ========================================================
+# LOGGING SYSTEM
+# ========================================================
+
+# Binary sidecar index: one fixed-width record per logged line
+INDEX_DTYPE = np.dtype([
+    ("timestamp", "<f8"),   # Event time, epoch seconds
+    ("offset", "<u8"),      # Byte offset of the line in the segment
+    ("length", "<u4"),      # Line length in bytes, including the newline
+    ("component", "<u4"),   # CRC32 of the component name
+    ("severity", "u1")      # Index into SEVERITY_LEVELS (255 = unknown)
+])
+SEVERITY_CODES = {severity: code for code, severity in enumerate(SEVERITY_LEVELS)}
+UNKNOWN_SEVERITY_CODE = 255
+
+
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_timestamp(timestamp):
+    """Convert an ISO-8601 timestamp (naive values are UTC) to epoch seconds"""
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        return (parsed - _NAIVE_EPOCH).total_seconds()  # What timestamp() does, without replace()
+    return parsed.timestamp()
+
+
+def component_key(component):
+    """Hash a component name for the log index"""
+    return zlib.crc32(component.encode('utf-8'))
+
+
+class SegmentedLogStore:
+    """Size/time-rotated JSONL segments with a sidecar byte-offset index
+    
+    Each segment ``segment-NNNNNN.jsonl`` has a matching ``.idx`` file of
+    INDEX_DTYPE records, so tail, time-range, component and severity reads
+    seek straight to the matching lines instead of parsing the whole log.
+    Appends are serialized across threads and worker processes with a lock
+    file in the log directory.
+    """
+    
+    SEGMENT_RE = re.compile(r'^segment-(\d{6,})\.jsonl$')
+    READ_CHUNK = 4096  # Index records per chunk when streaming segments
+    
+    def __init__(self, directory, max_segment_bytes, max_segment_seconds,
+                 max_segments=None, legacy_file=None):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.max_segments = max_segments
+        
+        self._lock = threading.Lock()
+        self._segment_seq = None
+        self._data_file = None
+        self._index_file = None
+        self._started_at = None  # Event time of the active segment's first record
+        self._sealed_stats = {}  # seq -> (min_ts, max_ts, is_sorted)
+        
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, '.lock'), 'a')
+        
+        if legacy_file and os.path.exists(legacy_file):
+            self._adopt_legacy_file(legacy_file)
+    
+    # ---------------- segment bookkeeping ----------------
+    
+    def _paths(self, seq):
+        base = os.path.join(self.directory, f"segment-{seq:06d}")
+        return base + '.jsonl', base + '.idx'
+    
+    def segments(self):
+        """Return segment sequence numbers, oldest first"""
+        seqs = []
+        for name in os.listdir(self.directory):
+            match = self.SEGMENT_RE.match(name)
+            if match:
+                seqs.append(int(match.group(1)))
+        return sorted(seqs)
+    
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    def _open_segment(self, seq):
+        if self._data_file:
+            self._data_file.close()
+            self._index_file.close()
+        
+        data_path, index_path = self._paths(seq)
+        self._data_file = open(data_path, 'ab', buffering=0)
+        self._index_file = open(index_path, 'ab', buffering=0)
+        
+        # Drop a partially written trailing index record left by a crash
+        index_size = os.fstat(self._index_file.fileno()).st_size
+        if index_size % INDEX_DTYPE.itemsize:
+            self._index_file.truncate(index_size - index_size % INDEX_DTYPE.itemsize)
+        
+        self._segment_seq = seq
+        first = self._read_index(seq, head=1)
+        self._started_at = float(first["timestamp"][0]) if first.size else None
+    
+    def _ensure_segment(self, latest):
+        """Open the active segment, following rotations done by other workers
+        
+        A segment is rotated once it reaches `max_segment_bytes`, or once
+        `latest` (the newest event time being appended) is
+        `max_segment_seconds` past the segment's first record. Both are
+        read from the files, so every worker and restart agrees.
+        """
+        if self._segment_seq is None:
+            seqs = self.segments()
+            self._open_segment(seqs[-1] if seqs else 0)
+        
+        while os.path.exists(self._paths(self._segment_seq + 1)[0]):
+            self._open_segment(self._segment_seq + 1)
+        
+        size = os.fstat(self._data_file.fileno()).st_size
+        expired = bool(self._started_at) and latest - self._started_at >= self.max_segment_seconds
+        if size > 0 and (size >= self.max_segment_bytes or expired):
+            self._rotate()
+    
+    def _rotate(self):
+        self._open_segment(self._segment_seq + 1)
+        logger.info(f"Event log rotated to segment {self._segment_seq}")
+        
+        if self.max_segments:
+            for seq in self.segments()[:-self.max_segments]:
+                for path in self._paths(seq):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._sealed_stats.pop(seq, None)
+    
+    def _adopt_legacy_file(self, legacy_file):
+        """Move a pre-segmentation event_logs.jsonl in as segment 0 and index it
+        
+        Workers booting together all try; the first one to take the write
+        lock adopts the file and the others find segments already present.
+        """
+        with self._write_lock():
+            if self.segments():
+                return
+            data_path, index_path = self._paths(0)
+            try:
+                os.replace(legacy_file, data_path)
+            except FileNotFoundError:
+                return
+            
+            records = []
+            offset = 0
+            with open(data_path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json_loads(line)
+                        records.append(self._index_record(entry, offset, len(line)))
+                    offset += len(line)
+            
+            with open(index_path, 'wb') as f:
+                f.write(np.array(records, dtype=INDEX_DTYPE).tobytes())
+        
+        logger.info(f"Adopted legacy log {legacy_file} ({len(records)} events)")
+    
+    @staticmethod
+    def _index_record(entry, offset, length):
+        try:
+            timestamp = parse_timestamp(entry["timestamp"])
+        except (TypeError, ValueError):
+            timestamp = 0.0
+        return (
+            timestamp,
+            offset,
+            length,
+            component_key(entry["component"]),
+            SEVERITY_CODES.get(entry["severity"], UNKNOWN_SEVERITY_CODE)
+        )
+    
+    # ---------------- writes ----------------
+    
+    def append(self, entries):
+        """Append log entries to the active segment with one data and one index write"""
+        if not entries:
+            return
+        
+        lines = [json_dumps(entry) + b'\n' for entry in entries]
+        index = np.array(
+            [self._index_record(entry, 0, len(line)) for entry, line in zip(entries, lines)],
+            dtype=INDEX_DTYPE
+        )
+        
+        with self._write_lock():
+            self._ensure_segment(float(index["timestamp"].max()))
+            base = os.fstat(self._data_file.fileno()).st_size
+            index["offset"] = base + np.cumsum(index["length"], dtype=np.uint64) - index["length"]
+            
+            # Data first, so an indexed line is always readable
+            self._data_file.write(b''.join(lines))
+            self._index_file.write(index.tobytes())
+            if self._started_at is None:
+                self._started_at = float(index["timestamp"][0])
+    
+    def sync(self):
+        """fsync the active segment data and index files"""
+        with self._lock:
+            if self._data_file:
+                os.fsync(self._data_file.fileno())
+                os.fsync(self._index_file.fileno())
+    
+    def close(self):
+        """Close the active segment files"""
+        with self._lock:
+            if self._data_file:
+                self._data_file.close()
+                self._index_file.close()
+                self._data_file = None
+                self._index_file = None
+                self._segment_seq = None
+    
+    # ---------------- reads ----------------
+    
+    def _read_index(self, seq, tail=None, head=None):
+        """Read a segment index, or only its last `tail` or first `head` records"""
+        index_path = self._paths(seq)[1]
+        try:
+            with open(index_path, 'rb') as f:
+                count = os.fstat(f.fileno()).st_size // INDEX_DTYPE.itemsize
+                first = max(0, count - tail) if tail is not None else 0
+                last = min(count, head) if head is not None else count
+                f.seek(first * INDEX_DTYPE.itemsize)
+                return np.frombuffer(f.read((last - first) * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+        except FileNotFoundError:
+            return np.empty(0, dtype=INDEX_DTYPE)
+    
+    def _segment_stats(self, seq, index, sealed):
+        stats = self._sealed_stats.get(seq)
+        if stats is None:
+            timestamps = index["timestamp"]
+            stats = (
+                float(timestamps.min()),
+                float(timestamps.max()),
+                bool(np.all(timestamps[1:] >= timestamps[:-1]))
+            )
+            if sealed:
+                self._sealed_stats[seq] = stats
+        return stats
+    
+    def _select(self, seq, index, sealed, start, end, component, severity):
+        """Narrow a segment index to the records matching the filters"""
+        if len(index) and (start is not None or end is not None):
+            min_ts, max_ts, is_sorted = self._segment_stats(seq, index, sealed)
+            if (start is not None and max_ts < start) or (end is not None and min_ts > end):
+                return index[:0]
+            
+            timestamps = index["timestamp"]
+            if is_sorted:
+                lo = np.searchsorted(timestamps, start, 'left') if start is not None else 0
+                hi = np.searchsorted(timestamps, end, 'right') if end is not None else len(index)
+                index = index[lo:hi]
+            else:
+                mask = np.ones(len(index), dtype=bool)
+                if start is not None:
+                    mask &= timestamps >= start
+                if end is not None:
+                    mask &= timestamps <= end
+                index = index[mask]
+        
+        if component is not None:
+            index = index[index["component"] == component_key(component)]
+        if severity is not None:
+            index = index[index["severity"] == SEVERITY_CODES.get(severity, UNKNOWN_SEVERITY_CODE)]
+        return index
+    
+    def _read_lines(self, seq, index):
+        """Read the raw lines referenced by index records"""
+        if not len(index):
+            return []
+        
+        offsets = index["offset"]
+        lengths = index["length"].astype(np.uint64)
+        try:
+            with open(self._paths(seq)[0], 'rb') as f:
+                if np.all(offsets[1:] == offsets[:-1] + lengths[:-1]):
+                    # Contiguous run: one seek and one read
+                    f.seek(int(offsets[0]))
+                    return f.read(int(offsets[-1] + lengths[-1] - offsets[0])).splitlines()
+                
+                lines = []
+                for offset, length in zip(offsets.tolist(), lengths.tolist()):
+                    f.seek(offset)
+                    lines.append(f.read(length).rstrip(b'\n'))
+                return lines
+        except FileNotFoundError:
+            return []
+    
+    def _verified_lines(self, lines, component):
+        if component is None:
+            return lines
+        # Guard against CRC32 collisions in the index
+        return [line for line in lines if json_loads(line)["component"] == component]
+    
+    def read(self, limit=None, start=None, end=None, component=None, severity=None):
+        """Return matching log entries, oldest first"""
+        return [json_loads(line) for line in self.read_lines(limit, start, end, component, severity)]
+    
+    def read_lines(self, limit=None, start=None, end=None, component=None, severity=None):
+        """Return matching raw log lines (JSON bytes), oldest first, reading newest segments first"""
+        filtered = not (start is None and end is None and component is None and severity is None)
+        seqs = self.segments()
+        
+        chunks = []
+        remaining = limit
+        for position, seq in enumerate(reversed(seqs)):
+            if remaining is not None and remaining <= 0:
+                break
+            
+            if filtered:
+                index = self._select(seq, self._read_index(seq), position > 0,
+                                     start, end, component, severity)
+                if remaining is not None:
+                    index = index[-remaining:]
+            else:
+                index = self._read_index(seq, tail=remaining)
+            
+            lines = self._verified_lines(self._read_lines(seq, index), component)
+            chunks.append(lines)
+            if remaining is not None:
+                remaining -= len(lines)
+        
+        return [line for chunk in reversed(chunks) for line in chunk]
+    
+    def iter_line_chunks(self, start=None, end=None, component=None, severity=None):
+        """Yield lists of raw matching lines, oldest first, one index chunk at a time"""
+        seqs = self.segments()
+        for position, seq in enumerate(seqs):
+            index = self._select(seq, self._read_index(seq), position < len(seqs) - 1,
+                                 start, end, component, severity)
+            for chunk_start in range(0, len(index), self.READ_CHUNK):
+                chunk = index[chunk_start:chunk_start + self.READ_CHUNK]
+                yield self._verified_lines(self._read_lines(seq, chunk), component)
+    
+    def iter_record_chunks(self, start=None, end=None, component=None, severity=None):
+        """Yield lists of decoded matching log entries, oldest first"""
+        for lines in self.iter_line_chunks(start, end, component, severity):
+            yield [json_loads(line) for line in lines]
+    
+    def iter_records(self, start=None, end=None, component=None, severity=None):
+        """Yield matching log entries oldest first"""
+        for records in self.iter_record_chunks(start, end, component, severity):
+            yield from records
+    
+    def has_events(self):
+        return self.count() > 0
+    
+    def query(self, spec):
+        """Run a query spec by streaming the index-filtered segments"""
+        return scan_query(self, spec)
+    
+    def version(self):
+        """Token that changes whenever entries are committed or a segment is dropped"""
+        seqs = self.segments()
+        if not seqs:
+            return ()
+        try:
+            size = os.path.getsize(self._paths(seqs[-1])[1])
+        except FileNotFoundError:
+            size = 0
+        return seqs[0], seqs[-1], size
+    
+    def count(self):
+        """Total number of indexed log entries"""
+        total = 0
+        for seq in self.segments():
+            try:
+                total += os.path.getsize(self._paths(seq)[1]) // INDEX_DTYPE.itemsize
+            except FileNotFoundError:
+                pass
+        return total
+
+
+# Event queries: filters, grouping and aggregates over any event store
+
+QUERY_NUMERIC_COLUMNS = ("voltage", "frequency", "network_latency", "voltage_deviation", "latency_deviation")
+QUERY_GROUP_COLUMNS = ("component", "severity", "alert_type", "is_anomaly", "bucket")
+QUERY_AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+
+class QueryError(ValueError):
+    """Raised for an invalid /query specification"""
+
+
+def parse_query_spec(args):
+    """Build a query spec (filters, grouping, aggregates, limit) from request arguments"""
+    try:
+        filters = parse_log_filters(args)
+    except ValueError:
+        raise QueryError("start/end must be ISO-8601 timestamps")
+    
+    is_anomaly = args.get('is_anomaly')
+    if is_anomaly is not None:
+        if is_anomaly.lower() not in ("true", "false"):
+            raise QueryError("is_anomaly must be true or false")
+        is_anomaly = is_anomaly.lower() == "true"
+    filters["is_anomaly"] = is_anomaly
+    
+    group_by = [column for column in args.get('group_by', '').split(',') if column]
+    for column in group_by:
+        if column not in QUERY_GROUP_COLUMNS:
+            raise QueryError(f"Cannot group by '{column}' (allowed: {', '.join(QUERY_GROUP_COLUMNS)})")
+    
+    interval = args.get('interval', default=3600, type=int)
+    if "bucket" in group_by and (interval is None or interval <= 0):
+        raise QueryError("interval must be a positive number of seconds")
+    
+    aggregates = []
+    for spec in [spec for spec in args.get('metrics', '').split(',') if spec]:
+        function, _, column = spec.partition(':')
+        if function not in QUERY_AGGREGATES:
+            raise QueryError(f"Unknown aggregate '{function}'")
+        if function == "count":
+            aggregates.append(("count", None))
+        elif column not in QUERY_NUMERIC_COLUMNS:
+            raise QueryError(f"'{function}' needs a numeric column: {', '.join(QUERY_NUMERIC_COLUMNS)}")
+        else:
+            aggregates.append((function, column))
+    if group_by and not aggregates:
+        aggregates = [("count", None)]
+    
+    return {
+        "filters": filters,
+        "group_by": group_by,
+        "interval": interval,
+        "aggregates": aggregates,
+        "limit": args.get('limit', default=100, type=int)
+    }
+
+
+def aggregate_name(function, column):
+    return function if column is None else f"{function}_{column}"
+
+
+class QueryAccumulator:
+    """Merges partial aggregates (count/sum/min/max per group) into final results
+    
+    Partial results come from storage partitions (SQL GROUP BY) or from
+    record chunks scanned in Python; avg is derived from sum and count.
+    """
+    
+    def __init__(self, group_by, aggregates, interval):
+        self.group_by = group_by
+        self.aggregates = aggregates
+        self.interval = interval
+        self.columns = sorted({column for _, column in aggregates if column is not None})
+        self.groups = {}
+    
+    def merge(self, key, count, sums, minimums, maximums):
+        state = self.groups.get(key)
+        if state is None:
+            self.groups[key] = [count, dict(sums), dict(minimums), dict(maximums)]
+            return
+        state[0] += count
+        for column in self.columns:
+            state[1][column] += sums[column]
+            state[2][column] = min(state[2][column], minimums[column])
+            state[3][column] = max(state[3][column], maximums[column])
+    
+    def add_records(self, records):
+        """Fold raw log entries (already filtered) into the groups"""
+        for record in records:
+            key = tuple(self._group_value(record, column) for column in self.group_by)
+            values = {column: record[column] for column in self.columns}
+            self.merge(key, 1, values, values, values)
+    
+    def _group_value(self, record, column):
+        if column == "bucket":
+            return int(parse_timestamp(record["timestamp"]) // self.interval) * self.interval
+        return record[column]
+    
+    def results(self):
+        rows = []
+        for key, (count, sums, minimums, maximums) in self.groups.items():
+            row = dict(zip(self.group_by, key))
+            if "bucket" in row:
+                row["bucket"] = datetime.fromtimestamp(row["bucket"], timezone.utc).isoformat()
+            if "is_anomaly" in row:
+                row["is_anomaly"] = bool(row["is_anomaly"])
+            for function, column in self.aggregates:
+                name = aggregate_name(function, column)
+                if function == "count":
+                    row[name] = count
+                elif function == "sum":
+                    row[name] = round(sums[column], 4)
+                elif function == "avg":
+                    row[name] = round(sums[column] / count, 4) if count else None
+                elif function == "min":
+                    row[name] = minimums[column]
+                else:
+                    row[name] = maximums[column]
+            rows.append(row)
+        rows.sort(key=lambda row: [str(row[column]) for column in self.group_by])
+        return rows
+
+
+def matches_filters(record, filters):
+    """Check a log entry against query filters (start/end in epoch seconds)"""
+    if filters.get("component") is not None and record["component"] != filters["component"]:
+        return False
+    if filters.get("severity") is not None and record["severity"] != filters["severity"]:
+        return False
+    if filters.get("is_anomaly") is not None and record["is_anomaly"] != filters["is_anomaly"]:
+        return False
+    if filters.get("start") is not None or filters.get("end") is not None:
+        timestamp = parse_timestamp(record["timestamp"])
+        if filters.get("start") is not None and timestamp < filters["start"]:
+            return False
+        if filters.get("end") is not None and timestamp > filters["end"]:
+            return False
+    return True
+
+
+def scan_query(store, spec):
+    """Evaluate a query by streaming a store's records (no storage pushdown)"""
+    filters = spec["filters"]
+    chunks = store.iter_record_chunks(filters["start"], filters["end"], filters["component"], filters["severity"])
+    
+    if not spec["aggregates"] and filters.get("is_anomaly") is None:
+        rows = store.read(spec["limit"], filters["start"], filters["end"],
+                          filters["component"], filters["severity"]) if spec["limit"] > 0 else []
+        return {"rows": rows, "count": len(rows)}
+    if not spec["aggregates"]:
+        rows = deque(maxlen=max(spec["limit"], 0))
+        for records in chunks:
+            rows.extend(record for record in records if matches_filters(record, filters))
+        return {"rows": list(rows), "count": len(rows)}
+    
+    accumulator = QueryAccumulator(spec["group_by"], spec["aggregates"], spec["interval"])
+    for records in chunks:
+        accumulator.add_records([record for record in records if matches_filters(record, filters)])
+    groups = accumulator.results()
+    return {"groups": groups, "total_groups": len(groups)}
+
+
+class SQLiteEventStore:
+    """Indexed SQLite event store, partitioned into one database file per month
+    
+    Time-range queries only open the partitions they overlap, and filters,
+    grouping and aggregates are pushed down into SQL over the
+    (ts), (component, ts) and (severity, ts) indexes of each partition.
+    Implements the same interface as SegmentedLogStore.
+    """
+    
+    PARTITION_RE = re.compile(r'^events-(\d{4})(\d{2})\.sqlite3$')
+    COLUMNS = ("timestamp", "component", "voltage", "frequency", "network_latency",
+               "voltage_deviation", "latency_deviation", "is_anomaly", "severity", "alert_type")
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS events (
+            ts REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            component TEXT NOT NULL,
+            voltage REAL,
+            frequency REAL,
+            network_latency REAL,
+            voltage_deviation REAL,
+            latency_deviation REAL,
+            is_anomaly INTEGER NOT NULL,
+            severity TEXT NOT NULL,
+            alert_type TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+        CREATE INDEX IF NOT EXISTS idx_events_component_ts ON events (component, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_severity_ts ON events (severity, ts);
+    """
+    READ_CHUNK = 4096
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connections = {}
+        os.makedirs(directory, exist_ok=True)
+    
+    # ---------------- partitions ----------------
+    
+    @staticmethod
+    def _partition_key(ts):
+        moment = datetime.fromtimestamp(ts, timezone.utc)
+        return moment.year * 100 + moment.month
+    
+    @staticmethod
+    def _partition_bounds(key):
+        year, month = divmod(key, 100)
+        start = datetime(year, month, 1, tzinfo=timezone.utc)
+        end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        return start.timestamp(), end.timestamp()
+    
+    def partitions(self, start=None, end=None):
+        """Partition keys (YYYYMM) overlapping [start, end], oldest first"""
+        keys = []
+        for name in os.listdir(self.directory):
+            match = self.PARTITION_RE.match(name)
+            if not match:
+                continue
+            key = int(match.group(1)) * 100 + int(match.group(2))
+            lower, upper = self._partition_bounds(key)
+            if (start is None or upper > start) and (end is None or lower <= end):
+                keys.append(key)
+        return sorted(keys)
+    
+    def _connection(self, key):
+        if self._pid != os.getpid():
+            self._connections = {}
+            self._pid = os.getpid()
+        conn = self._connections.get(key)
+        if conn is None:
+            path = os.path.join(self.directory, f"events-{key}.sqlite3")
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._connections[key] = conn
+        return conn
+    
+    @staticmethod
+    def _where(filters):
+        clauses, params = [], []
+        for column, operator, key in (("ts", ">=", "start"), ("ts", "<=", "end"),
+                                      ("component", "=", "component"), ("severity", "=", "severity"),
+                                      ("is_anomaly", "=", "is_anomaly")):
+            value = filters.get(key)
+            if value is not None:
+                clauses.append(f"{column} {operator} ?")
+                params.append(int(value) if key == "is_anomaly" else value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def _to_entry(self, row):
+        entry = dict(zip(self.COLUMNS, row))  # Ignores trailing ts/rowid
+        entry["is_anomaly"] = bool(entry["is_anomaly"])
+        return entry
+    
+    # ---------------- writes ----------------
+    
+    def append(self, entries):
+        """Insert log entries into their monthly partitions, one transaction per partition"""
+        by_partition = {}
+        for entry in entries:
+            try:
+                ts = parse_timestamp(entry["timestamp"])
+            except (TypeError, ValueError):
+                ts = time.time()
+            row = (ts,) + tuple(entry.get(column) for column in self.COLUMNS)
+            by_partition.setdefault(self._partition_key(ts), []).append(row)
+        
+        placeholders = ", ".join("?" * (len(self.COLUMNS) + 1))
+        with self._lock:
+            for key, rows in by_partition.items():
+                conn = self._connection(key)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        f"INSERT INTO events (ts, {', '.join(self.COLUMNS)}) VALUES ({placeholders})", rows
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+    
+    def sync(self):
+        """Checkpoint the WAL of every open partition"""
+        with self._lock:
+            for conn in self._connections.values():
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    
+    def close(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections = {}
+    
+    # ---------------- reads ----------------
+    
+    def _select_rows(self, key, filters, order, limit=None, after=None):
+        """Matching rows (COLUMNS, then ts and rowid) in (ts, rowid) order
+        
+        `after` is the (ts, rowid) of the last row of the previous page:
+        keyset paging seeks straight to it on the index instead of
+        skipping an OFFSET of rows, so each page costs the same.
+        """
+        where, params = self._where(filters)
+        if after is not None:
+            where += (" AND " if where else " WHERE ") + "(ts, rowid) > (?, ?)"
+            params += list(after)
+        sql = f"SELECT {', '.join(self.COLUMNS)}, ts, rowid FROM events{where} ORDER BY ts {order}, rowid {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return self._connection(key).execute(sql, params).fetchall()
+    
+    def read(self, limit=None, start=None, end=None, component=None, severity=None, is_anomaly=None):
+        """Return matching entries oldest first (the most recent `limit` if given)"""
+        filters = {"start": start, "end": end, "component": component,
+                   "severity": severity, "is_anomaly": is_anomaly}
+        if limit is None:
+            return [entry for chunk in self.iter_record_chunks(start, end, component, severity)
+                    for entry in chunk if is_anomaly is None or entry["is_anomaly"] == is_anomaly]
+        
+        collected = []
+        for key in reversed(self.partitions(start, end)):
+            if len(collected) >= limit:
+                break
+            rows = self._select_rows(key, filters, "DESC", limit - len(collected))
+            collected.extend(self._to_entry(row) for row in rows)
+        return list(reversed(collected))
+    
+    def read_lines(self, limit=None, start=None, end=None, component=None, severity=None):
+        """Return matching entries serialized as JSON lines, oldest first"""
+        return [json_dumps(entry) for entry in self.read(limit, start, end, component, severity)]
+    
+    def iter_record_chunks(self, start=None, end=None, component=None, severity=None):
+        """Yield lists of matching entries oldest first, READ_CHUNK rows at a time"""
+        filters = {"start": start, "end": end, "component": component, "severity": severity}
+        for key in self.partitions(start, end):
+            after = None
+            while True:
+                rows = self._select_rows(key, filters, "ASC", self.READ_CHUNK, after)
+                if not rows:
+                    break
+                yield [self._to_entry(row) for row in rows]
+                after = rows[-1][-2:]
+    
+    def iter_line_chunks(self, start=None, end=None, component=None, severity=None):
+        """Yield lists of matching entries serialized as JSONL lines"""
+        for records in self.iter_record_chunks(start, end, component, severity):
+            yield [json_dumps(record) for record in records]
+    
+    def iter_records(self, start=None, end=None, component=None, severity=None):
+        for records in self.iter_record_chunks(start, end, component, severity):
+            yield from records
+    
+    def version(self):
+        """Token that changes whenever entries are committed or a partition is dropped"""
+        version = []
+        for key in self.partitions():
+            with self._lock:
+                version.append((key, self._connection(key).execute("SELECT MAX(rowid) FROM events").fetchone()[0]))
+        return tuple(version)
+    
+    def count(self):
+        total = 0
+        for key in self.partitions():
+            with self._lock:
+                total += self._connection(key).execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        return total
+    
+    def has_events(self):
+        for key in self.partitions():
+            with self._lock:
+                if self._connection(key).execute("SELECT 1 FROM events LIMIT 1").fetchone():
+                    return True
+        return False
+    
+    def query(self, spec):
+        """Run a query spec with filters and aggregates pushed down into SQL"""
+        filters = spec["filters"]
+        if not spec["aggregates"]:
+            rows = self.read(max(spec["limit"], 0), **filters) if spec["limit"] > 0 else []
+            return {"rows": rows, "count": len(rows)}
+        
+        accumulator = QueryAccumulator(spec["group_by"], spec["aggregates"], spec["interval"])
+        group_sql = [
+            "CAST(ts / ? AS INTEGER) * ?" if column == "bucket" else column
+            for column in spec["group_by"]
+        ]
+        select = list(group_sql) + ["COUNT(*)"]
+        for column in accumulator.columns:
+            select += [f"SUM({column})", f"MIN({column})", f"MAX({column})"]
+        
+        where, where_params = self._where(filters)
+        sql = f"SELECT {', '.join(select)} FROM events{where}"
+        if group_sql:
+            sql += f" GROUP BY {', '.join(str(i + 1) for i in range(len(group_sql)))}"
+        
+        bucket_params = [spec["interval"], spec["interval"]] if "bucket" in spec["group_by"] else []
+        for key in self.partitions(filters["start"], filters["end"]):
+            with self._lock:
+                rows = self._connection(key).execute(sql, bucket_params + where_params).fetchall()
+            width = len(group_sql)
+            for row in rows:
+                count = row[width]
+                if not count:
+                    continue
+                values = row[width + 1:]
+                sums = {c: values[3 * i] for i, c in enumerate(accumulator.columns)}
+                minimums = {c: values[3 * i + 1] for i, c in enumerate(accumulator.columns)}
+                maximums = {c: values[3 * i + 2] for i, c in enumerate(accumulator.columns)}
+                accumulator.merge(tuple(row[:width]), count, sums, minimums, maximums)
+        
+        groups = accumulator.results()
+        return {"groups": groups, "total_groups": len(groups)}
+
+
+class AsyncLogWriter:
+    """Background group-commit writer in front of a SegmentedLogStore
+    
+    Request threads only enqueue log entries. A dedicated thread collects
+    them into batches, committing when `max_batch` entries are pending or
+    `flush_interval` seconds have passed since the first one arrived, and
+    fsyncs according to `fsync_policy`:
+    
+    - "never": leave durability to the OS page cache
+    - "interval": fsync at most once every `fsync_interval` seconds, and
+      once more when the writer goes idle with unsynced commits
+    - "batch": fsync after every committed batch
+    
+    A batch the store fails to append is dropped, counted in
+    `failed_entries`, and reported to the flushes waiting on it.
+    """
+    
+    FSYNC_POLICIES = ("never", "interval", "batch")
+    _STOP = object()
+    
+    class _FlushRequest(threading.Event):
+        """A flush waiter; `failed` is set when a write it waited for was dropped"""
+        failed = False
+    
+    def __init__(self, store, max_batch=512, flush_interval=0.2,
+                 fsync_policy="interval", fsync_interval=1.0, max_pending=10000):
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy must be one of {self.FSYNC_POLICIES}")
+        
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._counts_lock = threading.Lock()
+        self._submitted = 0  # Batches submitted / committed, to skip flushes with nothing pending
+        self._committed = 0
+        self.failed_entries = 0  # Entries dropped because the store failed to append them
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, entries):
+        """Queue log entries for the writer thread (blocks only when the queue is full)"""
+        if self._closed:
+            self.store.append(entries)
+            return
+        with self._counts_lock:
+            self._submitted += 1
+        self._queue.put(entries)
+    
+    def pending(self):
+        """Whether submitted entries are still waiting to be committed"""
+        with self._counts_lock:
+            return self._committed < self._submitted
+    
+    def flush(self, timeout=None):
+        """Wait (at most `timeout` seconds) until everything submitted so far has been written
+        
+        Returns False if the wait timed out or a batch it waited for failed to commit.
+        """
+        if self._closed or not self._thread.is_alive() or not self.pending():
+            return True
+        done = self._FlushRequest()
+        self._queue.put(done)
+        return done.wait(timeout) and not done.failed
+    
+    def queue_depth(self):
+        """Number of submitted batches not yet picked up by the writer"""
+        return self._queue.qsize()
+    
+    def close(self, timeout=10.0):
+        """Drain pending entries, fsync and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        
+        # Commit and release anything that raced in behind the stop marker
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not self._STOP:
+                self.store.append(item)
+        self.store.sync()
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            waiters = []
+            batches = 0
+            
+            # Idle: with unsynced commits, wake up to fsync when the interval is due
+            try:
+                item = self._queue.get(timeout=self._sync_due() if self._unsynced else None)
+            except queue.Empty:
+                self._sync()
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.extend(item)
+                    batches += 1
+                
+                if stopping or waiters or len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            
+            # Anything already queued rides along with this commit
+            while not stopping and len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.extend(item)
+                    batches += 1
+            
+            committed = self._commit(batch)
+            with self._counts_lock:
+                self._committed += batches
+                if not committed:
+                    self.failed_entries += len(batch)
+            for waiter in waiters:
+                waiter.failed = not committed
+                waiter.set()
+    
+    def _commit(self, batch):
+        """Append a batch and fsync per the policy; returns False if the append failed"""
+        if not batch:
+            return True
+        try:
+            self.store.append(batch)
+        except Exception as e:
+            logger.error(f"Event log writer failed to commit {len(batch)} entries: {str(e)}")
+            return False
+        
+        self._unsynced = True
+        if self.fsync_policy == "batch" or (self.fsync_policy == "interval" and self._sync_due() == 0.0):
+            self._sync()
+        return True
+    
+    def _sync_due(self):
+        """Seconds until the interval policy's next fsync is due"""
+        return max(0.0, self._last_sync + self.fsync_interval - time.monotonic())
+    
+    def _sync(self):
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        try:
+            self.store.sync()
+        except Exception as e:
+            logger.error(f"Event log writer failed to sync: {str(e)}")
+
+
+class EventLogger:
+    """Structured logging system for grid events"""
+    
+    LOG_FILE = "event_logs.jsonl"  # Legacy single-file log, adopted on first start
+    LOG_DIR = EVENT_LOG_DIR
+    
+    _store = None
+    _writer = None
+    _store_lock = threading.Lock()
+    
+    @staticmethod
+    def get_store():
+        """Return the configured event store, opening it on first use"""
+        if EventLogger._store is None:
+            with EventLogger._store_lock:
+                if EventLogger._store is None and EVENT_STORE == "sqlite":
+                    EventLogger._store = SQLiteEventStore(EVENT_STORE_DIR)
+                    EventLogger._warn_unimported_segments()
+                elif EventLogger._store is None:
+                    EventLogger._store = SegmentedLogStore(
+                        EventLogger.LOG_DIR,
+                        max_segment_bytes=EVENT_LOG_SEGMENT_BYTES,
+                        max_segment_seconds=EVENT_LOG_SEGMENT_SECONDS,
+                        max_segments=EVENT_LOG_MAX_SEGMENTS,
+                        legacy_file=EventLogger.LOG_FILE
+                    )
+        return EventLogger._store
+    
+    @staticmethod
+    def _warn_unimported_segments():
+        """Point at import_logs.py when the SQLite store starts empty beside segment logs"""
+        segment_logs = os.path.isdir(EventLogger.LOG_DIR) and any(
+            name.startswith("segment-") for name in os.listdir(EventLogger.LOG_DIR)
+        )
+        if (segment_logs or os.path.exists(EventLogger.LOG_FILE)) and not EventLogger._store.has_events():
+            logger.warning(f"EVENT_STORE=sqlite starts empty; existing segment logs in {EventLogger.LOG_DIR} "
+                           f"are not read. Run 'python import_logs.py' to import them")
+    
+    @staticmethod
+    def get_writer():
+        """Return the background writer, starting it on first use (None in sync mode)"""
+        if not EVENT_LOG_ASYNC:
+            return None
+        if EventLogger._writer is None:
+            store = EventLogger.get_store()
+            with EventLogger._store_lock:
+                if EventLogger._writer is None:
+                    EventLogger._writer = AsyncLogWriter(
+                        store,
+                        max_batch=EVENT_LOG_FLUSH_BATCH,
+                        flush_interval=EVENT_LOG_FLUSH_INTERVAL,
+                        fsync_policy=EVENT_LOG_FSYNC,
+                        fsync_interval=EVENT_LOG_FSYNC_INTERVAL
+                    )
+                    atexit.register(EventLogger.shutdown)
+        return EventLogger._writer
+    
+    @staticmethod
+    def shutdown():
+        """Drain the background writer and close the log store"""
+        if EventLogger._writer is not None:
+            EventLogger._writer.close()
+        if EventLogger._store is not None:
+            EventLogger._store.close()
+    
+    @staticmethod
+    def _write(entries):
+        writer = EventLogger.get_writer()
+        if writer is not None:
+            writer.submit(entries)
+        else:
+            EventLogger.get_store().append(entries)
+    
+    @staticmethod
+    def build_log_entry(event_data):
+        """Flatten a processed result (ProcessedEvent) into a log entry"""
+        event, metrics, detection = event_data.event, event_data.behavioral_metrics, event_data.detection
+        return {
+            "timestamp": event.timestamp,
+            "component": event.component,
+            "voltage": event.voltage,
+            "frequency": event.frequency,
+            "network_latency": event.network_latency,
+            "voltage_deviation": metrics.voltage_deviation,
+            "latency_deviation": metrics.latency_deviation,
+            "is_anomaly": detection.is_anomaly,
+            "severity": detection.severity.value,
+            "alert_type": detection.alert_type
+        }
+    
+    @staticmethod
+    def log_event(event_data):
+        """Log event to the segmented event log"""
+        log_entry = EventLogger.build_log_entry(event_data)
+        EventLogger._write([log_entry])
+        
+        log_event_diag("Event logged: %s", log_entry["alert_type"], event=log_entry,
+                       is_anomaly=log_entry["is_anomaly"], severity=log_entry["severity"])
+    
+    @staticmethod
+    def log_events(events_data):
+        """Log a batch of events, committed as one data and index write"""
+        if not events_data:
+            return
+        
+        entries = [EventLogger.build_log_entry(event_data) for event_data in events_data]
+        EventLogger._write(entries)
+        
+        logger.info("Batch logged: %d events", len(entries))
+    
+    @staticmethod
+    def catch_up():
+        """Read-your-writes for readers: wait (at most EVENT_LOG_READ_WAIT) for queued entries
+        
+        Returns at once when nothing is queued, so readers only wait on the
+        writer while writes are in flight, and never for long. Returns False
+        if the wait timed out with writes still queued.
+        """
+        writer = EventLogger.get_writer()
+        return writer is None or writer.flush(EVENT_LOG_READ_WAIT)
+    
+    @staticmethod
+    def writes_pending():
+        """Whether entries submitted in this worker are still waiting to be committed"""
+        writer = EventLogger.get_writer()
+        return writer is not None and writer.pending()
+    
+    @staticmethod
+    def write_failures():
+        """Entries this worker's background writer dropped because the store failed to append them"""
+        writer = EventLogger._writer
+        return writer.failed_entries if writer is not None else 0
+    
+    @staticmethod
+    def version():
+        """Token that changes whenever the event store's contents change"""
+        return EventLogger.get_store().version()
+    
+    @staticmethod
+    def get_logs(limit=None, start=None, end=None, component=None, severity=None):
+        """Retrieve logged events, optionally filtered by time range, component and severity
+        
+        `start`/`end` are epoch seconds. With `limit`, the most recent matching
+        entries are returned and the cost is proportional to `limit`.
+        """
+        EventLogger.catch_up()
+        return EventLogger.get_store().read(limit or None, start, end, component, severity)
+    
+    @staticmethod
+    def get_log_lines(limit=None, start=None, end=None, component=None, severity=None):
+        """Like get_logs, but return the stored JSON lines without decoding them"""
+        EventLogger.catch_up()
+        return EventLogger.get_store().read_lines(limit or None, start, end, component, severity)
+    
+    @staticmethod
+    def query(spec):
+        """Run a /query spec against the event store (pushed down where supported)"""
+        EventLogger.catch_up()
+        return EventLogger.get_store().query(spec)
+    
+    @staticmethod
+    def iter_log_chunks(raw=False, start=None, end=None, component=None, severity=None):
+        """Stream logged events in bounded chunks (raw JSONL lines if `raw`)"""
+        EventLogger.catch_up()
+        store = EventLogger.get_store()
+        if raw:
+            return store.iter_line_chunks(start, end, component, severity)
+        return store.iter_record_chunks(start, end, component, severity)
+
+
+# ========================================================
+# LOG EXPORT
+# ========================================================
+
+EXPORT_COLUMNS = (
+    "timestamp", "component", "voltage", "frequency", "network_latency",
+    "voltage_deviation", "latency_deviation", "is_anomaly", "severity", "alert_type"
+)
+CSV_HEADER = ("Timestamp", "Component", "Voltage", "Frequency", "Latency",
+              "V_Deviation", "L_Deviation", "Anomaly", "Severity", "Alert_Type")
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "grid_events.csv"),
+    "ndjson": ("application/x-ndjson", "grid_events.jsonl"),
+    "parquet": ("application/vnd.apache.parquet", "grid_events.parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "grid_events.arrows")
+}
+
+
+class _ExportSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after each batch"""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_csv(record_chunks):
+    """Yield CSV text chunk by chunk (values are quoted as needed)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(CSV_HEADER)
+    
+    for records in record_chunks:
+        writer.writerows([record.get(column) for column in EXPORT_COLUMNS] for record in records)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    yield buffer.getvalue()
+
+
+def stream_ndjson(line_chunks):
+    """Yield the stored JSONL lines unchanged"""
+    for lines in line_chunks:
+        if lines:
+            yield b'\n'.join(lines) + b'\n'
+
+
+def export_schema():
+    """Arrow schema for columnar exports"""
+    return pa.schema([
+        ("timestamp", pa.string()),
+        ("component", pa.string()),
+        ("voltage", pa.float64()),
+        ("frequency", pa.float64()),
+        ("network_latency", pa.float64()),
+        ("voltage_deviation", pa.float64()),
+        ("latency_deviation", pa.float64()),
+        ("is_anomaly", pa.bool_()),
+        ("severity", pa.string()),
+        ("alert_type", pa.string())
+    ])
+
+
+def stream_columnar(record_chunks, export_format):
+    """Yield a Parquet file (one row group per chunk) or an Arrow IPC stream"""
+    schema = export_schema()
+    sink = _ExportSink()
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    
+    for records in record_chunks:
+        table = pa.Table.from_pylist(
+            [{column: record.get(column) for column in EXPORT_COLUMNS} for record in records],
+            schema=schema
+        )
+        writer.write_table(table)
+        yield sink.drain()
+    
+    writer.close()
+    yield sink.drain()
+
+
+class ExportError(ValueError):
+    """Raised for an /export request that cannot be served; carries the HTTP status"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def open_export(args):
+    """Validate /export arguments and return (body iterator, mimetype, filename)"""
+    export_format = args.get('format', default='csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported format '{export_format}'")
+    if export_format in ("parquet", "arrow") and pa is None:
+        raise ExportError(f"{export_format} export requires pyarrow", 501)
+    
+    try:
+        filters = parse_log_filters(args)
+    except ValueError:
+        raise ExportError("start/end must be ISO-8601 timestamps")
+    
+    # Commit queued entries first, so an export right after a write sees it
+    EventLogger.catch_up()
+    if not EventLogger.get_store().has_events():
+        raise ExportError("No logs available", 404)
+    
+    if export_format == "ndjson":
+        body = stream_ndjson(EventLogger.iter_log_chunks(raw=True, **filters))
+    elif export_format == "csv":
+        body = stream_csv(EventLogger.iter_log_chunks(**filters))
+    else:
+        body = stream_columnar(EventLogger.iter_log_chunks(**filters), export_format)
+    
+    mimetype, filename = EXPORT_FORMATS[export_format]
+    return body, mimetype, filename
+
+
+# ========================================================
+# METRICS TRACKING
+# ========================================================
+
+def metrics_snapshot(total_events, total_anomalies):
+    """Build the /metrics payload from the raw counters"""
+    detection_rate = 0.0
+    if total_events > 0:
+        detection_rate = round((total_anomalies / total_events) * 100, 2)
+    return {
+        "total_events": total_events,
+        "total_anomalies": total_anomalies,
+        "detection_rate": detection_rate
+    }
+
+
+class HistoryRing:
+    """Fixed-capacity ring of pre-serialized JSON records with O(1) appends"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._appends = 0
+    
+    def extend(self, payloads):
+        for payload in payloads:
+            self._slots[self._appends % self.capacity] = payload
+            self._appends += 1
+    
+    def latest(self, limit):
+        """Return up to `limit` most recent payloads (all if limit <= 0), oldest first"""
+        stored = len(self)
+        count = min(limit, stored) if limit > 0 else stored
+        start = (self._appends - count) % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            return self._slots[start:end]
+        return self._slots[start:] + self._slots[:end - self.capacity]
+    
+    @property
+    def appends(self):
+        """Total number of payloads ever appended"""
+        return self._appends
+    
+    def since(self, cursor):
+        """Return (new_cursor, payloads appended after `cursor`) still held in the ring"""
+        first = max(cursor, self._appends - self.capacity)
+        return self._appends, self.latest(self._appends - first) if self._appends > first else []
+    
+    def __len__(self):
+        return min(self._appends, self.capacity)
+
+
+class MetricsBackend(ABC):
+    """Interface and shared behaviour of the metrics/history backends
+    
+    History records are stored as pre-serialized JSON payloads, so
+    `history_json` can splice them into a response without re-encoding.
+    """
+    
+    @abstractmethod
+    def record(self, event_count, anomaly_count, payloads=()):
+        """Add to the counters and append history payloads"""
+    
+    @abstractmethod
+    def snapshot(self):
+        """Return the /metrics payload"""
+    
+    @abstractmethod
+    def history_json(self, limit):
+        """Return the most recent history records as a JSON array (bytes)"""
+    
+    def history(self, limit):
+        """Return the most recent history records as dicts, oldest first"""
+        return json_loads(self.history_json(limit))
+    
+    @abstractmethod
+    def history_since(self, cursor):
+        """Return (new_cursor, payloads recorded after `cursor`); cursor None = now"""
+    
+    @abstractmethod
+    def history_size(self):
+        """Number of history records currently held"""
+    
+    @abstractmethod
+    def sequence(self):
+        """Event sequence number: the total events recorded, bumped by every write"""
+
+
+class LocalMetricsBackend(MetricsBackend):
+    """Per-process counters and history (single worker / development)"""
+    
+    def __init__(self, history_capacity):
+        self.history_capacity = history_capacity
+        self._lock = threading.Lock()
+        self._total_events = 0
+        self._total_anomalies = 0
+        self._history = HistoryRing(history_capacity)
+    
+    def record(self, event_count, anomaly_count, payloads=()):
+        with self._lock:
+            self._total_events += event_count
+            self._total_anomalies += anomaly_count
+            self._history.extend(payloads[-self.history_capacity:])
+    
+    def snapshot(self):
+        with self._lock:
+            return metrics_snapshot(self._total_events, self._total_anomalies)
+    
+    def sequence(self):
+        return self._total_events
+    
+    def history_json(self, limit):
+        with self._lock:
+            payloads = self._history.latest(limit)
+        return b'[' + b','.join(payloads) + b']'
+    
+    def history_since(self, cursor):
+        with self._lock:
+            return self._history.since(self._history.appends if cursor is None else cursor)
+    
+    def history_size(self):
+        return len(self._history)
+
+
+class MmapMetricsBackend(MetricsBackend):
+    """Counters and a history ring in a memory-mapped file shared by all workers
+    
+    Layout: a 64-byte header (magic, capacity, slot size, total events,
+    total anomalies, history appends) followed by `capacity` fixed-size
+    slots, each a 4-byte length plus a JSON payload. Updates take an
+    exclusive flock on the file; reads take a shared one.
+    """
+    
+    MAGIC = b'GRIDMET1'
+    HEADER = struct.Struct('<8sIIQQQ')
+    HEADER_SIZE = 64
+    SLOT_LENGTH = struct.Struct('<I')
+    
+    def __init__(self, path, history_capacity, slot_bytes):
+        self.path = path
+        self.history_capacity = history_capacity
+        self.slot_bytes = slot_bytes
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        self._map = None
+    
+    def _open(self):
+        """(Re)open the mapping; flock is per open file, so each worker needs its own"""
+        if self._pid == os.getpid():
+            return
+        
+        size = self.HEADER_SIZE + self.history_capacity * self.slot_bytes
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            self._file.seek(0)
+            header = self._file.read(self.HEADER.size)
+            valid = (
+                len(header) == self.HEADER.size
+                and self.HEADER.unpack(header)[:3] == (self.MAGIC, self.history_capacity, self.slot_bytes)
+                and os.fstat(self._file.fileno()).st_size == size
+            )
+            if not valid:
+                # New file, or the layout changed: start from empty state
+                self._file.truncate(0)
+                self._file.truncate(size)
+                self._file.seek(0)
+                self._file.write(self.HEADER.pack(self.MAGIC, self.history_capacity, self.slot_bytes, 0, 0, 0))
+                self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), size)
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._pid = os.getpid()
+    
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+    
+    def _counters(self):
+        _, _, _, total_events, total_anomalies, appends = self.HEADER.unpack_from(self._map, 0)
+        return total_events, total_anomalies, appends
+    
+    def record(self, event_count, anomaly_count, payloads=()):
+        fitting = []
+        for payload in payloads[-self.history_capacity:]:
+            if len(payload) + self.SLOT_LENGTH.size > self.slot_bytes:
+                logger.warning(f"History record of {len(payload)} bytes exceeds slot size; not stored")
+                continue
+            fitting.append(payload)
+        
+        with self._locked(exclusive=True):
+            total_events, total_anomalies, appends = self._counters()
+            for payload in fitting:
+                slot = self.HEADER_SIZE + (appends % self.history_capacity) * self.slot_bytes
+                self.SLOT_LENGTH.pack_into(self._map, slot, len(payload))
+                self._map[slot + self.SLOT_LENGTH.size:slot + self.SLOT_LENGTH.size + len(payload)] = payload
+                appends += 1
+            self.HEADER.pack_into(
+                self._map, 0, self.MAGIC, self.history_capacity, self.slot_bytes,
+                total_events + event_count, total_anomalies + anomaly_count, appends
+            )
+    
+    def snapshot(self):
+        with self._locked(exclusive=False):
+            total_events, total_anomalies, _ = self._counters()
+        return metrics_snapshot(total_events, total_anomalies)
+    
+    def sequence(self):
+        with self._locked(exclusive=False):
+            return self._counters()[0]
+    
+    def history_json(self, limit):
+        with self._locked(exclusive=False):
+            appends = self._counters()[2]
+            stored = min(appends, self.history_capacity)
+            count = min(limit, stored) if limit > 0 else stored
+            view = memoryview(self._map)
+            payloads = []
+            for position in range(appends - count, appends):
+                slot = self.HEADER_SIZE + (position % self.history_capacity) * self.slot_bytes
+                (length,) = self.SLOT_LENGTH.unpack_from(self._map, slot)
+                payloads.append(view[slot + self.SLOT_LENGTH.size:slot + self.SLOT_LENGTH.size + length])
+            # Join while locked: the slot views are only stable until the next write
+            body = b'[' + b','.join(payloads) + b']'
+            payloads.clear()
+            view.release()
+        return body
+    
+    def history_since(self, cursor):
+        with self._locked(exclusive=False):
+            appends = self._counters()[2]
+            if cursor is None:
+                return appends, []
+            payloads = []
+            for position in range(max(cursor, appends - self.history_capacity), appends):
+                slot = self.HEADER_SIZE + (position % self.history_capacity) * self.slot_bytes
+                (length,) = self.SLOT_LENGTH.unpack_from(self._map, slot)
+                payloads.append(self._map[slot + self.SLOT_LENGTH.size:slot + self.SLOT_LENGTH.size + length])
+        return appends, payloads
+    
+    def history_size(self):
+        with self._locked(exclusive=False):
+            return min(self._counters()[2], self.history_capacity)
+
+
+class SQLiteMetricsBackend(MetricsBackend):
+    """Counters and history in a WAL-mode SQLite database shared by all workers"""
+    
+    def __init__(self, path, history_capacity):
+        self.path = path
+        self.history_capacity = history_capacity
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+    
+    def _connection(self):
+        if self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS history (seq INTEGER PRIMARY KEY AUTOINCREMENT, payload BLOB NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO counters VALUES ('total_events', 0), ('total_anomalies', 0)")
+            self._pid = os.getpid()
+        return self._conn
+    
+    def record(self, event_count, anomaly_count, payloads=()):
+        rows = [(payload,) for payload in payloads[-self.history_capacity:]]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE counters SET value = value + ? WHERE name = 'total_events'", (event_count,))
+                conn.execute("UPDATE counters SET value = value + ? WHERE name = 'total_anomalies'", (anomaly_count,))
+                if rows:
+                    conn.executemany("INSERT INTO history (payload) VALUES (?)", rows)
+                    conn.execute(
+                        "DELETE FROM history WHERE seq <= (SELECT MAX(seq) FROM history) - ?",
+                        (self.history_capacity,)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._connection().execute("SELECT name, value FROM counters"))
+        return metrics_snapshot(counters["total_events"], counters["total_anomalies"])
+    
+    def sequence(self):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT value FROM counters WHERE name = 'total_events'"
+            ).fetchone()[0]
+    
+    def history_json(self, limit):
+        count = limit if limit > 0 else self.history_capacity
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT payload FROM history ORDER BY seq DESC LIMIT ?", (count,)
+            ).fetchall()
+        return b'[' + b','.join(bytes(payload) for (payload,) in reversed(rows)) + b']'
+    
+    def history_since(self, cursor):
+        with self._lock:
+            conn = self._connection()
+            if cursor is None:
+                return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM history").fetchone()[0], []
+            rows = conn.execute(
+                "SELECT seq, payload FROM history WHERE seq > ? ORDER BY seq LIMIT ?",
+                (cursor, self.history_capacity)
+            ).fetchall()
+        if not rows:
+            return cursor, []
+        return rows[-1][0], [bytes(payload) for _, payload in rows]
+    
+    def history_size(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+
+def create_metrics_backend(kind, history_capacity=None, name="grid_state"):
+    """Build the configured metrics/history backend (state files are named after `name`)"""
+    history_capacity = history_capacity or HISTORY_CAPACITY
+    if kind == "mmap" and fcntl is None:
+        logger.warning("mmap metrics backend needs fcntl; falling back to local")
+        kind = "local"
+    
+    if kind == "mmap":
+        return MmapMetricsBackend(
+            os.path.join(METRICS_STATE_DIR, f"{name}.mmap"), history_capacity, HISTORY_SLOT_BYTES
+        )
+    if kind == "sqlite":
+        return SQLiteMetricsBackend(os.path.join(METRICS_STATE_DIR, f"{name}.sqlite3"), history_capacity)
+    if kind == "local":
+        return LocalMetricsBackend(history_capacity)
+    raise ValueError(f"Unknown METRICS_BACKEND '{kind}'")
+
+
+metrics_backend = create_metrics_backend(METRICS_BACKEND)
+
+# The /stream feed follows its own ring, sized for whole batches, so no
+# result of a batch is lost to the (much smaller) /history capacity
+stream_ring = create_metrics_backend(METRICS_BACKEND, STREAM_RING_CAPACITY, "stream_ring")
+
+
+def record_events(results, published=None):
+    """Update shared metrics with processed results, and history with the `published` ones (default: all)"""
+    anomaly_count = sum(1 for result in results if result.detection.is_anomaly)
+    published = results if published is None else published
+    
+    # Serialize once; the history and stream rings store and serve these bytes as-is
+    payloads = [json_dumps(result) for result in published]
+    metrics_backend.record(len(results), anomaly_count, payloads[-HISTORY_CAPACITY:])
+    stream_ring.record(0, 0, payloads)
+    window_aggregator.record(results)
+    ThreatModelingLayer.observe(results)
+    pipeline_metrics.count_events(results)
+    detection_broadcaster.notify(lost=max(len(payloads) - STREAM_RING_CAPACITY, 0))
+    return anomaly_count
+
+
+# ========================================================
+# TIME-WINDOWED AGGREGATION
+# ========================================================
+
+class WindowedAggregator:
+    """Per-component and per-severity event counts over sliding windows
+    
+    Each window is a ring of fixed-width time buckets (e.g. 60 one-second
+    buckets for 1 minute). Recording touches one bucket per window and a
+    query sums at most `buckets` buckets, independent of event volume.
+    Buckets are keyed by arrival time in this worker.
+    """
+    
+    def __init__(self, windows):
+        self.windows = windows  # name -> (window_seconds, bucket_seconds)
+        self._lock = threading.Lock()
+        self._rings = {}
+        for name, (window_seconds, bucket_seconds) in windows.items():
+            size = int(window_seconds // bucket_seconds)
+            self._rings[name] = {
+                "ids": [-1] * size,
+                "buckets": [self._empty_bucket() for _ in range(size)]
+            }
+    
+    @staticmethod
+    def _empty_bucket():
+        return {"total": 0, "severity": Counter(), "component": Counter(), "pair": Counter()}
+    
+    def record(self, results, now=None):
+        """Count processed results into the current bucket of every window"""
+        if not results:
+            return
+        now = time.time() if now is None else now
+        pairs = Counter(
+            (result.event.component, result.detection.severity.value) for result in results
+        )
+        
+        with self._lock:
+            for name, (_, bucket_seconds) in self.windows.items():
+                ring = self._rings[name]
+                bucket_id = int(now // bucket_seconds)
+                slot = bucket_id % len(ring["ids"])
+                if ring["ids"][slot] != bucket_id:
+                    ring["ids"][slot] = bucket_id
+                    ring["buckets"][slot] = self._empty_bucket()
+                
+                bucket = ring["buckets"][slot]
+                bucket["total"] += len(results)
+                bucket["pair"].update(pairs)
+                for (component, severity), count in pairs.items():
+                    bucket["severity"][severity] += count
+                    bucket["component"][component] += count
+    
+    def query(self, window, component=None, severity=None, now=None):
+        """Totals, rates, breakdowns and per-bucket series for one window"""
+        window_seconds, bucket_seconds = self.windows[window]
+        now = time.time() if now is None else now
+        ring = self._rings[window]
+        size = len(ring["ids"])
+        current = int(now // bucket_seconds)
+        
+        series = []
+        by_severity = Counter()
+        by_component = Counter()
+        with self._lock:
+            for bucket_id in range(current - size + 1, current + 1):
+                slot = bucket_id % size
+                count = 0
+                if ring["ids"][slot] == bucket_id:
+                    bucket = ring["buckets"][slot]
+                    if component is not None and severity is not None:
+                        count = bucket["pair"][(component, severity)]
+                    elif component is not None:
+                        count = bucket["component"][component]
+                        by_severity.update({s: n for (c, s), n in bucket["pair"].items() if c == component})
+                    elif severity is not None:
+                        count = bucket["severity"][severity]
+                        by_component.update({c: n for (c, s), n in bucket["pair"].items() if s == severity})
+                    else:
+                        count = bucket["total"]
+                        by_severity.update(bucket["severity"])
+                        by_component.update(bucket["component"])
+                series.append({
+                    "start": datetime.fromtimestamp(bucket_id * bucket_seconds, timezone.utc).isoformat(),
+                    "count": count
+                })
+        
+        total = sum(point["count"] for point in series)
+        return {
+            "window": window,
+            "window_seconds": window_seconds,
+            "bucket_seconds": bucket_seconds,
+            "total": total,
+            "rate_per_second": round(total / window_seconds, 4),
+            "by_severity": dict(by_severity),
+            "by_component": dict(by_component),
+            "series": series
+        }
+
+
+window_aggregator = WindowedAggregator(METRIC_WINDOWS)
+
+
+# ========================================================
+# ALERT COALESCING
+# ========================================================
+
+@dataclass(slots=True)
+class Incident(_Record):
+    """Consecutive alerts of one component and alert type"""
+    id: str
+    component: str
+    alert_type: str
+    severity: str
+    count: int
+    first_seen: str
+    last_seen: str
+    status: str = "open"
+
+
+class IncidentTracker:
+    """Coalesces alerts into incidents by component and alert type
+    
+    An alert joins the open incident for its (component, alert type) if
+    it arrives within `window` seconds (event time) of that incident's
+    last alert; otherwise it closes that incident and opens a new one.
+    The clock is the newest event time among all results, normal ones
+    included, so idle incidents are closed by a sweep once per window
+    while normal traffic flows. Closed incidents
+    are kept in a bounded ring and appended to `log_path`. In "incidents"
+    mode only the alert that opens an incident is published to the event
+    log, history and stream (every raw sample still reaches the log with
+    `raw_events`). Metrics, windows and threat matching always see every
+    sample.
+    """
+    
+    def __init__(self, mode, window, raw_events, max_open, history, log_path):
+        self.mode = mode
+        self.window = window
+        self.raw_events = raw_events
+        self.max_open = max_open
+        self.log_path = log_path
+        
+        self._lock = threading.Lock()
+        self._open = OrderedDict()  # (component, alert_type) -> [Incident, last epoch seconds], stalest first
+        self._closed = deque(maxlen=history)
+        self._latest = None  # Newest event time seen
+        self._swept = None
+        self._ids = itertools.count(1)
+        self.opened = 0
+        self.coalesced = 0
+    
+    def coalesce(self, results):
+        """Fold the alerts among processed results into incidents
+        
+        Returns (results to log, results to publish to history and stream).
+        """
+        incidents_mode = self.mode == "incidents"
+        published = [] if incidents_mode else results
+        closed = []
+        
+        with self._lock:
+            for result in results:
+                event = result.event
+                ts = parse_timestamp(event.timestamp)
+                if self._latest is None or ts > self._latest:
+                    self._latest = ts
+                
+                detection = result.detection
+                if not detection.is_anomaly:
+                    if incidents_mode:
+                        published.append(result)
+                    continue
+                
+                key = (event.component, detection.alert_type)
+                entry = self._open.get(key)
+                if entry is not None and ts - entry[1] <= self.window:
+                    incident = entry[0]
+                    incident.count += 1
+                    if ts >= entry[1]:
+                        entry[1] = ts
+                        incident.last_seen = event.timestamp
+                    self._open.move_to_end(key)
+                    self.coalesced += 1
+                    continue
+                
+                if entry is not None:
+                    closed.append(self._close(key))
+                incident = Incident(f"{os.getpid()}-{next(self._ids)}", event.component, detection.alert_type,
+                                    detection.severity.value, 1, event.timestamp, event.timestamp)
+                self._open[key] = [incident, ts]
+                self.opened += 1
+                if incidents_mode:
+                    published.append(result)
+                if len(self._open) > self.max_open:
+                    closed.append(self._close(next(iter(self._open))))
+            
+            if self._latest is not None and (self._swept is None or self._latest - self._swept > self.window):
+                closed.extend(self._sweep(self._latest))
+        
+        self._persist(closed)
+        logged = results if not incidents_mode or self.raw_events else published
+        return logged, published
+    
+    def _close(self, key):
+        incident = self._open.pop(key)[0]
+        incident.status = "closed"
+        self._closed.append(incident)
+        return incident
+    
+    def _sweep(self, now):
+        """Close incidents idle for longer than the window"""
+        self._swept = now
+        return [self._close(key) for key in [key for key, (_, last) in self._open.items() if now - last > self.window]]
+    
+    def _persist(self, closed):
+        if not closed or not self.log_path:
+            return
+        try:
+            with open(self.log_path, 'ab') as f:
+                f.write(b''.join(json_dumps(incident) + b'\n' for incident in closed))
+        except OSError as e:
+            logger.error(f"Could not persist incidents: {e}")
+    
+    def snapshot(self, limit=100, status=None, component=None):
+        """Open and recently closed incidents (most recently active first) and totals"""
+        closed = []
+        with self._lock:
+            if self._latest is not None:
+                closed = self._sweep(self._latest)
+            open_incidents = [entry[0] for entry in reversed(self._open.values())] if status != "closed" else []
+            closed_incidents = list(reversed(self._closed)) if status != "open" else []
+            incidents = [
+                incident.to_dict() for incident in itertools.chain(open_incidents, closed_incidents)
+                if component is None or incident.component == component
+            ][:limit]
+            result = {
+                "mode": self.mode,
+                "window_seconds": self.window,
+                "incidents": incidents,
+                "open_incidents": len(self._open),
+                "total_incidents": self.opened,
+                "coalesced_alerts": self.coalesced
+            }
+        self._persist(closed)  # File I/O outside the lock
+        return result
+
+
+incident_tracker = IncidentTracker(
+    mode=ALERT_MODE,
+    window=INCIDENT_WINDOW,
+    raw_events=INCIDENT_RAW_EVENTS,
+    max_open=INCIDENT_MAX_OPEN,
+    history=INCIDENT_HISTORY,
+    log_path=INCIDENT_LOG
+)
+
+
+# ========================================================
+# LIVE DETECTION STREAM
+# ========================================================
+
+class StreamSubscription:
+    """One /stream client: a bounded queue plus its severity filter"""
+    
+    def __init__(self, severities, buffer_size):
+        self.severities = severities
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.dropped = 0
+    
+    def offer(self, payload):
+        """Queue a payload, dropping the oldest one if the client is falling behind"""
+        while True:
+            try:
+                self.queue.put_nowait(payload)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class DetectionBroadcaster:
+    """Fans processed results out to all /stream subscribers of this worker
+    
+    A single pump thread per process follows the shared stream ring, so
+    subscribers see events processed by every worker, and each event is
+    decoded once regardless of subscriber count. Events a subscriber
+    never receives (overwritten in the ring before the pump read them, or
+    evicted from a full client queue) are counted in its `dropped`.
+    """
+    
+    def __init__(self, backend, poll_interval, buffer_size, max_subscribers):
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pump = None
+    
+    def subscribe(self, severities=None):
+        """Register a subscriber; returns None when the worker is at capacity"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = StreamSubscription(severities, self.buffer_size)
+            self._subscribers.add(subscription)
+            if self._pump is None or not self._pump.is_alive():
+                self._pump = threading.Thread(target=self._run, name="detection-stream", daemon=True)
+                self._pump.start()
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+    
+    def subscriber_count(self):
+        return len(self._subscribers)
+    
+    def notify(self, lost=0):
+        """Wake the pump early after this worker recorded new events
+        
+        `lost` counts events of the batch that did not fit in the ring.
+        """
+        if self._subscribers:
+            if lost:
+                with self._lock:
+                    for subscription in self._subscribers:
+                        subscription.dropped += lost
+            self._wakeup.set()
+    
+    def _run(self):
+        cursor, _ = self.backend.history_since(None)
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                cursor, _ = self.backend.history_since(None)
+                continue
+            
+            try:
+                previous = cursor
+                cursor, payloads = self.backend.history_since(cursor)
+            except Exception as e:
+                logger.error(f"Detection stream failed to read history: {str(e)}")
+                continue
+            
+            # Events that left the history ring before the pump read them
+            missed = cursor - previous - len(payloads)
+            if missed > 0:
+                for subscription in subscribers:
+                    subscription.dropped += missed
+            
+            for payload in payloads:
+                payload = bytes(payload)
+                severity = json_loads(payload)["detection"]["severity"]
+                for subscription in subscribers:
+                    if subscription.severities is None or severity in subscription.severities:
+                        subscription.offer(payload)
+
+
+detection_broadcaster = DetectionBroadcaster(
+    stream_ring,
+    poll_interval=STREAM_POLL_INTERVAL,
+    buffer_size=STREAM_CLIENT_BUFFER,
+    max_subscribers=STREAM_MAX_SUBSCRIBERS
+)
+
+
+def parse_severity_filter(args):
+    """Read `severity=A,B` or `min_severity=X` into a set of severities (None = all)"""
+    if 'min_severity' in args:
+        minimum = args['min_severity'].upper()
+        if minimum not in SEVERITY_LEVELS:
+            raise ValueError(f"Unknown severity '{minimum}'")
+        return set(SEVERITY_LEVELS[SEVERITY_LEVELS.index(minimum):])
+    if 'severity' in args:
+        severities = {value.strip().upper() for value in args['severity'].split(',') if value.strip()}
+        unknown = severities - set(SEVERITY_LEVELS)
+        if unknown:
+            raise ValueError(f"Unknown severity '{sorted(unknown)[0]}'")
+        return severities
+    return None
+
+
+# ========================================================
+# PROMETHEUS INSTRUMENTATION
+# ========================================================
+
+class _NullTimer:
+    """Shared no-op timer handed out while instrumentation is disabled"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _StageTimer:
+    __slots__ = ("registry", "stage", "started")
+    
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class PipelineMetrics:
+    """Per-process stage latency histograms and per-severity/component counters
+    
+    With a shared metrics backend each worker periodically writes its
+    counters to ``prometheus-<pid>.json`` in the state directory, and a
+    scrape of any worker merges the files of all live workers.
+    """
+    
+    NULL_TIMER = _NullTimer()
+    
+    def __init__(self, enabled=True, buckets=STAGE_BUCKETS, state_dir=None,
+                 flush_interval=PROMETHEUS_FLUSH_INTERVAL, max_components=PROMETHEUS_MAX_COMPONENTS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.state_dir = state_dir
+        self.flush_interval = flush_interval
+        self.max_components = max_components
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> [bucket counts..., +Inf count, sum]
+        self._events = Counter()  # (severity, component) -> count
+        self._components = set()
+        self._flusher_pid = None
+    
+    def time(self, stage):
+        """Context manager timing one stage (a shared no-op when disabled)"""
+        if not self.enabled:
+            return self.NULL_TIMER
+        return _StageTimer(self, stage)
+    
+    def observe(self, stage, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+    
+    def count_events(self, results):
+        """Count processed results by severity and component"""
+        if not self.enabled or not results:
+            return
+        self._ensure_flusher()
+        pairs = Counter(
+            (result.detection.severity.value, result.event.component) for result in results
+        )
+        with self._lock:
+            for (severity, component), count in pairs.items():
+                # Bound label cardinality: components beyond the cap share one series
+                if component not in self._components:
+                    if len(self._components) >= self.max_components:
+                        component = "other"
+                    else:
+                        self._components.add(component)
+                self._events[(severity, component)] += count
+    
+    # ---------------- cross-worker state ----------------
+    
+    def _ensure_flusher(self):
+        if self.state_dir is None or self._flusher_pid == os.getpid():
+            return
+        if self._flusher_pid is not None:
+            # Counters inherited across a fork belong to the parent
+            with self._lock:
+                self._stages, self._events, self._components = {}, Counter(), set()
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="prometheus-flush", daemon=True).start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Could not write worker metrics: {e}")
+    
+    def _state(self):
+        with self._lock:
+            return {
+                "stages": {stage: list(histogram) for stage, histogram in self._stages.items()},
+                "events": [[severity, component, count] for (severity, component), count in self._events.items()]
+            }
+    
+    def flush(self):
+        """Write this worker's counters for other workers' scrapes"""
+        path = os.path.join(self.state_dir, f"prometheus-{os.getpid()}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._state(), f)
+        os.replace(path + '.tmp', path)
+    
+    def _worker_states(self):
+        states = [self._state()]
+        if self.state_dir is None:
+            return states
+        for name in os.listdir(self.state_dir):
+            match = re.match(r'^prometheus-(\d+)\.json$', name)
+            if not match or int(match.group(1)) == os.getpid():
+                continue
+            try:
+                os.kill(int(match.group(1)), 0)
+            except ProcessLookupError:
+                # Worker exited; Prometheus treats the drop as a counter reset
+                try:
+                    os.remove(os.path.join(self.state_dir, name))
+                except OSError:
+                    pass
+                continue
+            except PermissionError:
+                pass
+            try:
+                with open(os.path.join(self.state_dir, name)) as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return states
+    
+    # ---------------- exposition ----------------
+    
+    def render(self):
+        """Render all workers' metrics in the Prometheus text format"""
+        stages, events = {}, Counter()
+        for state in self._worker_states():
+            for stage, histogram in state["stages"].items():
+                merged = stages.setdefault(stage, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, value in enumerate(histogram):
+                    merged[i] += value
+            for severity, component, count in state["events"]:
+                events[(severity, component)] += count
+        
+        lines = [
+            "# HELP grid_stage_duration_seconds Time spent in each pipeline stage",
+            "# TYPE grid_stage_duration_seconds histogram"
+        ]
+        for stage in sorted(stages):
+            histogram = stages[stage]
+            label = f'stage="{prometheus_escape(stage)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram):
+                cumulative += count
+                lines.append(f'grid_stage_duration_seconds_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            cumulative += histogram[len(self.buckets)]
+            lines.append(f'grid_stage_duration_seconds_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f'grid_stage_duration_seconds_sum{{{label}}} {histogram[-1]:.9f}')
+            lines.append(f'grid_stage_duration_seconds_count{{{label}}} {cumulative}')
+        
+        lines += [
+            "# HELP grid_events_total Processed events by severity and component",
+            "# TYPE grid_events_total counter"
+        ]
+        for (severity, component), count in sorted(events.items()):
+            lines.append(
+                f'grid_events_total{{severity="{prometheus_escape(severity)}",'
+                f'component="{prometheus_escape(component)}"}} {count}'
+            )
+        return lines
+
+
+def prometheus_escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+pipeline_metrics = PipelineMetrics(
+    enabled=PROMETHEUS_ENABLED,
+    state_dir=METRICS_STATE_DIR if METRICS_BACKEND != "local" else None
+)
+
+
+# ========================================================
+# RESPONSE CACHE
+# ========================================================
+
+class ResponseCache:
+    """LRU cache of response bodies, valid for one event sequence number
+    
+    Entries are keyed on endpoint and query arguments. Any recorded event
+    bumps the shared sequence and so invalidates every entry at once, in
+    every worker. ETags are content hashes, so they agree across workers
+    and survive events that did not change a response.
+    """
+    
+    def __init__(self, max_entries, max_body):
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (sequence, etag, body, mimetype)
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def etag(body):
+        return hashlib.blake2b(body, digest_size=12).hexdigest()
+    
+    def get(self, key, sequence):
+        """Return (etag, body, mimetype) cached at `sequence` (any comparable version), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != sequence:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+    
+    def put(self, key, sequence, body, mimetype):
+        """Cache a body computed at `sequence` and return its (etag, body, mimetype)"""
+        etag = self.etag(body)
+        if len(body) <= self.max_body:
+            with self._lock:
+                self._entries[key] = (sequence, etag, body, mimetype)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag, body, mimetype
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_MAX_BODY)
+
+
+def cache_version(reads_log=False):
+    """Version a cached body is valid for: the event sequence and this worker's
+    log write failures (both in /metrics), plus the event store's committed
+    state for bodies read from the log
+    
+    The sequence is bumped once a batch is submitted to the log writer, which
+    may not have committed it yet; the store version only moves on commit.
+    """
+    version = metrics_backend.sequence(), EventLogger.write_failures()
+    return (version, EventLogger.version()) if reads_log else version
+
+
+def cacheable(reads_log=False):
+    """Whether a freshly built body may be cached (not while this worker's log writes are queued)"""
+    return not (reads_log and EventLogger.writes_pending())
+
+
+def cached_view(reads_log=False):
+    """Serve a GET view from the response cache, with ETag/If-None-Match support
+    
+    The version is read before the view runs, so a body is never cached
+    under a version newer than the data it was built from. Only 200
+    responses are cached. Views that read the event log pass `reads_log`.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RESPONSE_CACHE:
+                return view(*args, **kwargs)
+            
+            version = cache_version(reads_log)
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            cached = response_cache.get(key, version)
+            if cached is None:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                if cacheable(reads_log):
+                    cached = response_cache.put(key, version, response.get_data(), response.mimetype)
+                else:
+                    cached = response_cache.etag(response.get_data()), response.get_data(), response.mimetype
+            
+            etag, body, mimetype = cached
+            response = app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'  # Always revalidate; 304 when unchanged
+            return response.make_conditional(request)
+        
+        return wrapper
+    
+    return decorator
+
+
+# ========================================================
+# CHUNK 3: CASCADE PREDICTION LAYER
+# ========================================================
+
+class CascadeError(ValueError):
+    """Raised for a /cascade-predict request that cannot be served; carries the HTTP status"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _cascade_number(value, what, allow_zero=False):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) \
+            or value < 0 or (value == 0 and not allow_zero):
+        raise CascadeError(f"{what} must be a {'non-negative' if allow_zero else 'positive'} number")
+    return float(value)
+
+
+@dataclass(slots=True)
+class CascadeState:
+    """Outcome of one cascade over a topology, kept for incremental updates"""
+    seeds: frozenset  # Node indices failed by anomalies
+    absorbed: np.ndarray  # Load each node received from failed neighbours
+    failed_step: np.ndarray  # Wave in which each node failed (-1 = survived)
+    converged: bool
+    max_steps: int
+
+
+class GridTopology:
+    """A grid compiled into CSR adjacency arrays for vectorized propagation
+    
+    Nodes carry a load and a capacity. When a node fails, its load is
+    shed to its neighbours in proportion to the capacity of the
+    connecting edges (the shares are precomputed once per topology), and
+    any neighbour pushed past its capacity fails in the next wave. Load
+    shed onto a node that has already failed is lost, so the set of
+    failed nodes only grows as more nodes fail and does not depend on the
+    order in which they fail. That lets a prediction that only adds
+    failed components continue from the previous one instead of starting
+    over. Each wave touches only the edges of the nodes that just failed.
+    """
+    
+    def __init__(self, names, capacity, load, src, dst, edge_capacity, directed=False):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.capacity = capacity
+        self.load = load
+        
+        if not directed:
+            src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+            edge_capacity = np.concatenate([edge_capacity, edge_capacity])
+        order = np.argsort(src, kind='stable')
+        src, self.indices, edge_capacity = src[order], dst[order], edge_capacity[order]
+        
+        count = len(names)
+        self.indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=count), out=self.indptr[1:])
+        self.shares = edge_capacity / np.bincount(src, weights=edge_capacity, minlength=count)[src]
+        
+        self.lock = threading.Lock()
+        self.state = None  # Last CascadeState
+    
+    @classmethod
+    def from_spec(cls, spec):
+        """Compile a topology specification (see README) into adjacency arrays"""
+        if not isinstance(spec, dict):
+            raise CascadeError("topology must be an object with 'nodes' and 'edges'")
+        nodes, edges = spec.get("nodes", []), spec.get("edges")
+        if not isinstance(nodes, list) or not isinstance(edges, list) or not edges:
+            raise CascadeError("topology needs a non-empty 'edges' list (and optionally a 'nodes' list)")
+        if len(nodes) > CASCADE_MAX_NODES or len(edges) > CASCADE_MAX_EDGES:
+            raise CascadeError(
+                f"Topology too large (max {CASCADE_MAX_NODES} nodes, {CASCADE_MAX_EDGES} edges)", 413
+            )
+        
+        index, names, capacity, load = {}, [], [], []
+        
+        def add_node(name, node_capacity=1.0, node_load=None):
+            if not isinstance(name, str) or not name:
+                raise CascadeError("node ids must be non-empty strings")
+            index[name] = len(names)
+            names.append(sys.intern(name))
+            capacity.append(_cascade_number(node_capacity, f"capacity of {name}"))
+            load.append(np.nan if node_load is None else _cascade_number(node_load, f"load of {name}", allow_zero=True))
+            return index[name]
+        
+        for node in nodes:
+            if isinstance(node, dict):
+                name = node.get("id")
+                if name in index:
+                    raise CascadeError(f"duplicate node '{name}'")
+                add_node(name, node.get("capacity", 1.0), node.get("load"))
+            elif not isinstance(node, str):
+                raise CascadeError("nodes must be node ids or {id, capacity, load} objects")
+            elif node not in index:
+                add_node(node)
+        
+        src, dst, edge_capacity = [], [], []
+        for edge in edges:
+            if isinstance(edge, dict):
+                a, b, c = edge.get("from"), edge.get("to"), edge.get("capacity", 1.0)
+            elif isinstance(edge, list) and len(edge) in (2, 3):
+                a, b, c = edge[0], edge[1], edge[2] if len(edge) == 3 else 1.0
+            else:
+                raise CascadeError("edges must be {from, to, capacity} objects or [from, to, capacity] lists")
+            if not isinstance(a, str) or not isinstance(b, str):
+                raise CascadeError("edge endpoints must be node ids")
+            if a == b:
+                raise CascadeError(f"self-loop on '{a}'")
+            src.append(index[a] if a in index else add_node(a))
+            dst.append(index[b] if b in index else add_node(b))
+            edge_capacity.append(_cascade_number(c, f"capacity of edge {a}-{b}"))
+        
+        if len(names) > CASCADE_MAX_NODES:
+            raise CascadeError(f"Topology too large (max {CASCADE_MAX_NODES} nodes)", 413)
+        
+        capacity = np.array(capacity)
+        load = np.array(load)
+        load = np.where(np.isnan(load), capacity * CASCADE_DEFAULT_LOADING, load)
+        return cls(
+            names, capacity, load,
+            np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64), np.array(edge_capacity),
+            directed=bool(spec.get("directed", False))
+        )
+    
+    def neighbours(self):
+        """Component -> frozenset of the components it shares an edge with"""
+        return {
+            name: frozenset(self.names[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]].tolist())
+            for i, name in enumerate(self.names)
+        }
+    
+    def out_edges(self, nodes):
+        """Positions of the out-edges of `nodes` in the CSR arrays, and each edge's source"""
+        starts = self.indptr[nodes]
+        lengths = self.indptr[nodes + 1] - starts
+        firsts = np.cumsum(lengths) - lengths  # Where each node's edges start in the result
+        edge_ids = np.arange(lengths.sum()) + np.repeat(starts - firsts, lengths)
+        return edge_ids, np.repeat(nodes, lengths)
+    
+    def spread(self, state, frontier):
+        """Shed the load of newly failed `frontier` nodes wave by wave until nothing overloads"""
+        step = 0
+        while frontier.size:
+            if step == state.max_steps:
+                state.converged = False
+                break
+            edge_ids, sources = self.out_edges(frontier)
+            if not edge_ids.size:
+                break
+            step += 1
+            targets, inverse = np.unique(self.indices[edge_ids], return_inverse=True)
+            state.absorbed[targets] += np.bincount(inverse, weights=self.shares[edge_ids] * self.load[sources])
+            candidates = targets[state.failed_step[targets] < 0]
+            frontier = candidates[self.load[candidates] + state.absorbed[candidates] > self.capacity[candidates]]
+            state.failed_step[frontier] = step
+    
+    def predict(self, seeds, max_steps, limit):
+        """Cascade from the failed `seeds` (node indices); returns (summary, incremental)
+        
+        When the previous prediction converged and the new seeds are a
+        superset of its seeds, only the added seeds are propagated (their
+        waves are counted from the update). Anything else recomputes.
+        """
+        with self.lock:
+            previous = self.state
+            if previous is not None and previous.converged and previous.max_steps == max_steps \
+                    and previous.seeds <= seeds:
+                state, added, incremental = previous, seeds - previous.seeds, True
+                state.seeds = seeds
+            else:
+                count = len(self.names)
+                state = CascadeState(seeds, np.zeros(count), np.full(count, -1, dtype=np.int32), True, max_steps)
+                added, incremental = seeds, False
+            
+            frontier = np.fromiter(added, dtype=np.int64, count=len(added))
+            frontier = frontier[state.failed_step[frontier] < 0]
+            state.failed_step[frontier] = 0
+            self.spread(state, frontier)
+            self.state = state
+            return self.summarize(state, limit), incremental
+    
+    def summarize(self, state, limit):
+        names = self.names
+        failed = np.flatnonzero(state.failed_step >= 0)
+        failed = failed[np.argsort(state.failed_step[failed], kind='stable')]
+        utilization = (self.load + state.absorbed) / self.capacity
+        at_risk = np.flatnonzero((state.failed_step < 0) & (utilization >= CASCADE_RISK_UTILIZATION))
+        at_risk = at_risk[np.argsort(-utilization[at_risk], kind='stable')]
+        
+        shown = failed[:limit]
+        risky = at_risk[:limit]
+        return {
+            "seeds": sorted(names[i] for i in state.seeds),
+            "failed": [
+                {"component": names[i], "step": step, "utilization": round(value, 4)}
+                for i, step, value in zip(shown.tolist(), state.failed_step[shown].tolist(),
+                                          utilization[shown].tolist())
+            ],
+            "total_failed": int(failed.size),
+            "failed_fraction": round(failed.size / len(names), 6),
+            "load_shed": round(float(self.load[failed].sum()), 4),
+            "at_risk": [
+                {"component": names[i], "utilization": round(value, 4)}
+                for i, value in zip(risky.tolist(), utilization[risky].tolist())
+            ],
+            "total_at_risk": int(at_risk.size),
+            "steps": int(state.failed_step.max(initial=0)),
+            "converged": state.converged
+        }
+
+
+class TopologyCache:
+    """LRU of compiled topologies, keyed by a hash of their specification
+    
+    Clients send a topology once and refer to it by `topology_id`
+    afterwards. The cache is per worker; an unknown id asks the client to
+    send the topology again.
+    """
+    
+    DEFAULT_ID = "default"
+    
+    def __init__(self, max_entries, default_spec):
+        self.max_entries = max_entries
+        self.default_spec = default_spec
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # topology_id -> GridTopology
+    
+    def get(self, topology_id):
+        with self._lock:
+            topology = self._entries.get(topology_id)
+            if topology is not None:
+                self._entries.move_to_end(topology_id)
+                return topology
+        if topology_id == self.DEFAULT_ID:
+            return self._put(topology_id, GridTopology.from_spec(self.default_spec))
+        return None
+    
+    def compile(self, spec):
+        """Return (topology_id, topology), compiling the specification on first sight"""
+        topology_id = hashlib.blake2b(json_dumps(spec), digest_size=8).hexdigest()
+        topology = self.get(topology_id)
+        if topology is None:
+            topology = self._put(topology_id, GridTopology.from_spec(spec))
+        return topology_id, topology
+    
+    def _put(self, topology_id, topology):
+        with self._lock:
+            # Another request may have compiled it meanwhile; keep one copy (and its state)
+            topology = self._entries.setdefault(topology_id, topology)
+            self._entries.move_to_end(topology_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return topology
+
+
+# Reference topology of the simulated components: each generator feeds a
+# substation (tied to the other), which feeds a transformer and its line
+DEFAULT_TOPOLOGY = {
+    "nodes": [
+        {"id": "Generator_G1", "capacity": 100, "load": 60},
+        {"id": "Generator_G2", "capacity": 100, "load": 60},
+        {"id": "Substation_S1", "capacity": 100, "load": 50},
+        {"id": "Substation_S2", "capacity": 100, "load": 50},
+        {"id": "Transformer_T1", "capacity": 60, "load": 35},
+        {"id": "Transformer_T2", "capacity": 60, "load": 35},
+        {"id": "Distribution_Line_D1", "capacity": 40, "load": 25},
+        {"id": "Distribution_Line_D2", "capacity": 40, "load": 25}
+    ],
+    "edges": [
+        {"from": "Generator_G1", "to": "Substation_S1", "capacity": 100},
+        {"from": "Generator_G2", "to": "Substation_S2", "capacity": 100},
+        {"from": "Substation_S1", "to": "Substation_S2", "capacity": 50},
+        {"from": "Substation_S1", "to": "Transformer_T1", "capacity": 60},
+        {"from": "Substation_S2", "to": "Transformer_T2", "capacity": 60},
+        {"from": "Transformer_T1", "to": "Distribution_Line_D1", "capacity": 40},
+        {"from": "Transformer_T2", "to": "Distribution_Line_D2", "capacity": 40}
+    ]
+}
+
+topology_cache = TopologyCache(CASCADE_MAX_TOPOLOGIES, DEFAULT_TOPOLOGY)
+
+
+class CascadePredictionLayer:
+    """Predicts cascading failures from anomalous components over a grid topology"""
+    
+    @staticmethod
+    def seed_components(payload, min_severity):
+        """Components treated as failed: the given anomalies, else recent live detections"""
+        threshold = SEVERITY_CODES[min_severity]
+        anomalies = payload.get("anomalies")
+        
+        if anomalies is None:
+            window = payload.get("window", "1m")
+            if window not in METRIC_WINDOWS:
+                raise CascadeError(f"window must be one of: {', '.join(METRIC_WINDOWS)}")
+            components = set()
+            for severity in SEVERITY_LEVELS[threshold:]:
+                components.update(window_aggregator.query(window, severity=severity)["by_component"])
+            return components
+        
+        if isinstance(anomalies, list):
+            if not all(isinstance(component, str) for component in anomalies):
+                raise CascadeError("'anomalies' must list component names")
+            return set(anomalies)
+        if isinstance(anomalies, dict):
+            for component, severity in anomalies.items():
+                if not isinstance(severity, str) or severity not in SEVERITY_CODES:
+                    raise CascadeError(f"unknown severity '{severity}' for {component}")
+            return {component for component, severity in anomalies.items() if SEVERITY_CODES[severity] >= threshold}
+        raise CascadeError("'anomalies' must be a list of components or an object of component -> severity")
+    
+    @staticmethod
+    def predict(payload):
+        """Validate a /cascade-predict request and run the cascade"""
+        if not isinstance(payload, dict):
+            raise CascadeError("body must be a JSON object")
+        
+        min_severity = payload.get("min_severity", CASCADE_MIN_SEVERITY)
+        if not isinstance(min_severity, str) or min_severity not in SEVERITY_LEVELS[1:]:
+            raise CascadeError(f"min_severity must be one of: {', '.join(SEVERITY_LEVELS[1:])}")
+        max_steps = payload.get("max_steps", CASCADE_MAX_STEPS)
+        if isinstance(max_steps, bool) or not isinstance(max_steps, int) or not 1 <= max_steps <= CASCADE_MAX_STEPS:
+            raise CascadeError(f"max_steps must be between 1 and {CASCADE_MAX_STEPS}")
+        limit = payload.get("limit", 100)
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+            raise CascadeError("limit must be a non-negative integer")
+        
+        if "topology" in payload:
+            topology_id, topology = topology_cache.compile(payload["topology"])
+        else:
+            topology_id = payload.get("topology_id", TopologyCache.DEFAULT_ID)
+            topology = topology_cache.get(topology_id)
+            if topology is None:
+                raise CascadeError(f"Unknown topology_id '{topology_id}'; send the topology again", 404)
+        
+        components = CascadePredictionLayer.seed_components(payload, min_severity)
+        seeds = frozenset(topology.index[c] for c in components if c in topology.index)
+        summary, incremental = topology.predict(seeds, max_steps, limit)
+        
+        return {
+            "topology_id": topology_id,
+            "nodes": len(topology.names),
+            "edges": int(topology.indices.size),
+            "incremental": incremental,
+            **summary,
+            "unknown_components": sorted(c for c in components if c not in topology.index)[:limit]
+        }
+
+
+# ========================================================
+# CHUNK 4: THREAT MODELING LAYER
+# ========================================================
+
+class ThreatModelError(ValueError):
+    """Raised for an invalid attack pattern or /threat-model request"""
+
+
+THREAT_KINDS = {
+    "voltage": lambda code: code >= 2,
+    "latency": lambda code: code % 2 == 1,
+    "any": lambda code: code >= 1
+}
+THREAT_RELATIONS = ("same", "adjacent", "other", "any")
+
+
+@dataclass(slots=True)
+class AttackPattern:
+    name: str
+    description: str
+    severity: str
+    window: float  # Seconds from the first step to the last
+    steps: list
+    codes: tuple  # Per step: severity codes it accepts
+    relations: tuple  # Per step: relation to the previous step's component (None for the first)
+    
+    @classmethod
+    def compile(cls, name, spec):
+        """Validate a pattern specification (see ATTACK_PATTERNS)"""
+        if not isinstance(spec, dict):
+            raise ThreatModelError(f"pattern '{name}' must be an object")
+        steps = spec.get("steps")
+        if not isinstance(steps, list) or len(steps) < 2 or not all(isinstance(step, dict) for step in steps):
+            raise ThreatModelError(f"pattern '{name}' needs a list of at least two step objects")
+        window = spec.get("window_seconds")
+        if isinstance(window, bool) or not isinstance(window, (int, float)) or not window > 0:
+            raise ThreatModelError(f"pattern '{name}' needs a positive window_seconds")
+        severity = spec.get("severity", "HIGH")
+        if severity not in SEVERITY_LEVELS[1:]:
+            raise ThreatModelError(f"pattern '{name}' has an unknown severity '{severity}'")
+        
+        codes, relations = [], []
+        for index, step in enumerate(steps):
+            kind = step.get("kind", "any")
+            min_severity = step.get("min_severity", "MEDIUM")
+            relation = step.get("relation", "any") if index else None
+            if not isinstance(kind, str) or kind not in THREAT_KINDS:
+                raise ThreatModelError(f"pattern '{name}' step {index}: kind must be one of {', '.join(THREAT_KINDS)}")
+            if min_severity not in SEVERITY_LEVELS[1:]:
+                raise ThreatModelError(f"pattern '{name}' step {index}: unknown min_severity '{min_severity}'")
+            if index and relation not in THREAT_RELATIONS:
+                raise ThreatModelError(
+                    f"pattern '{name}' step {index}: relation must be one of {', '.join(THREAT_RELATIONS)}"
+                )
+            codes.append(frozenset(
+                code for code in range(SEVERITY_CODES[min_severity], len(SEVERITY_LEVELS)) if THREAT_KINDS[kind](code)
+            ))
+            relations.append(relation)
+        
+        return cls(name, str(spec.get("description", "")), severity, float(window), steps,
+                   tuple(codes), tuple(relations))
+    
+    def describe(self):
+        return {
+            "name": self.name,
+            "description": self.description,
+            "severity": self.severity,
+            "window_seconds": self.window,
+            "steps": self.steps
+        }
+
+
+class ThreatMatcher:
+    """Incremental multi-step attack pattern matcher over a detection stream
+    
+    Patterns compile to a transition index: for each severity code, the
+    (pattern, step) pairs an anomaly with that code can satisfy. Partial
+    matches wait per (pattern, next step), keyed by the component of their
+    last step and kept in start order. Only the most recently started
+    partial is kept per key, since it expires last. An anomaly looks up
+    only the partial matches it can extend: its own component's, its
+    neighbours', or (for "other" and "any" relations) the newest one
+    waiting at that step. History is never rescanned, and expired partials
+    are swept once per pattern window. A repeat of the same pattern over the same components within
+    its window is reported once.
+    """
+    
+    def __init__(self, patterns, neighbours, history=THREAT_HISTORY):
+        self.patterns = [AttackPattern.compile(name, spec) for name, spec in patterns.items()]
+        self.neighbours = neighbours  # component -> frozenset of adjacent components
+        self.max_window = max((pattern.window for pattern in self.patterns), default=0.0)
+        
+        # severity code -> [(pattern index, step index)], later steps first so an
+        # anomaly never extends a partial match it just started
+        self.transitions = [
+            sorted(((p, s) for p, pattern in enumerate(self.patterns)
+                    for s, codes in enumerate(pattern.codes) if code in codes), key=lambda t: -t[1])
+            for code in range(len(SEVERITY_LEVELS))
+        ]
+        
+        self._lock = threading.Lock()
+        # waiting[pattern][step] = {component: (start, last, chain)}
+        self._waiting = [[{} for _ in pattern.steps] for pattern in self.patterns]
+        self._reported = {}  # (pattern, components) -> time of the last report
+        self._swept = None
+        self.threats = deque(maxlen=history)
+        self.counts = Counter()
+        self.observed = 0
+    
+    def observe_results(self, results):
+        """Feed the anomalies among processed results (ProcessedEvent records)"""
+        anomalies = [
+            (parse_timestamp(result.event.timestamp), result.event.timestamp,
+             result.event.component, result.detection.severity_code)
+            for result in results if result.detection.is_anomaly
+        ]
+        return self.observe(anomalies) if anomalies else []
+    
+    def observe(self, anomalies):
+        """Feed (epoch seconds, timestamp, component, severity code) anomalies; returns new threats"""
+        found = []
+        with self._lock:
+            for anomaly in anomalies:
+                self.observed += 1
+                if self._swept is None or anomaly[0] - self._swept > self.max_window:
+                    self._sweep(anomaly[0])
+                for p, s in self.transitions[anomaly[3]]:
+                    self._advance(p, s, anomaly, found)
+        return found
+    
+    def _advance(self, p, s, anomaly, found):
+        pattern = self.patterns[p]
+        ts, _, component, _ = anomaly
+        
+        if s == 0:
+            self._wait(self._waiting[p][1], component, (ts, ts, (anomaly,)))
+            return
+        
+        relation = pattern.relations[s]
+        waiting = self._waiting[p][s]
+        best = None
+        if relation in ("same", "adjacent"):
+            for key in (component,) if relation == "same" else self.neighbours.get(component, ()):
+                partial = waiting.get(key)
+                if partial is None or ts < partial[1] or ts - partial[0] > pattern.window:
+                    continue
+                if relation == "adjacent" and any(step[2] == component for step in partial[2]):
+                    continue
+                if best is None or partial[0] > best[0]:
+                    best = partial
+        else:
+            # Partials are kept in start order, so the newest usable one is found
+            # from the end and the scan stops at the first expired one
+            for partial in reversed(waiting.values()):
+                if ts - partial[0] > pattern.window:
+                    break
+                if ts < partial[1] or (relation == "other" and any(step[2] == component for step in partial[2])):
+                    continue
+                best = partial
+                break
+        if best is None:
+            return
+        
+        chain = best[2] + (anomaly,)
+        if s + 1 == len(pattern.steps):
+            self._report(pattern, chain, found)
+        else:
+            self._wait(self._waiting[p][s + 1], component, (best[0], ts, chain))
+    
+    @staticmethod
+    def _wait(waiting, component, partial):
+        """Keep `partial` for `component` unless a later-started one is waiting there"""
+        current = waiting.get(component)
+        if current is None or current[0] <= partial[0]:
+            waiting.pop(component, None)  # Re-insert at the end to keep start order
+            waiting[component] = partial
+    
+    def _report(self, pattern, chain, found):
+        components = tuple(dict.fromkeys(step[2] for step in chain))
+        key = (pattern.name, components)
+        last_report = self._reported.get(key)
+        if last_report is not None and chain[-1][0] - last_report <= pattern.window:
+            return
+        self._reported[key] = chain[-1][0]
+        
+        threat = {
+            "pattern": pattern.name,
+            "description": pattern.description,
+            "severity": pattern.severity,
+            "detected_at": chain[-1][1],
+            "components": list(components),
+            "duration_seconds": round(chain[-1][0] - chain[0][0], 3),
+            "steps": [
+                {"timestamp": timestamp, "component": component,
+                 "severity": SEVERITY_LEVELS[code], "alert_type": ALERT_TYPES[code]}
+                for _, timestamp, component, code in chain
+            ]
+        }
+        self.threats.append(threat)
+        self.counts[pattern.name] += 1
+        found.append(threat)
+    
+    def _sweep(self, now):
+        """Drop partial matches and report suppressions that can no longer matter"""
+        for pattern, steps in zip(self.patterns, self._waiting):
+            for waiting in steps:
+                for component in [c for c, partial in waiting.items() if now - partial[0] > pattern.window]:
+                    del waiting[component]
+        self._reported = {key: ts for key, ts in self._reported.items() if now - ts <= self.max_window}
+        self._swept = now
+    
+    def snapshot(self, limit=100, pattern=None):
+        """Recent threats (newest first) and matcher statistics"""
+        with self._lock:
+            threats = [threat for threat in reversed(self.threats)
+                       if pattern is None or threat["pattern"] == pattern][:limit]
+            return {
+                "patterns": [p.describe() for p in self.patterns],
+                "threats": threats,
+                "total_threats": sum(self.counts.values()),
+                "by_pattern": dict(self.counts),
+                "observed_anomalies": self.observed,
+                "partial_matches": sum(len(waiting) for steps in self._waiting for waiting in steps)
+            }
+
+
+threat_matcher = ThreatMatcher(ATTACK_PATTERNS, topology_cache.get(TopologyCache.DEFAULT_ID).neighbours())
+
+
+class ThreatModelingLayer:
+    """Correlates sequences of detections with known multi-step attack patterns"""
+    
+    @staticmethod
+    def observe(results):
+        """Match live processed results; called for every recorded batch"""
+        if not THREAT_MODEL_ENABLED:
+            return
+        for threat in threat_matcher.observe_results(results):
+            logger.warning(
+                f"Threat detected: {threat['pattern']} ({threat['severity']}) on {', '.join(threat['components'])}"
+            )
+    
+    @staticmethod
+    def analyze(payload):
+        """Run a fresh matcher over submitted detections or a logged time range"""
+        if not isinstance(payload, dict):
+            raise ThreatModelError("body must be a JSON object")
+        limit = payload.get("limit", 100)
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+            raise ThreatModelError("limit must be a non-negative integer")
+        
+        patterns = payload.get("patterns", ATTACK_PATTERNS)
+        if not isinstance(patterns, dict) or not patterns:
+            raise ThreatModelError("patterns must be an object of name -> pattern")
+        matcher = ThreatMatcher(patterns, threat_matcher.neighbours, history=None)
+        
+        if "events" in payload:
+            entries = payload["events"]
+            if not isinstance(entries, list):
+                raise ThreatModelError("events must be a list of detections")
+            if len(entries) > THREAT_MAX_ANALYZE_EVENTS:
+                raise ThreatModelError(f"Too many events (max {THREAT_MAX_ANALYZE_EVENTS})")
+            chunks = [entries]
+        else:
+            try:
+                start = parse_timestamp(payload["start"]) if "start" in payload else None
+                end = parse_timestamp(payload["end"]) if "end" in payload else None
+            except (TypeError, ValueError):
+                raise ThreatModelError("start/end must be ISO-8601 timestamps")
+            chunks = EventLogger.iter_log_chunks(start=start, end=end)
+        
+        analyzed, skipped, anomalies = 0, 0, []
+        for chunk in chunks:
+            for entry in chunk:
+                analyzed += 1
+                try:
+                    code = SEVERITY_CODES[entry["severity"]]
+                    component = entry["component"]
+                    timestamp = entry["timestamp"]
+                    ts = parse_timestamp(timestamp)
+                    if not isinstance(component, str):
+                        raise TypeError
+                except (KeyError, TypeError, ValueError):
+                    skipped += 1
+                    continue
+                if code:
+                    anomalies.append((ts, timestamp, component, code))
+            if analyzed > THREAT_MAX_ANALYZE_EVENTS:
+                raise ThreatModelError(f"Too many events (max {THREAT_MAX_ANALYZE_EVENTS}); narrow start/end")
+        
+        anomalies.sort(key=operator.itemgetter(0))
+        threats = matcher.observe(anomalies)
+        return {
+            "analyzed_events": analyzed,
+            "anomalies": len(anomalies),
+            "skipped": skipped,
+            "threats": threats[:limit],
+            "total_threats": len(threats),
+            "by_pattern": dict(matcher.counts)
+        }
+
+
+# ========================================================
+# API ENDPOINTS
+# ========================================================
+
+@app.route('/', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify({
+        "status": "running",
+        "message": "AI-Enabled Smart Grid Cybersecurity Framework",
+        "version": "1.0.0",
+        "chunks_active": [0, 1, 2, 3, 4]
     }), 200
 
 
 @app.route('/simulate', methods=['GET'])
 def simulate_event():
-    """Simulate a grid event and process through perceptual layer"""
+    """Simulate a grid event (or ?count=N events) and process through perceptual layer"""
+    if 'count' in request.args:
+        return simulate_batch()
+    
     try:
         # Step 1: Generate grid event
-        raw_event = SmartGridSimulator.generate_event()
+        with pipeline_metrics.time("generate_event"):
+            raw_event = SmartGridSimulator.generate_event()
         
         # Step 2: Process through perceptual layer
         processed_result = PerceptualLayer.process_event(raw_event)
         
-        # Step 3: Log event
-        EventLogger.log_event(processed_result)
+        # Step 3: Coalesce alerts into incidents
+        with pipeline_metrics.time("IncidentTracker.coalesce"):
+            logged, published = incident_tracker.coalesce([processed_result])
         
-        # Step 4: Update metrics
-        update_metrics(processed_result["detection"]["is_anomaly"])
+        # Step 4: Log event
+        if logged:
+            with pipeline_metrics.time("EventLogger.log_event"):
+                EventLogger.log_event(processed_result)
         
-        # Step 5: Add to in-memory history
-        event_history.append(processed_result)
-        if len(event_history) > 100:  # Keep last 100 events
-            event_history.pop(0)
+        # Step 5: Update shared metrics and history
+        with pipeline_metrics.time("record_events"):
+            record_events([processed_result], published)
         
-        return jsonify(processed_result), 200
+        with pipeline_metrics.time("json_serialization"):
+            response = jsonify(processed_result)
+        return response, 200
         
     except Exception as e:
         logger.error(f"Error in simulation: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+def simulate_batch():
+    """Generate, process and log a vectorized batch of simulated events"""
+    count = request.args.get('count', type=int)
+    attack_ratio = request.args.get('attack_ratio', default=0.3, type=float)
+    if count is None or not 1 <= count <= MAX_SIMULATE_BATCH:
+        return jsonify({"error": f"count must be between 1 and {MAX_SIMULATE_BATCH}"}), 400
+    if attack_ratio is None or not 0.0 <= attack_ratio <= 1.0:
+        return jsonify({"error": "attack_ratio must be between 0 and 1"}), 400
+    
+    components = None
+    if request.args.get('components'):
+        components = [c.strip() for c in request.args['components'].split(',') if c.strip()]
+    
+    try:
+        with pipeline_metrics.time("generate_batch"):
+            raw_events = SmartGridSimulator.generate_batch(
+                count,
+                seed=request.args.get('seed', type=int),
+                attack_ratio=attack_ratio,
+                components=components
+            )
+        with pipeline_metrics.time("PerceptualLayer.process_batch"):
+            results = PerceptualLayer.process_batch(raw_events)
+        with pipeline_metrics.time("IncidentTracker.coalesce"):
+            logged, published = incident_tracker.coalesce(results)
+        with pipeline_metrics.time("EventLogger.log_events"):
+            EventLogger.log_events(logged)
+        with pipeline_metrics.time("record_events"):
+            anomaly_count = record_events(results, published)
+        
+        with pipeline_metrics.time("json_serialization"):
+            response = jsonify({
+                "count": len(results),
+                "anomalies": anomaly_count,
+                "results": results
+            })
+        return response, 200
+        
+    except Exception as e:
+        logger.error(f"Error in batch simulation: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+def ingest_body(body, content_type):
+    """Validate, process, log and record an ingest body; returns (payload, status)"""
+    if len(body) > MAX_INGEST_BYTES:
+        return {"error": f"Body too large: {len(body)} bytes (max {MAX_INGEST_BYTES})"}, 413
+    
+    try:
+        readings = parse_ingest_body(body, content_type or '')
+    except (ValueError, UnicodeDecodeError) as e:
+        return {"error": f"Invalid ingest body: {str(e)}"}, 400
+    
+    if len(readings) > MAX_INGEST_BATCH:
+        return {
+            "error": f"Batch too large: {len(readings)} readings (max {MAX_INGEST_BATCH})"
+        }, 413
+    
+    raw_events = []
+    rejected = []
+    for index, reading in enumerate(readings):
+        try:
+            raw_events.append(normalize_reading(reading))
+        except IngestValidationError as e:
+            rejected.append({"index": index, "error": str(e)})
+    
+    try:
+        with pipeline_metrics.time("PerceptualLayer.process_batch"):
+            results = PerceptualLayer.process_batch(raw_events)
+        with pipeline_metrics.time("IncidentTracker.coalesce"):
+            logged, published = incident_tracker.coalesce(results)
+        with pipeline_metrics.time("EventLogger.log_events"):
+            EventLogger.log_events(logged)
+        
+        with pipeline_metrics.time("record_events"):
+            anomaly_count = record_events(results, published)
+        
+        return {
+            "accepted": len(results),
+            "rejected": rejected,
+            "anomalies": anomaly_count,
+            "results": results
+        }, 200
+        
+    except Exception as e:
+        logger.error(f"Error in ingestion: {str(e)}")
+        return {"error": str(e)}, 500
+
+
+@app.route('/ingest', methods=['POST'])
+def ingest_events():
+    """Ingest a batch of real telemetry readings (JSON array or NDJSON)"""
+    payload, status = ingest_body(request.get_data(), request.content_type)
+    with pipeline_metrics.time("json_serialization"):
+        response = jsonify(payload)
+    return response, status
+
+
+@app.route('/stream', methods=['GET'])
+def stream_detections():
+    """Server-sent events feed of processed results, optionally filtered by severity"""
+    try:
+        severities = parse_severity_filter(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    subscription = detection_broadcaster.subscribe(severities)
+    if subscription is None:
+        return jsonify({"error": "Too many stream subscribers on this worker"}), 503
+    
+    def generate():
+        try:
+            yield b'retry: 3000\n\n'
+            reported_drops = 0
+            while True:
+                try:
+                    payload = subscription.queue.get(timeout=STREAM_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield b': keepalive\n\n'
+                    continue
+                
+                if subscription.dropped != reported_drops:
+                    reported_drops = subscription.dropped
+                    yield f'event: dropped\ndata: {{"dropped": {reported_drops}}}\n\n'.encode('ascii')
+                yield b'event: detection\ndata: ' + payload + b'\n\n'
+        finally:
+            detection_broadcaster.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/metrics', methods=['GET'])
+@cached_view()
 def get_metrics():
     """Get system metrics"""
-    return jsonify(metrics), 200
+    return jsonify({**metrics_backend.snapshot(), "event_log_write_failures": EventLogger.write_failures()}), 200
 
 
-@app.route('/logs', methods=['GET'])
-def get_logs():
-    """Get event logs"""
-    limit = request.args.get('limit', type=int)
-    logs = EventLogger.get_logs(limit)
-    return jsonify({
-        "logs": logs,
-        "total_logs": len(logs)
-    }), 200
+@app.route('/metrics/prometheus', methods=['GET'])
+def get_prometheus_metrics():
+    """Stage latency histograms, event counters and writer gauges in Prometheus text format"""
+    lines = pipeline_metrics.render()
+    
+    snapshot = metrics_backend.snapshot()
+    writer = EventLogger._writer
+    gauges = (
+        ("grid_recorded_events_total", "counter", "Events recorded in the shared metrics", snapshot["total_events"]),
+        ("grid_recorded_anomalies_total", "counter", "Anomalies recorded in the shared metrics", snapshot["total_anomalies"]),
+        ("grid_event_log_queue_depth", "gauge", "Log batches waiting for the background writer (this worker)",
+         writer.queue_depth() if writer is not None else 0),
+        ("grid_event_log_write_failures_total", "counter",
+         "Log entries dropped because the event store failed to append them (this worker)",
+         EventLogger.write_failures()),
+        ("grid_log_records_dropped_total", "counter", "Application log records dropped by a full log queue (this worker)",
+         DroppingQueueHandler.dropped),
+        ("grid_stream_subscribers", "gauge", "Connected /stream clients (this worker)",
+         detection_broadcaster.subscriber_count())
+    )
+    for name, kind, description, value in gauges:
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4'), 200
 
 
-@app.route('/history', methods=['GET'])
-def get_history():
-    """Get in-memory event history"""
-    limit = request.args.get('limit', default=10, type=int)
-    return jsonify({
-        "history": event_history[-limit:],
-        "total_in_memory": len(event_history)
-    }), 200
+def worker_scoped(result):
+    """Label a response built from this worker process's in-memory state
+    
+    Windowed counts, incidents, threat matches and envelopes are kept per
+    worker, so under several gunicorn workers each one reports only the
+    traffic it served.
+    """
+    result["scope"] = "worker"
+    result["worker_pid"] = os.getpid()
+    return result
 
 
-@app.route('/export', methods=['GET'])
-def export_logs():
-    """Export logs in CSV format"""
-    logs = EventLogger.get_logs()
+@app.route('/metrics/windows', methods=['GET'])
+def get_windowed_metrics():
+    """Get event counts and rates over sliding windows (1m, 5m, 1h)"""
+    component = request.args.get('component')
+    severity = request.args.get('severity')
+    window = request.args.get('window')
     
-    if not logs:
-        return jsonify({"error": "No logs available"}), 404
+    if window is not None:
+        if window not in METRIC_WINDOWS:
+            return jsonify({"error": f"window must be one of {list(METRIC_WINDOWS)}"}), 400
+        return jsonify(worker_scoped(window_aggregator.query(window, component, severity))), 200
     
-    # Create CSV content
-    csv_lines = ["Timestamp,Component,Voltage,Frequency,Latency,V_Deviation,L_Deviation,Anomaly,Severity,Alert_Type"]
+    windows = {}
+    for name in METRIC_WINDOWS:
+        summary = window_aggregator.query(name, component, severity)
+        del summary["series"]
+        windows[name] = summary
+    return jsonify(worker_scoped({"windows": windows})), 200
+
+
+def parse_log_filters(args):
+    """Extract start/end/component/severity log filters from query arguments"""
+    return {
+        "start": parse_timestamp(args['start']) if 'start' in args else None,
+        "end": parse_timestamp(args['end']) if 'end' in args else None,
+        "component": args.get('component'),
+        "severity": args.get('severity')
+    }
+
+
+def logs_json(limit, filters):
+    """Build the /logs body by splicing the stored log lines, without re-encoding them"""
+    lines = EventLogger.get_log_lines(limit, **filters)
+    return b''.join([
+        b'{"logs":[',
+        b','.join(lines),
+        b'],"total_logs":',
+        str(len(lines)).encode('ascii'),
+        b'}'
+    ])
+
+
+@app.route('/scorer', methods=['GET'])
+def get_scorer():
+    """Get the learned anomaly model and its micro-batching statistics"""
+    return jsonify(AnomalyScoringAgent.status()), 200
+
+
+@app.route('/envelopes', methods=['GET'])
+def get_envelopes():
+    """Get the learned per-component behavioral envelopes"""
+    envelopes = envelope_store.snapshot(request.args.get('component'))
+    return jsonify(worker_scoped({
+        "adaptive": ADAPTIVE_ENVELOPES,
+        "envelopes": envelopes,
+        "total_components": len(envelopes),
+        "temporal": temporal_state.snapshot(request.args.get('component')) if TEMPORAL_DETECTION else {}
+    })), 200
+
+
+@app.route('/logs', methods=['GET'])
+@cached_view(reads_log=True)
+def get_logs():
+    """Get event logs, optionally filtered by time range, component and severity"""
+    limit = request.args.get('limit', type=int)
+    try:
+        filters = parse_log_filters(request.args)
+    except ValueError:
+        return jsonify({"error": "start/end must be ISO-8601 timestamps"}), 400
     
-    for log in logs:
-        line = f"{log['timestamp']},{log['component']},{log['voltage']},{log['frequency']},{log['network_latency']},{log['voltage_deviation']},{log['latency_deviation']},{log['is_anomaly']},{log['severity']},{log['alert_type']}"
-        csv_lines.append(line)
+    return app.response_class(logs_json(limit, filters), mimetype='application/json'), 200
+
+
+@app.route('/query', methods=['GET'])
+def query_events():
+    """Query logged events with filters, grouping and aggregates
     
-    csv_content = '\n'.join(csv_lines)
+    Example: /query?start=...&severity=CRITICAL&group_by=component&metrics=count,avg:voltage
+    """
+    try:
+        spec = parse_query_spec(request.args)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
     
-    return csv_content, 200, {
-        'Content-Type': 'text/csv',
-        'Content-Disposition': 'attachment; filename=grid_events.csv'
-    }
+    started = time.perf_counter()
+    result = EventLogger.query(spec)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result), 200
 
 
-# ========================================================
-# FUTURE LAYER PLACEHOLDERS
-# ========================================================
+@app.route('/incidents', methods=['GET'])
+def get_incidents():
+    """Get alerts coalesced into incidents, most recently active first"""
+    status = request.args.get('status')
+    if status not in (None, 'open', 'closed'):
+        return jsonify({"error": "status must be 'open' or 'closed'"}), 400
+    limit = request.args.get('limit', default=100, type=int)
+    return jsonify(worker_scoped(incident_tracker.snapshot(max(limit, 0), status, request.args.get('component')))), 200
+
+
+@app.route('/threat-model', methods=['GET'])
+def get_threats():
+    """Get multi-step attacks matched in the live detection stream"""
+    limit = request.args.get('limit', default=100, type=int)
+    result = threat_matcher.snapshot(max(limit, 0), request.args.get('pattern'))
+    result["enabled"] = THREAT_MODEL_ENABLED
+    return jsonify(worker_scoped(result)), 200
+
 
 @app.route('/threat-model', methods=['POST'])
 def threat_model():
-    """Placeholder for Threat Modeling Layer"""
-    return jsonify({
-        "status": "not_implemented",
-        "message": "Threat Modeling Layer - Future Implementation"
-    }), 501
+    """Match attack patterns over submitted detections or a logged time range"""
+    body = request.get_data()
+    try:
+        payload = json_loads(body) if body.strip() else {}
+        started = time.perf_counter()
+        with pipeline_metrics.time("ThreatModelingLayer.analyze"):
+            result = ThreatModelingLayer.analyze(payload)
+    except ValueError as e:
+        message = str(e) if isinstance(e, ThreatModelError) else f"Invalid JSON body: {str(e)}"
+        return jsonify({"error": message}), 400
+    
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result), 200
 
 
 @app.route('/cascade-predict', methods=['POST'])
 def cascade_predict():
-    """Placeholder for Cascade Prediction Layer"""
-    return jsonify({
-        "status": "not_implemented",
-        "message": "Cascade Prediction Layer - Future Implementation"
-    }), 501
+    """Predict cascading failures from anomalous components over a grid topology"""
+    body = request.get_data()
+    try:
+        payload = json_loads(body) if body.strip() else {}
+        started = time.perf_counter()
+        with pipeline_metrics.time("CascadePredictionLayer.predict"):
+            result = CascadePredictionLayer.predict(payload)
+    except CascadeError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ValueError as e:
+        return jsonify({"error": f"Invalid JSON body: {str(e)}"}), 400
+    
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(result), 200
+
+
+@app.route('/history', methods=['GET'])
+@cached_view()
+def get_history():
+    """Get recent event history"""
+    limit = request.args.get('limit', default=10, type=int)
+    
+    # Splice the cached history payloads straight into the response body
+    body = b''.join([
+        b'{"history":',
+        metrics_backend.history_json(limit),
+        b',"total_in_memory":',
+        str(metrics_backend.history_size()).encode('ascii'),
+        b'}'
+    ])
+    return app.response_class(body, mimetype='application/json'), 200
+
+
+@app.route('/export', methods=['GET'])
+def export_logs():
+    """Stream logs as CSV (default), NDJSON, Parquet or Arrow IPC"""
+    try:
+        body, mimetype, filename = open_export(request.args)
+    except ExportError as e:
+        return jsonify({"error": str(e)}), e.status
+    
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
 
 
 # ========================================================
@@ -0,0 +1,194 @@
+"""
+ASGI Entry Point for Smart Grid Cybersecurity Framework
+Serves the API from an event loop so one process can hold thousands of
+dashboard, stream and ingestion connections.
+
+Run:
+    pip install -r requirements.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+Log reads, queries, exports and ingestion run natively: request bodies are
+read asynchronously and every blocking store read or CPU-heavy batch runs in
+the worker thread pool, so the loop never waits on disk. /stream follows the
+detection broadcaster without holding a thread per client. All other routes
+are served by the Flask app, mounted underneath.
+"""
+
+import asyncio
+import queue
+import time
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # Starlette's bundled (deprecated) adapter
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import app as grid
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with the app's selected codec (orjson/msgspec/json)"""
+
+    def render(self, content):
+        return grid.json_dumps(content)
+
+
+def query_args(request):
+    """Starlette query parameters as the MultiDict the app's parsers expect"""
+    return MultiDict(request.query_params.multi_items())
+
+
+async def cached_body(request, build, media_type='application/json', reads_log=False):
+    """Serve the bytes from `build()` through the app's response cache, with ETag/If-None-Match
+
+    The version lookup and, on a miss, `build` run in the thread pool.
+    """
+    if not grid.RESPONSE_CACHE:
+        return Response(await run_in_threadpool(build), media_type=media_type)
+
+    def lookup():
+        version = grid.cache_version(reads_log)
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        cached = grid.response_cache.get(key, version)
+        if cached is None:
+            body = build()
+            if not grid.cacheable(reads_log):
+                return grid.response_cache.etag(body), body, media_type
+            cached = grid.response_cache.put(key, version, body, media_type)
+        return cached
+
+    etag, body, mimetype = await run_in_threadpool(lookup)
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if parse_etags(request.headers.get('if-none-match')).contains(etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=mimetype, headers=headers)
+
+
+# ========================================================
+# NON-BLOCKING ROUTES
+# ========================================================
+
+async def get_logs(request):
+    """Get event logs, optionally filtered by time range, component and severity"""
+    args = query_args(request)
+    limit = args.get('limit', type=int)
+    try:
+        filters = grid.parse_log_filters(args)
+    except ValueError:
+        return FastJSONResponse({"error": "start/end must be ISO-8601 timestamps"}, status_code=400)
+
+    return await cached_body(request, lambda: grid.logs_json(limit, filters), reads_log=True)
+
+
+async def query_events(request):
+    """Query logged events with filters, grouping and aggregates"""
+    try:
+        spec = grid.parse_query_spec(query_args(request))
+    except grid.QueryError as e:
+        return FastJSONResponse({"error": str(e)}, status_code=400)
+
+    started = time.perf_counter()
+    result = await run_in_threadpool(grid.EventLogger.query, spec)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return FastJSONResponse(result)
+
+
+async def export_logs(request):
+    """Stream logs as CSV (default), NDJSON, Parquet or Arrow IPC"""
+    try:
+        body, mimetype, filename = await run_in_threadpool(grid.open_export, query_args(request))
+    except grid.ExportError as e:
+        return FastJSONResponse({"error": str(e)}, status_code=e.status)
+
+    # A sync iterator is advanced chunk by chunk in the thread pool
+    return StreamingResponse(body, media_type=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
+
+
+async def ingest_events(request):
+    """Ingest a batch of real telemetry readings (JSON array or NDJSON)"""
+    body = await request.body()
+    payload, status = await run_in_threadpool(
+        grid.ingest_body, body, request.headers.get('content-type', '')
+    )
+    return FastJSONResponse(payload, status_code=status)
+
+
+async def stream_detections(request):
+    """Server-sent events feed of processed results, optionally filtered by severity"""
+    try:
+        severities = grid.parse_severity_filter(query_args(request))
+    except ValueError as e:
+        return FastJSONResponse({"error": str(e)}, status_code=400)
+
+    subscription = grid.detection_broadcaster.subscribe(severities)
+    if subscription is None:
+        return FastJSONResponse({"error": "Too many stream subscribers on this worker"}, status_code=503)
+
+    async def generate():
+        try:
+            yield b'retry: 3000\n\n'
+            reported_drops = 0
+            idle_since = time.monotonic()
+            while not await request.is_disconnected():
+                # The broadcaster's pump thread fills the queue; poll it
+                # instead of parking a thread on a blocking get per client
+                try:
+                    payload = subscription.queue.get_nowait()
+                except queue.Empty:
+                    if time.monotonic() - idle_since >= grid.STREAM_KEEPALIVE_INTERVAL:
+                        idle_since = time.monotonic()
+                        yield b': keepalive\n\n'
+                    await asyncio.sleep(grid.STREAM_POLL_INTERVAL)
+                    continue
+
+                idle_since = time.monotonic()
+                if subscription.dropped != reported_drops:
+                    reported_drops = subscription.dropped
+                    yield f'event: dropped\ndata: {{"dropped": {reported_drops}}}\n\n'.encode('ascii')
+                yield b'event: detection\ndata: ' + payload + b'\n\n'
+        finally:
+            grid.detection_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+# ========================================================
+# APPLICATION
+# ========================================================
+
+@asynccontextmanager
+async def lifespan(application):
+    yield
+    # Drain the background log writer before the process exits
+    await run_in_threadpool(grid.EventLogger.shutdown)
+
+
+app = Starlette(
+    routes=[
+        Route('/logs', get_logs, methods=['GET']),
+        Route('/query', query_events, methods=['GET']),
+        Route('/export', export_logs, methods=['GET']),
+        Route('/ingest', ingest_events, methods=['POST']),
+        Route('/stream', stream_detections, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(grid.app))
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,319 @@
+"""
+Benchmark Suite for Smart Grid Cybersecurity Framework
+Measures the detection pipeline, the event log and the HTTP endpoints locally
+and saves the results as JSON for regression comparison.
+
+Usage:
+    python benchmark.py                                  # full run, writes benchmark_results.json
+    python benchmark.py --quick                          # 10k-line logs only, fewer iterations
+    python benchmark.py --output new.json --compare benchmark_results.json
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+from werkzeug.serving import make_server
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LOG_SIZES = (10000, 1000000)
+DEFAULT_TOLERANCE = 0.25  # Slowdown (fraction of the baseline) reported as a regression
+
+app = None  # Imported by load_app() inside the scratch directory
+
+logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No per-request access lines
+
+
+def load_app(work_dir):
+    """Import the app from inside a scratch directory
+
+    The app reads its storage paths at import time, so importing it after
+    the chdir keeps the benchmark away from real logs and shared metrics state.
+    """
+    global app
+    os.chdir(work_dir)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('DIAG_LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('METRICS_BACKEND', 'local')
+    sys.path.insert(0, REPO_DIR)
+
+    import app as grid_app
+    app = grid_app
+
+
+# ========================================================
+# TIMING HELPERS
+# ========================================================
+
+def summarize(samples, operations=None):
+    """Summarize per-call latencies (seconds) as microsecond statistics"""
+    samples = np.asarray(samples, dtype=np.float64)
+    total = samples.sum()
+    operations = operations or len(samples)
+    return {
+        "calls": len(samples),
+        "mean_us": round(samples.mean() * 1e6, 2),
+        "p50_us": round(np.percentile(samples, 50) * 1e6, 2),
+        "p99_us": round(np.percentile(samples, 99) * 1e6, 2),
+        "ops_per_sec": round(operations / total, 1) if total > 0 else None
+    }
+
+
+def time_calls(function, iterations, warmup=10):
+    """Time `iterations` calls of `function` after a short warm-up"""
+    for _ in range(min(warmup, iterations)):
+        function()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def report(results, name, stats):
+    results[name] = stats
+    print(f"  {name:<42} p50 {stats['p50_us']:>11,.1f} us   p99 {stats['p99_us']:>11,.1f} us   "
+          f"{stats['ops_per_sec'] or 0:>12,.1f} ops/s")
+
+
+# ========================================================
+# PIPELINE BENCHMARKS
+# ========================================================
+
+def bench_pipeline(results, iterations):
+    print("\nDetection pipeline")
+    raw_event = app.SmartGridSimulator.generate_event()
+    system_state = app.DataFusionAgent.process(raw_event)
+    behavioral_metrics = app.BehavioralEnvelopeAgent.analyze(system_state)
+
+    report(results, "generate_event", time_calls(app.SmartGridSimulator.generate_event, iterations))
+    report(results, "DataFusionAgent.process", time_calls(lambda: app.DataFusionAgent.process(raw_event), iterations))
+    report(results, "BehavioralEnvelopeAgent.analyze",
+           time_calls(lambda: app.BehavioralEnvelopeAgent.analyze(system_state), iterations))
+    report(results, "AnomalyDetectionAgent.detect",
+           time_calls(lambda: app.AnomalyDetectionAgent.detect(behavioral_metrics), iterations))
+    report(results, "PerceptualLayer.process_event",
+           time_calls(lambda: app.PerceptualLayer.process_event(raw_event), iterations))
+
+    columns = app.SmartGridSimulator.generate_columns(100000, seed=1)
+    stats = time_calls(lambda: app.PerceptualLayer.process_columns(columns), max(iterations // 100, 5), warmup=2)
+    stats["ops_per_sec"] = round(stats["ops_per_sec"] * 100000, 1)  # events, not batches
+    report(results, "PerceptualLayer.process_columns[100k]", stats)
+
+
+# ========================================================
+# EVENT LOG BENCHMARKS
+# ========================================================
+
+def reset_event_log(directory):
+    """Point the EventLogger at a fresh, empty store"""
+    app.EventLogger.shutdown()
+    app.EventLogger._store = None
+    app.EventLogger._writer = None
+    app.EventLogger.LOG_DIR = directory
+    app.EVENT_STORE_DIR = directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def fill_event_log(size, chunk=100000):
+    """Append `size` processed events, spread over 30 days, in large batches"""
+    store = app.EventLogger.get_store()
+    interval = 30 * 24 * 3600 / size
+    for offset in range(0, size, chunk):
+        count = min(chunk, size - offset)
+        raw_events = app.SmartGridSimulator.generate_batch(
+            count, seed=offset, start=datetime(2024, 1, 1) + timedelta(seconds=offset * interval), interval=interval
+        )
+        store.append([app.EventLogger.build_log_entry(result) for result in app.PerceptualLayer.process_batch(raw_events)])
+
+
+def bench_event_log(results, sizes, iterations):
+    for size in sizes:
+        print(f"\nEvent log ({app.EVENT_STORE}, {size:,} lines)")
+        reset_event_log(os.path.abspath(f'log-{size}'))  # Inside the scratch directory
+        started = time.perf_counter()
+        fill_event_log(size)
+        print(f"  (filled in {time.perf_counter() - started:.1f} s)")
+
+        processed = app.PerceptualLayer.process_event(app.SmartGridSimulator.generate_event())
+        writer = app.EventLogger.get_writer()
+        stats = time_calls(lambda: app.EventLogger.log_event(processed), iterations)
+        if writer is not None:
+            flush_started = time.perf_counter()
+            writer.flush()
+            stats["flush_us"] = round((time.perf_counter() - flush_started) * 1e6, 2)
+        report(results, f"EventLogger.log_event[{size}]", stats)
+
+        component = processed["event"]["component"]
+        latest = app.parse_timestamp(app.EventLogger.get_logs(1)[0]["timestamp"])
+        report(results, f"EventLogger.get_logs[{size}] limit=100",
+               time_calls(lambda: app.EventLogger.get_logs(100), iterations))
+        report(results, f"EventLogger.get_logs[{size}] component",
+               time_calls(lambda: app.EventLogger.get_logs(100, component=component), iterations))
+        report(results, f"EventLogger.get_logs[{size}] critical",
+               time_calls(lambda: app.EventLogger.get_logs(100, severity="CRITICAL"), iterations))
+        report(results, f"EventLogger.get_logs[{size}] last hour",
+               time_calls(lambda: app.EventLogger.get_logs(start=latest - 3600), max(iterations // 10, 5)))
+
+
+# ========================================================
+# HTTP BENCHMARKS
+# ========================================================
+
+HTTP_ENDPOINTS = (
+    ("/simulate", "GET /simulate"),
+    ("/logs?limit=100", "GET /logs?limit=100"),
+    ("/export?format=ndjson&severity=CRITICAL", "GET /export (critical, ndjson)"),
+)
+
+
+def bench_test_client(results, iterations):
+    print("\nHTTP endpoints (Flask test client)")
+    client = app.app.test_client()
+    for path, label in HTTP_ENDPOINTS:
+        def call():
+            response = client.get(path)
+            response.get_data()
+            assert response.status_code == 200, f"{path} returned {response.status_code}"
+        report(results, f"test_client {label}", time_calls(call, iterations))
+
+
+def bench_server(results, requests_per_client, concurrency):
+    """Drive a threaded local server with concurrent keep-alive clients"""
+    print(f"\nHTTP endpoints (local threaded server, {concurrency} clients)")
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_port
+
+    def client(path):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        samples = []
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            samples.append(time.perf_counter() - started)
+            if response.status != 200:
+                raise RuntimeError(f"{path} returned {response.status}")
+        connection.close()
+        return samples
+
+    try:
+        for path, label in HTTP_ENDPOINTS:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                started = time.perf_counter()
+                samples = [s for client_samples in pool.map(client, [path] * concurrency) for s in client_samples]
+                elapsed = time.perf_counter() - started
+            stats = summarize(samples)
+            stats["ops_per_sec"] = round(len(samples) / elapsed, 1)  # wall-clock throughput
+            report(results, f"server {label}", stats)
+    finally:
+        server.shutdown()
+
+
+# ========================================================
+# REGRESSION COMPARISON
+# ========================================================
+
+def compare(results, baseline_path, tolerance):
+    """Print p50 changes against a saved run; return the regressed benchmarks"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%})")
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50_us"], stats["p50_us"]
+        change = (after - before) / before if before else 0.0
+        flag = "REGRESSION" if change > tolerance else ""
+        print(f"  {name:<42} {before:>11,.1f} -> {after:>11,.1f} us  {change:+7.1%}  {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline and HTTP endpoints")
+    parser.add_argument('--output', default=os.path.join(REPO_DIR, 'benchmark_results.json'),
+                        help="Where to save the results (JSON)")
+    parser.add_argument('--compare', help="Earlier results to compare against; exits 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed p50 slowdown before a benchmark counts as regressed")
+    parser.add_argument('--log-sizes', default=','.join(map(str, DEFAULT_LOG_SIZES)),
+                        help="Comma-separated event log sizes to benchmark")
+    parser.add_argument('--iterations', type=int, default=2000, help="Calls per micro-benchmark")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients for the local server")
+    parser.add_argument('--quick', action='store_true', help="10k-line logs and fewer iterations")
+    args = parser.parse_args(argv)
+
+    # Resolve user paths against the caller's directory before moving into the scratch one
+    args.output = os.path.abspath(args.output)
+    args.compare = args.compare and os.path.abspath(args.compare)
+    caller_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='grid-benchmark-')
+    load_app(work_dir)
+
+    sizes = [int(size) for size in args.log_sizes.split(',') if size]
+    iterations = args.iterations
+    if args.quick:
+        sizes, iterations = [10000], min(iterations, 300)
+
+    results = {}
+    started = time.perf_counter()
+    try:
+        bench_pipeline(results, iterations)
+        bench_event_log(results, sizes, iterations)
+        bench_test_client(results, max(iterations // 10, 20))
+        bench_server(results, max(iterations // (10 * args.concurrency), 10), args.concurrency)
+    finally:
+        app.EventLogger.shutdown()
+        os.chdir(caller_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "event_store": app.EVENT_STORE,
+            "event_log_async": app.EVENT_LOG_ASYNC,
+            "adaptive_envelopes": app.ADAPTIVE_ENVELOPES,
+            "log_level": app.LOG_LEVEL,
+            "diag_log_level": app.DIAG_LOG_LEVEL,
+            "log_sizes": sizes,
+            "iterations": iterations,
+            "duration_seconds": round(time.perf_counter() - started, 1)
+        },
+        "results": results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
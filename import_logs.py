@@ -0,0 +1,92 @@
+"""
+Import Segment Event Logs into the SQLite Event Store
+Copies the JSONL event logs written with EVENT_STORE=segments (rotated
+segments and a legacy single-file log) into the monthly SQLite partitions
+read with EVENT_STORE=sqlite, so switching stores keeps the history.
+
+Usage:
+    python import_logs.py                                  # event_logs/ (+ event_logs.jsonl) -> event_store/
+    python import_logs.py old_logs/ --store-dir /data/event_store
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import app
+from replay_logs import iter_chunks
+
+DEFAULT_CHUNK_SIZE = 20000  # Log lines per insert transaction
+
+
+def default_sources():
+    """The legacy log file and the segment directory, whichever exist"""
+    return [path for path in (app.EventLogger.LOG_FILE, app.EventLogger.LOG_DIR) if os.path.exists(path)]
+
+
+def import_logs(sources, store, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Append every valid entry of the given log files/directories to `store`
+
+    Returns (imported, skipped) line counts.
+    """
+    imported = skipped = 0
+    for source in sources:
+        for lines in iter_chunks(source, chunk_size):
+            entries = []
+            for line in lines:
+                try:
+                    entry = app.json_loads(line)
+                    valid = (isinstance(entry, dict) and isinstance(entry.get("component"), str)
+                             and isinstance(entry.get("severity"), str) and entry.get("is_anomaly") is not None)
+                except ValueError:
+                    valid = False
+                if valid:
+                    entries.append(entry)
+                else:
+                    skipped += 1
+            store.append(entries)
+            imported += len(entries)
+    return imported, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import segment event logs into the SQLite event store")
+    parser.add_argument('sources', nargs='*',
+                        help=f"Log files or segment directories (default: {app.EventLogger.LOG_FILE} and "
+                             f"{app.EventLogger.LOG_DIR}/)")
+    parser.add_argument('--store-dir', default=app.EVENT_STORE_DIR,
+                        help=f"SQLite store directory (default: {app.EVENT_STORE_DIR})")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Log lines per transaction")
+    parser.add_argument('--append', action='store_true',
+                        help="Import into a store that already holds events (re-importing duplicates them)")
+    args = parser.parse_args(argv)
+
+    sources = args.sources or default_sources()
+    if not sources:
+        sys.exit("No segment logs found to import")
+
+    store = app.SQLiteEventStore(args.store_dir)
+    try:
+        if store.has_events() and not args.append:
+            sys.exit(f"{args.store_dir} already holds events; pass --append to import anyway")
+        started = time.perf_counter()
+        try:
+            imported, skipped = import_logs(sources, store, args.chunk_size)
+        except FileNotFoundError as e:
+            sys.exit(f"Import failed: {e}")
+    finally:
+        store.close()
+
+    print(json.dumps({
+        "sources": sources,
+        "store_dir": args.store_dir,
+        "imported_events": imported,
+        "skipped_lines": skipped,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Replay Historical Event Logs Through the Perceptual Layer
+Re-scores logged events with the current (or overridden) detection thresholds
+and the stateful per-component checks across all CPU cores, and reports how
+the detections changed.
+
+Usage:
+    python replay_logs.py                              # replay the configured event store
+    python replay_logs.py event_logs/                  # a directory of rotated segments
+    python replay_logs.py event_logs.jsonl --voltage-threshold 12 --output rescored.jsonl --diff diff.jsonl
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import app
+
+DEFAULT_CHUNK_SIZE = 20000  # Log lines per round, split across the workers by component
+
+
+# ========================================================
+# LOG SOURCES
+# ========================================================
+
+def log_files(source):
+    """Resolve a log file or a directory of rotated segments, oldest first"""
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, 'segment-*.jsonl')))
+        return files or sorted(glob.glob(os.path.join(source, '*.jsonl')))
+    if os.path.exists(source):
+        return [source]
+    raise FileNotFoundError(f"No log file or directory at {source}")
+
+
+def iter_chunks(source, chunk_size):
+    """Yield lists of raw JSONL lines, `chunk_size` at a time
+
+    With no source, the configured event store (segments or SQLite) is read.
+    """
+    if source is None:
+        chunk = []
+        for lines in app.EventLogger.iter_log_chunks(raw=True):
+            chunk.extend(lines)
+            while len(chunk) >= chunk_size:
+                yield chunk[:chunk_size]
+                chunk = chunk[chunk_size:]
+        if chunk:
+            yield chunk
+        return
+
+    for path in log_files(source):
+        with open(path, 'rb') as f:
+            chunk = []
+            for line in f:
+                if line.strip():
+                    chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+
+# ========================================================
+# WORKERS
+# ========================================================
+
+def init_worker(thresholds):
+    """Apply threshold overrides in a worker process
+
+    Replays use fixed thresholds: the adaptive envelopes learn in event
+    order, which parallel chunks cannot reproduce.
+    """
+    app.ADAPTIVE_ENVELOPES = False
+    for name, value in thresholds.items():
+        if value is not None:
+            setattr(app, name, value)
+    app.logger.setLevel('WARNING')
+
+
+def rescore_chunk(lines, states=None):
+    """Re-run one shard of log lines through the detection agents, in log order
+
+    With stateful detection on, `states` is the shard's per-component
+    state left by its previous chunk (from TemporalStateTable.export_states),
+    and the final verdicts combine the threshold rules with the frequency,
+    drift and persistence checks exactly as the live pipeline does.
+
+    Returns one (re-scored JSONL line, diff record or None) pair per input
+    line (None for skipped lines), a transition counter, the number of
+    skipped lines and the shard's state to pass to its next chunk.
+    """
+    entries, positions, skipped = [], [], 0
+    for position, line in enumerate(lines):
+        try:
+            entry = json.loads(line)
+            float(entry["voltage"]), float(entry["frequency"]), float(entry["network_latency"]), entry["component"]
+        except (ValueError, KeyError, TypeError):
+            skipped += 1
+            continue
+        entries.append(entry)
+        positions.append(position)
+
+    records = [None] * len(lines)
+    if not entries:
+        return records, Counter(), skipped, states
+
+    columns = app.DataFusionAgent.process_batch(entries)
+    batch_metrics, batch_detection = app.PerceptualLayer.process_columns(columns)
+    detections = [app.DETECTIONS[code] for code in batch_detection["severity_code"].tolist()]
+    if app.TEMPORAL_DETECTION:
+        app.temporal_state.import_states(states or [])
+        temporal_results = app.AnomalyDetectionAgent.track_batch(columns, batch_detection)
+        detections = list(map(app.AnomalyDetectionAgent.combine, detections, temporal_results))
+        states = app.temporal_state.export_states()
+    voltage_deviation = batch_metrics["voltage_deviation"].tolist()
+    latency_deviation = batch_metrics["latency_deviation"].tolist()
+
+    transitions = Counter()
+    for i, entry in enumerate(entries):
+        detection = detections[i]
+        original = entry.get("severity", "UNKNOWN")
+        replayed = detection.severity.value
+        transitions[(original, replayed)] += 1
+
+        rescored = json.dumps({
+            **entry,
+            "voltage_deviation": voltage_deviation[i],
+            "latency_deviation": latency_deviation[i],
+            "is_anomaly": detection.is_anomaly,
+            "severity": replayed,
+            "alert_type": detection.alert_type
+        }) + '\n'
+
+        diff = None
+        if original != replayed:
+            diff = json.dumps({
+                "timestamp": entry.get("timestamp"),
+                "component": entry["component"],
+                "original_severity": original,
+                "replayed_severity": replayed,
+                "original_anomaly": entry.get("is_anomaly"),
+                "replayed_anomaly": detection.is_anomaly
+            }) + '\n'
+        records[positions[i]] = (rescored, diff)
+
+    return records, transitions, skipped, states
+
+
+def shard_of(line, shards):
+    """Shard index of a log line by its component (shard 0 for unreadable lines)"""
+    try:
+        return zlib.crc32(json.loads(line)["component"].encode('utf-8')) % shards
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return 0
+
+
+# ========================================================
+# REPLAY
+# ========================================================
+
+def replay(source=None, output=None, diff_output=None, workers=None,
+           chunk_size=DEFAULT_CHUNK_SIZE, voltage_threshold=None, latency_threshold=None,
+           baseline_voltage=None, baseline_latency=None, progress=None):
+    """Replay logged events across a process pool and summarize the changes
+
+    Args:
+        source: Log file or segment directory (None = the configured event store)
+        output: Path for the re-scored JSONL log (optional)
+        diff_output: Path for the JSONL records whose severity changed (optional)
+        workers: Worker processes (default: all cores)
+        chunk_size: Log lines per round (each worker takes the components of its shard)
+        voltage_threshold / latency_threshold / baseline_*: Detection overrides
+        progress: Optional callback(events_processed, elapsed_seconds)
+
+    Returns:
+        dict: Replay report with detection changes and throughput
+    """
+    workers = workers or os.cpu_count() or 1
+    thresholds = {
+        "VOLTAGE_THRESHOLD": voltage_threshold,
+        "LATENCY_THRESHOLD": latency_threshold,
+        "BASELINE_VOLTAGE": baseline_voltage,
+        "BASELINE_LATENCY": baseline_latency
+    }
+
+    out_file = open(output, 'w') if output else None
+    diff_file = open(diff_output, 'w') if diff_output else None
+    transitions, events, skipped, chunks = Counter(), 0, 0, 0
+    started = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(thresholds,)) as pool:
+            # Each component always lands in the same shard and a shard's chunks run one
+            # after another, so stateful checks see every component's readings in log
+            # order; shards run in parallel and results are written back in log order
+            states = [None] * workers
+            for chunk in iter_chunks(source, chunk_size):
+                shards = [[] for _ in range(workers)]
+                for index, line in enumerate(chunk):
+                    shards[shard_of(line, workers)].append(index)
+                futures = [(shard, indexes, pool.submit(rescore_chunk, [chunk[i] for i in indexes], states[shard]))
+                           for shard, indexes in enumerate(shards) if indexes]
+
+                records = [None] * len(chunk)
+                for shard, indexes, future in futures:
+                    shard_records, chunk_transitions, chunk_skipped, states[shard] = future.result()
+                    for index, record in zip(indexes, shard_records):
+                        records[index] = record
+                    transitions.update(chunk_transitions)
+                    skipped += chunk_skipped
+
+                records = [record for record in records if record is not None]
+                if out_file:
+                    out_file.writelines(rescored for rescored, _ in records)
+                if diff_file:
+                    diff_file.writelines(diff for _, diff in records if diff)
+                events += len(records)
+                chunks += 1
+                if progress:
+                    progress(events, time.perf_counter() - started)
+    finally:
+        for f in (out_file, diff_file):
+            if f:
+                f.close()
+
+    elapsed = time.perf_counter() - started
+    original_counts, replayed_counts = Counter(), Counter()
+    for (original, replayed), count in transitions.items():
+        original_counts[original] += count
+        replayed_counts[replayed] += count
+
+    return {
+        "source": source or f"event store ({app.EVENT_STORE})",
+        "events": events,
+        "skipped_lines": skipped,
+        "chunks": chunks,
+        "workers": workers,
+        "stateful_detection": app.TEMPORAL_DETECTION,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(events / elapsed, 1) if elapsed > 0 else None,
+        "thresholds": {name.lower(): getattr(app, name) if value is None else value
+                       for name, value in thresholds.items()},
+        "original_severity": dict(original_counts),
+        "replayed_severity": dict(replayed_counts),
+        "changed": sum(count for (original, replayed), count in transitions.items() if original != replayed),
+        "newly_flagged": sum(count for (original, replayed), count in transitions.items()
+                             if original == "NORMAL" and replayed != "NORMAL"),
+        "cleared": sum(count for (original, replayed), count in transitions.items()
+                       if original not in ("NORMAL", "UNKNOWN") and replayed == "NORMAL"),
+        "transitions": {f"{original}->{replayed}": count
+                        for (original, replayed), count in sorted(transitions.items()) if original != replayed}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay event logs through the perceptual layer")
+    parser.add_argument('source', nargs='?', help="Log file or segment directory (default: configured event store)")
+    parser.add_argument('--output', help="Write re-scored events to this JSONL file")
+    parser.add_argument('--diff', help="Write events whose severity changed to this JSONL file")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Log lines per round")
+    parser.add_argument('--voltage-threshold', type=float, help=f"Default: {app.VOLTAGE_THRESHOLD}")
+    parser.add_argument('--latency-threshold', type=float, help=f"Default: {app.LATENCY_THRESHOLD}")
+    parser.add_argument('--baseline-voltage', type=float, help=f"Default: {app.BASELINE_VOLTAGE}")
+    parser.add_argument('--baseline-latency', type=float, help=f"Default: {app.BASELINE_LATENCY}")
+    parser.add_argument('--quiet', action='store_true', help="Only print the final report")
+    args = parser.parse_args(argv)
+
+    def progress(events, elapsed):
+        sys.stderr.write(f"\r{events:,} events replayed ({events / max(elapsed, 1e-9):,.0f}/s)")
+        sys.stderr.flush()
+
+    report = replay(
+        args.source, args.output, args.diff, args.workers, args.chunk_size,
+        args.voltage_threshold, args.latency_threshold, args.baseline_voltage, args.baseline_latency,
+        progress=None if args.quiet else progress
+    )
+    if not args.quiet:
+        sys.stderr.write('\n')
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
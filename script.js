@@ -277,17 +277,16 @@ function handleError(error) {
 }
 
 // =========================================
-// AUTO-REFRESH (Optional)
+// LIVE DETECTION FEED
 // =========================================
 
-// Uncomment to enable auto-simulation every 10 seconds
-/*
-setInterval(() => {
-    if (!loadingOverlay.classList.contains('active')) {
-        handleSimulation();
-    }
-}, 10000);
-*/
+// Follow detections pushed by the backend instead of polling /simulate
+if (window.EventSource) {
+    const detectionStream = new EventSource(`${API_BASE_URL}/stream`);
+    detectionStream.addEventListener('detection', (message) => {
+        updateDashboard(JSON.parse(message.data));
+    });
+}
 
 // =========================================
 // CONSOLE INFO
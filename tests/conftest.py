@@ -0,0 +1,75 @@
+"""
+Shared setup for the local test suite
+
+The app reads its configuration and storage paths at import time, so the
+environment is fixed here, before any test module imports it, and every
+test run works inside a scratch directory instead of the repository.
+
+Run:
+    python -m pytest tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix='grid-tests-')
+
+os.chdir(WORK_DIR)
+os.environ.update({
+    'LOG_LEVEL': 'ERROR',
+    'DIAG_LOG_LEVEL': 'ERROR',
+    'METRICS_BACKEND': 'local',
+    'EVENT_LOG_ASYNC': '0',
+    'ML_MODEL_PATH': os.path.join(WORK_DIR, 'anomaly_model.npz'),
+    'INCIDENT_LOG': ''
+})
+sys.path.insert(0, REPO_DIR)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    os.chdir(REPO_DIR)
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def log_entry():
+    """Factory for event log entries `seconds` after 2024-01-01T00:00:00"""
+    def make(seconds, component="Transformer_T1", severity="NORMAL", voltage=230.0, network_latency=20.0):
+        codes = {"NORMAL": 0, "MEDIUM": 1, "HIGH": 2, "CRITICAL": 3}
+        code = codes[severity]
+        return {
+            "timestamp": (datetime(2024, 1, 1) + timedelta(seconds=seconds)).isoformat(),
+            "component": component,
+            "voltage": voltage,
+            "frequency": 50.0,
+            "network_latency": network_latency,
+            "voltage_deviation": abs(voltage - 230.0),
+            "latency_deviation": abs(network_latency - 20.0),
+            "is_anomaly": code > 0,
+            "severity": severity,
+            "alert_type": ("No Anomaly", "Latency Anomaly", "Voltage Anomaly", "Voltage & Latency Anomaly")[code]
+        }
+    return make
+
+
+@pytest.fixture
+def event_log(tmp_path, monkeypatch):
+    """Point the event logger at a fresh store behind the background writer"""
+    import app
+    
+    app.EventLogger.shutdown()
+    monkeypatch.setattr(app.EventLogger, "_store", None)
+    monkeypatch.setattr(app.EventLogger, "_writer", None)
+    monkeypatch.setattr(app.EventLogger, "LOG_DIR", str(tmp_path / "event_logs"))
+    monkeypatch.setattr(app.EventLogger, "LOG_FILE", str(tmp_path / "event_logs.jsonl"))
+    monkeypatch.setattr(app, "EVENT_STORE_DIR", str(tmp_path / "event_store"))
+    monkeypatch.setattr(app, "EVENT_LOG_ASYNC", True)
+    monkeypatch.setattr(app, "EVENT_LOG_FLUSH_INTERVAL", 5.0)
+    yield app.EventLogger
+    app.EventLogger.shutdown()
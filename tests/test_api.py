@@ -0,0 +1,294 @@
+"""HTTP endpoints through the Flask test client"""
+
+import os
+import queue
+import re
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(event_log):
+    return app.app.test_client()
+
+
+def test_export_right_after_simulate(client):
+    assert client.get('/simulate').status_code == 200
+    
+    response = client.get('/export?format=ndjson')
+    assert response.status_code == 200
+    assert len(response.get_data().splitlines()) == 1
+
+
+def test_export_of_empty_log_is_404(client):
+    assert client.get('/export').status_code == 404
+
+
+def drain(subscription, expected, timeout=5.0):
+    """Collect queued stream payloads until `expected` were received or dropped"""
+    received = []
+    deadline = time.monotonic() + timeout
+    while len(received) + subscription.dropped < expected and time.monotonic() < deadline:
+        try:
+            received.append(subscription.queue.get(timeout=0.05))
+        except queue.Empty:
+            pass
+    return received
+
+
+@pytest.mark.parametrize("buffer_size", [1000, 100])
+def test_stream_accounts_for_every_result_of_a_batch(client, monkeypatch, buffer_size):
+    monkeypatch.setattr(app.detection_broadcaster, "buffer_size", buffer_size)
+    subscription = app.detection_broadcaster.subscribe()
+    try:
+        time.sleep(app.STREAM_POLL_INTERVAL)  # Let the pump take its starting cursor
+        assert client.get('/simulate?count=500').status_code == 200
+        time.sleep(0.5)  # The pump fans the batch out while the client is not reading
+        received = drain(subscription, 500)
+        
+        assert len(received) + subscription.dropped == 500
+        assert subscription.dropped == max(500 - buffer_size, 0)
+    finally:
+        app.detection_broadcaster.unsubscribe(subscription)
+
+
+@pytest.mark.parametrize("path", ["/metrics/windows", "/metrics/windows?window=1m", "/incidents", "/threat-model", "/envelopes"])
+def test_per_worker_state_is_labelled(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.get_json()["scope"] == "worker"
+    assert response.get_json()["worker_pid"] == os.getpid()
+
+
+@pytest.fixture(params=["segments", "sqlite"])
+def query_client(request, event_log, monkeypatch, log_entry):
+    """A client over either event store holding a small known event set"""
+    monkeypatch.setattr(app, "EVENT_STORE", request.param)
+    event_log.get_store().append(
+        [log_entry(second, component=f"Transformer_T{second % 2}") for second in range(6)]
+        + [log_entry(3600, severity="CRITICAL", voltage=300.0, network_latency=90.0),
+           log_entry(3601, component="Substation_S1", severity="MEDIUM", network_latency=80.0)]
+    )
+    return app.app.test_client()
+
+
+def groups_by(response, column):
+    assert response.status_code == 200
+    return {group[column]: group for group in response.get_json()["groups"]}
+
+
+def test_query_groups_and_aggregates(query_client):
+    groups = groups_by(query_client.get('/query?group_by=severity&metrics=count,avg:voltage,max:network_latency'),
+                       "severity")
+    
+    assert {severity: group["count"] for severity, group in groups.items()} == {"NORMAL": 6, "CRITICAL": 1, "MEDIUM": 1}
+    assert groups["NORMAL"]["avg_voltage"] == pytest.approx(230.0)
+    assert groups["CRITICAL"]["max_network_latency"] == pytest.approx(90.0)
+
+
+def test_query_filters_before_grouping(query_client):
+    groups = groups_by(query_client.get('/query?is_anomaly=false&group_by=component'), "component")
+    assert {component: group["count"] for component, group in groups.items()} == {"Transformer_T0": 3,
+                                                                                   "Transformer_T1": 3}
+    
+    groups = groups_by(query_client.get('/query?start=2024-01-01T00:30:00&group_by=component'), "component")
+    assert {component: group["count"] for component, group in groups.items()} == {"Transformer_T1": 1,
+                                                                                   "Substation_S1": 1}
+
+
+def test_query_time_buckets(query_client):
+    response = query_client.get('/query?group_by=bucket&interval=3600&metrics=count,sum:voltage')
+    assert response.status_code == 200
+    assert [group["count"] for group in response.get_json()["groups"]] == [6, 2]
+
+
+def test_query_rows_are_the_most_recent_matches(query_client):
+    response = query_client.get('/query?component=Transformer_T1&limit=2')
+    assert response.status_code == 200
+    assert [row["timestamp"] for row in response.get_json()["rows"]] == ["2024-01-01T00:00:05", "2024-01-01T01:00:00"]
+
+
+def test_query_rejects_unknown_grouping(query_client):
+    assert query_client.get('/query?group_by=voltage').status_code == 400
+
+
+@pytest.fixture
+def cache_client(client, monkeypatch):
+    monkeypatch.setattr(app, "RESPONSE_CACHE", True)
+    monkeypatch.setattr(app, "response_cache", app.ResponseCache(app.RESPONSE_CACHE_ENTRIES, app.RESPONSE_CACHE_MAX_BODY))
+    return client
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/history", "/logs"])
+def test_unchanged_response_revalidates_with_304(cache_client, path):
+    first = cache_client.get(path)
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+    
+    second = cache_client.get(path, headers={'If-None-Match': etag})
+    assert second.status_code == 304 and second.get_data() == b''
+    assert app.response_cache.hits == 1
+    
+    assert cache_client.get('/simulate').status_code == 200
+    third = cache_client.get(path, headers={'If-None-Match': etag})
+    assert third.status_code == 200 and third.headers['ETag'] != etag
+
+
+def test_logs_cache_is_invalidated_by_simulate_and_ingest(cache_client, event_log):
+    assert cache_client.get('/logs').get_json()["total_logs"] == 0
+    
+    assert cache_client.get('/simulate?count=20').status_code == 200
+    assert cache_client.get('/logs').get_json()["total_logs"] == event_log.get_store().count() > 0
+    
+    before = event_log.get_store().count()
+    readings = [{"component": f"Transformer_C{i}", "voltage": 231.0, "frequency": 50.0, "network_latency": 20.0}
+                for i in range(3)]
+    assert cache_client.post('/ingest', json=readings).status_code == 200
+    assert cache_client.get('/logs').get_json()["total_logs"] == event_log.get_store().count() == before + 3
+
+
+def test_logs_read_before_commit_is_not_served_after_it(cache_client, event_log, monkeypatch):
+    monkeypatch.setattr(app, "EVENT_LOG_READ_WAIT", 0.01)
+    store = event_log.get_store()
+    release = app.threading.Event()
+    append = store.append
+    monkeypatch.setattr(store, "append", lambda entries: (release.wait(5), append(entries)))
+    
+    assert cache_client.get('/simulate').status_code == 200
+    assert cache_client.get('/logs').get_json()["total_logs"] == 0  # Read timed out behind the writer
+    
+    release.set()
+    assert event_log.catch_up()
+    assert cache_client.get('/logs').get_json()["total_logs"] == store.count() == 1
+
+
+def ingest_reading(component="Transformer_I1", **fields):
+    return {"timestamp": "2024-03-01T00:00:00", "component": component, "voltage": 231.0,
+            "frequency": 50.0, "network_latency": 20.0, **fields}
+
+
+@pytest.fixture
+def write_calls(monkeypatch):
+    """Entries passed to each event log write"""
+    calls = []
+    write = app.EventLogger._write
+    monkeypatch.setattr(app.EventLogger, "_write", lambda entries: (calls.append(entries), write(entries)))
+    return calls
+
+
+def test_ingest_json_array_is_logged_with_one_write(client, write_calls):
+    readings = [ingest_reading(f"Transformer_I{i}") for i in range(5)]
+    response = client.post('/ingest', json=readings)
+    
+    assert response.status_code == 200
+    assert response.get_json()["accepted"] == 5 and response.get_json()["rejected"] == []
+    assert [len(entries) for entries in write_calls] == [5]
+
+
+def test_ingest_ndjson(client):
+    body = "\n".join(app.json_dumps(ingest_reading(f"Transformer_N{i}")).decode() for i in range(3)) + "\n\n"
+    response = client.post('/ingest', data=body, content_type='application/x-ndjson')
+    
+    assert response.status_code == 200
+    assert response.get_json()["accepted"] == 3
+    assert [result["event"]["component"] for result in response.get_json()["results"]] == \
+        ["Transformer_N0", "Transformer_N1", "Transformer_N2"]
+
+
+def test_ingest_rejects_invalid_rows_and_keeps_the_rest(client, write_calls):
+    readings = [ingest_reading(), ingest_reading(voltage="high"), ingest_reading(event_type=7),
+                ingest_reading(component=""), ingest_reading(timestamp="yesterday")]
+    response = client.post('/ingest', json=readings).get_json()
+    
+    assert response["accepted"] == 1
+    assert [(row["index"], row["error"]) for row in response["rejected"]] == [
+        (1, "missing or non-numeric 'voltage'"),
+        (2, "invalid 'event_type' (expected a string)"),
+        (3, "missing or invalid 'component'"),
+        (4, "invalid 'timestamp' (expected ISO-8601)")
+    ]
+    assert [len(entries) for entries in write_calls] == [1]
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+def test_non_finite_readings_are_rejected(value):
+    with pytest.raises(app.IngestValidationError, match="non-finite 'frequency'"):
+        app.normalize_reading(ingest_reading(frequency=value))
+
+
+def test_oversize_batch_is_rejected(client, monkeypatch, write_calls):
+    monkeypatch.setattr(app, "MAX_INGEST_BATCH", 10)
+    response = client.post('/ingest', json=[ingest_reading()] * 11)
+    assert response.status_code == 413
+    assert "Batch too large" in response.get_json()["error"]
+    assert write_calls == []
+
+
+def test_oversize_body_is_rejected(client, monkeypatch, write_calls):
+    monkeypatch.setitem(app.app.config, 'MAX_CONTENT_LENGTH', 1024)
+    assert client.post('/ingest', json=[ingest_reading()] * 20).status_code == 413
+    
+    monkeypatch.setattr(app, "MAX_INGEST_BYTES", 1024)  # The ASGI route's check
+    payload, status = app.ingest_body(app.json_dumps([ingest_reading()] * 20), 'application/json')
+    assert status == 413 and "Body too large" in payload["error"]
+    assert write_calls == []
+
+
+def test_log_write_failures_are_surfaced(cache_client, event_log, monkeypatch):
+    assert cache_client.get('/metrics').get_json()["event_log_write_failures"] == 0
+    
+    store = event_log.get_store()
+    monkeypatch.setattr(store, "append", lambda entries: (_ for _ in ()).throw(OSError("disk full")))
+    assert cache_client.get('/simulate').status_code == 200
+    assert event_log.catch_up() is False
+    
+    assert cache_client.get('/metrics').get_json()["event_log_write_failures"] == 1
+    assert "grid_event_log_write_failures_total 1" in cache_client.get('/metrics/prometheus').get_data(as_text=True)
+
+
+def parse_exposition(text):
+    """Prometheus text format -> ({name: type}, {(name, labels): value}), checking each line's syntax"""
+    types, samples = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+            continue
+        match = re.fullmatch(r'([a-z_]+)(?:\{((?:[a-z_]+="(?:[^"\\]|\\.)*",?)*)\})? (\S+)', line)
+        assert match, f"malformed sample line: {line!r}"
+        name, labels, value = match.groups()
+        samples[(name, tuple(re.findall(r'([a-z_]+)="((?:[^"\\]|\\.)*)"', labels or "")))] = float(value)
+    return types, samples
+
+
+def test_prometheus_exposition(client, monkeypatch):
+    monkeypatch.setattr(app, "pipeline_metrics", app.PipelineMetrics(state_dir=None))
+    assert client.get('/simulate?count=50&seed=3').status_code == 200
+    assert client.get('/simulate').status_code == 200
+    
+    response = client.get('/metrics/prometheus')
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    types, samples = parse_exposition(response.get_data(as_text=True))
+    
+    assert types["grid_stage_duration_seconds"] == "histogram"
+    assert types["grid_events_total"] == "counter"
+    assert types["grid_event_log_queue_depth"] == "gauge"
+    for stage, expected in (("generate_batch", 1), ("PerceptualLayer.process_batch", 1), ("generate_event", 1),
+                            ("DataFusionAgent.process", 1), ("record_events", 2)):
+        label = ("stage", stage)
+        buckets = [samples[("grid_stage_duration_seconds_bucket", (label, ("le", f"{bound:g}")))]
+                   for bound in app.STAGE_BUCKETS]
+        buckets.append(samples[("grid_stage_duration_seconds_bucket", (label, ("le", "+Inf")))])
+        assert buckets == sorted(buckets), f"{stage} buckets are not cumulative"
+        assert buckets[-1] == samples[("grid_stage_duration_seconds_count", (label,))] == expected
+        assert samples[("grid_stage_duration_seconds_sum", (label,))] > 0
+    
+    events = {labels: value for (name, labels), value in samples.items() if name == "grid_events_total"}
+    assert sum(events.values()) == 51
+    assert {dict(labels)["severity"] for labels in events} <= set(app.SEVERITY_LEVELS)
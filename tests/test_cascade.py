@@ -0,0 +1,93 @@
+"""Cascade prediction over CSR-compiled topologies"""
+
+import pytest
+
+import app
+
+
+def predict(topology, anomalies, **options):
+    return app.CascadePredictionLayer.predict({"topology": topology, "anomalies": anomalies, **options})
+
+
+def failed_steps(result):
+    return [(row["component"], row["step"]) for row in result["failed"]]
+
+
+# A overloads B, whose own load then overloads C, and so on down the line
+CHAIN = {
+    "directed": True,
+    "nodes": [{"id": "A", "capacity": 10, "load": 10}, {"id": "B", "capacity": 10, "load": 5},
+              {"id": "C", "capacity": 10, "load": 6}, {"id": "D", "capacity": 10, "load": 6}],
+    "edges": [["A", "B"], ["B", "C"], ["C", "D"]]
+}
+
+
+def test_failures_propagate_wave_by_wave():
+    result = predict(CHAIN, ["A"])
+    assert failed_steps(result) == [("A", 0), ("B", 1), ("C", 2), ("D", 3)]
+    assert result["steps"] == 3 and result["converged"]
+    assert result["load_shed"] == 27.0
+
+
+def test_load_is_split_by_edge_capacity_and_stops_at_headroom():
+    topology = {
+        "directed": True,
+        "nodes": [{"id": "A", "capacity": 10, "load": 8}, {"id": "B", "capacity": 10, "load": 5},
+                  {"id": "C", "capacity": 10, "load": 5}, {"id": "D", "capacity": 10, "load": 9}],
+        "edges": [["A", "B", 1], ["A", "C", 3], ["B", "D"]]
+    }
+    result = predict(topology, ["A"])
+    
+    assert failed_steps(result) == [("A", 0), ("C", 1)]  # C takes 6 of A's 8; B only 2
+    assert result["at_risk"] == [{"component": "D", "utilization": 0.9}]
+    assert {row["component"]: row["utilization"] for row in result["failed"]}["C"] == 1.1
+
+
+def test_cycles_terminate_with_each_node_failing_once():
+    ring = {"nodes": [{"id": node, "capacity": 10, "load": 8} for node in "ABCDE"],
+            "edges": [[a, b] for a, b in zip("ABCDE", "BCDEA")]}
+    result = predict(ring, ["A"])
+    
+    assert sorted(component for component, _ in failed_steps(result)) == list("ABCDE")
+    assert failed_steps(result)[:3] == [("A", 0), ("B", 1), ("E", 1)]
+    assert result["converged"]
+
+
+def test_max_steps_cuts_the_cascade_short():
+    result = predict(CHAIN, ["A"], max_steps=2)
+    assert failed_steps(result) == [("A", 0), ("B", 1), ("C", 2)]
+    assert not result["converged"]
+
+
+def test_unknown_start_nodes_are_reported_not_failed():
+    result = predict(CHAIN, ["Z", "A"])
+    assert result["seeds"] == ["A"] and result["unknown_components"] == ["Z"]
+    
+    result = predict(CHAIN, ["Z"])
+    assert result["seeds"] == [] and result["failed"] == [] and result["unknown_components"] == ["Z"]
+
+
+def test_adding_seeds_continues_from_the_previous_cascade():
+    topology = {**CHAIN, "nodes": CHAIN["nodes"] + [{"id": "E", "capacity": 10, "load": 1}]}
+    first = predict(topology, ["C"])
+    assert not first["incremental"]
+    
+    extended = predict(topology, ["C", "A"])
+    assert extended["incremental"]
+    fresh = app.GridTopology.from_spec(topology)
+    full, incremental = fresh.predict(frozenset(fresh.index[c] for c in "CA"), app.CASCADE_MAX_STEPS, 100)
+    assert not incremental
+    assert {row["component"] for row in extended["failed"]} == {row["component"] for row in full["failed"]}
+    assert extended["load_shed"] == full["load_shed"] and extended["at_risk"] == full["at_risk"]
+
+
+@pytest.mark.parametrize("payload, status", [
+    ({"topology": {"edges": [["A", "A"]]}}, 400),
+    ({"topology": {"edges": [["A", "B", -1]]}}, 400),
+    ({"topology_id": "missing"}, 404),
+    ({"max_steps": 0}, 400),
+])
+def test_invalid_requests(payload, status):
+    with pytest.raises(app.CascadeError) as error:
+        app.CascadePredictionLayer.predict({"anomalies": [], **payload})
+    assert error.value.status == status
@@ -0,0 +1,62 @@
+"""Every available JSON codec writes the same bytes"""
+
+import json
+import math
+import random
+
+import numpy as np
+import pytest
+
+import app
+
+CODECS = [name for name in ("orjson", "msgspec", "json") if app.select_json_codec(name)[0] == name]
+
+
+def edge_floats():
+    rng = random.Random(5)
+    values = [0.0, -0.0, 1.0, 0.1, 230.0, 1e-5, 2.5e-5, -1.5e-5, 9.99e-5, 1e-4, 1e-6, 1.234e-7, 5e-324,
+              1e15, 9.99e15, 1e16, 1.5e16, 1.23e21, 1.7976931348623157e308, -2.5e-300]
+    values += [rng.uniform(-1, 1) * 10 ** rng.randint(-320, 300) for _ in range(2000)]
+    return values
+
+
+@pytest.fixture(scope="module")
+def payloads():
+    event = app.GridEvent("2024-05-01T00:00:00.123456", "Umspannwerk_Süd_東京", 251.37, 49.98, 22.1, "télémétrie")
+    result = app.PerceptualLayer.process_event(event)
+    return [
+        result,
+        app.EventLogger.build_log_entry(result),
+        {"text": "é ü 日本   \x7f \x1f \"quoted\" \\ e-5 NaN", "severity": app.Severity.HIGH},
+        {"floats": edge_floats(), "numpy": [np.float64(1e-7), np.int64(7), np.float32(0.5)]},
+        {"non_finite": [math.nan, math.inf, -math.inf]},
+    ]
+
+
+@pytest.fixture(scope="module")
+def expected(payloads):
+    return [app.select_json_codec(CODECS[0])[1](payload) for payload in payloads]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_codecs_write_identical_bytes(codec, payloads, expected):
+    dumps = app.select_json_codec(codec)[1]
+    for payload, reference in zip(payloads, expected):
+        assert dumps(payload) == reference
+    
+    assert json.loads(expected[3])["floats"] == edge_floats()
+    assert json.loads(expected[4]) == {"non_finite": [None, None, None]}
+    assert "日本".encode() in expected[2]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_responses_and_log_lines_share_the_codec_bytes(codec, payloads, expected, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "json_dumps", app.select_json_codec(codec)[1])
+    
+    with app.app.app_context():
+        assert app.jsonify(payloads[0]).get_data() == expected[0]
+        assert app.jsonify(payloads[3]).get_data() == expected[3]
+    
+    store = app.SegmentedLogStore(str(tmp_path), max_segment_bytes=1 << 20, max_segment_seconds=3600)
+    store.append([payloads[1]])
+    assert store.read_lines() == [expected[1]]
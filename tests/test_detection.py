@@ -0,0 +1,56 @@
+"""The per-event and columnar detection paths give identical results"""
+
+import random
+
+import pytest
+
+import app
+
+# Offsets from the baseline around the voltage (15 V) and latency (50 ms) thresholds,
+# including values that round onto the threshold at the 0.01 resolution of the deviations
+BOUNDARY_OFFSETS = (0.0, 0.004, 0.005, 0.006, 0.0049999, 0.01, -0.005, -0.004)
+
+
+def boundary_events():
+    events = []
+    for sign in (1, -1):
+        for offset in BOUNDARY_OFFSETS:
+            voltage = app.BASELINE_VOLTAGE + sign * (app.VOLTAGE_THRESHOLD + offset)
+            latency = app.BASELINE_LATENCY + app.LATENCY_THRESHOLD + offset
+            events.append(app.GridEvent("2024-04-01T00:00:00", "Transformer_B1", voltage, 50.0, 20.0))
+            events.append(app.GridEvent("2024-04-01T00:00:00", "Transformer_B2", 230.0, 50.0, latency))
+            events.append(app.GridEvent("2024-04-01T00:00:00", "Transformer_B3", voltage, 50.0, latency))
+    
+    rng = random.Random(3)  # Unrounded readings within 0.02 of either threshold
+    for _ in range(2000):
+        voltage = app.BASELINE_VOLTAGE + rng.choice((1, -1)) * (app.VOLTAGE_THRESHOLD + rng.uniform(-0.02, 0.02))
+        latency = app.BASELINE_LATENCY + app.LATENCY_THRESHOLD + rng.uniform(-0.02, 0.02)
+        events.append(app.GridEvent("2024-04-01T00:00:00", "Transformer_B4", voltage, 50.0, latency))
+    return events
+
+
+def fresh_temporal_state():
+    return app.TemporalStateTable(
+        drift_slack=app.TEMPORAL_DRIFT_SLACK, drift_threshold=app.TEMPORAL_DRIFT_THRESHOLD,
+        window=app.PERSISTENCE_WINDOW, min_persistent=app.PERSISTENCE_MIN,
+        min_transitions=app.FLAPPING_MIN_TRANSITIONS, max_components=app.TEMPORAL_MAX_COMPONENTS
+    )
+
+
+@pytest.mark.parametrize("temporal", [False, True])
+def test_per_event_and_columnar_paths_agree(monkeypatch, temporal):
+    monkeypatch.setattr(app, "ADAPTIVE_ENVELOPES", False)
+    monkeypatch.setattr(app, "TEMPORAL_DETECTION", temporal)
+    events = app.SmartGridSimulator.generate_batch(5000, seed=7) + boundary_events()
+    
+    monkeypatch.setattr(app, "temporal_state", fresh_temporal_state())
+    per_event = [app.PerceptualLayer.process_event(event) for event in events]
+    monkeypatch.setattr(app, "temporal_state", fresh_temporal_state())
+    columnar = app.PerceptualLayer.process_batch(events)
+    
+    assert [result.detection for result in columnar] == [result.detection for result in per_event]
+    assert [result.behavioral_metrics for result in columnar] == [result.behavioral_metrics for result in per_event]
+    assert [result.temporal for result in columnar] == [result.temporal for result in per_event]
+    
+    detections = {result.detection.alert_type for result in per_event[-len(boundary_events()):]}
+    assert {"No Anomaly", "Voltage Anomaly", "Latency Anomaly", "Voltage & Latency Anomaly"} <= detections
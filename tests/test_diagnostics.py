@@ -0,0 +1,55 @@
+"""Sampled per-event diagnostics"""
+
+import logging
+
+import pytest
+
+import app
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def diagnostics(monkeypatch):
+    """Route the diagnostics logger, sampling 1 in 1000 events, into a list"""
+    capture = Capture()
+    monkeypatch.setattr(app.diag_logger, "filters", [app.EventSamplingFilter(1000)])
+    monkeypatch.setattr(app.diag_logger, "handlers", [capture])
+    monkeypatch.setattr(app.diag_logger, "propagate", False)
+    monkeypatch.setattr(app.diag_logger, "level", logging.INFO)
+    app.diag_logger.manager._clear_cache()
+    yield capture.records
+    app.diag_logger.manager._clear_cache()
+
+
+def unsampled_event(voltage, seconds):
+    """A reading whose event key the 1-in-1000 hash sample drops"""
+    while True:
+        event = app.GridEvent(f"2024-01-01T00:00:{seconds:02d}.000000", "Transformer_T1", voltage, 50.0, 20.0)
+        if app.zlib.crc32(f"{event.timestamp}|{event.component}".encode()) % 1000:
+            return event
+        seconds += 1
+
+
+def test_every_stage_of_an_anomalous_event_is_kept(diagnostics):
+    event = unsampled_event(300.0, 0)
+    app.PerceptualLayer.process_event(event)
+    
+    messages = [record.getMessage() for record in diagnostics]
+    assert len(messages) >= 3
+    assert messages[0].startswith("Data Fusion")
+    assert messages[1].startswith("Behavioral Envelope")
+    assert messages[2].startswith("Anomaly Detection")
+    assert {record.event_key for record in diagnostics} == {f"{event.timestamp}|{event.component}"}
+
+
+def test_unsampled_normal_event_is_dropped(diagnostics):
+    app.PerceptualLayer.process_event(unsampled_event(230.0, 30))
+    assert diagnostics == []
@@ -0,0 +1,41 @@
+"""Adaptive per-component envelopes"""
+
+import numpy as np
+import pytest
+
+import app
+
+
+def make_store(quantile=0.999):
+    return app.EnvelopeStore(alpha=0.01, min_samples=30, sigma=4.0, quantile=quantile,
+                             min_voltage_threshold=5.0, min_latency_threshold=20.0, max_components=100)
+
+
+def test_envelopes_are_off_by_default():
+    assert app.ADAPTIVE_ENVELOPES is False
+
+
+@pytest.mark.parametrize("batch_size", [1, 500])
+def test_deviation_quantile_tracks_the_readings(batch_size):
+    rng = np.random.default_rng(0)
+    store = make_store(quantile=0.99)
+    voltage, latency = 236.0 + 2.0 * rng.standard_normal(20000), 20.0 + rng.standard_normal(20000)
+    for i in range(0, 20000, batch_size):
+        store.update(["T1"] * batch_size, voltage[i:i + batch_size], latency[i:i + batch_size])
+    
+    envelope = store.snapshot("T1")["T1"]
+    assert envelope["mean_voltage"] == pytest.approx(236.0, abs=0.5)
+    assert envelope["quantile_voltage_deviation"] == pytest.approx(2.0 * 2.576, rel=0.15)
+    assert envelope["quantile_latency_deviation"] == pytest.approx(2.576, rel=0.15)
+
+
+def test_heavy_tails_widen_the_threshold_beyond_sigma():
+    rng = np.random.default_rng(1)
+    store = make_store()
+    voltage = 236.0 + 2.0 * rng.standard_t(2, 20000)
+    for value in voltage:
+        store.update(["T1"], [value], [20.0])
+    
+    envelope = store.snapshot("T1")["T1"]
+    assert envelope["voltage_threshold"] == pytest.approx(envelope["quantile_voltage_deviation"], abs=0.01)
+    assert envelope["voltage_threshold"] > 4.0 * envelope["std_voltage"]
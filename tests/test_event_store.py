@@ -0,0 +1,196 @@
+"""Segmented event log: rotation, legacy adoption and indexed reads"""
+
+import json
+import os
+import time
+
+import app
+
+
+def open_store(directory, **options):
+    options.setdefault("max_segment_bytes", 64 * 1024 * 1024)
+    options.setdefault("max_segment_seconds", 24 * 3600)
+    return app.SegmentedLogStore(str(directory), **options)
+
+
+def test_rotates_by_size(tmp_path, log_entry):
+    store = open_store(tmp_path, max_segment_bytes=1000)
+    for second in range(20):
+        store.append([log_entry(second)])
+    
+    assert len(store.segments()) > 1
+    assert [entry["timestamp"] for entry in store.read()] == [log_entry(second)["timestamp"] for second in range(20)]
+
+
+def test_rotates_by_event_time_across_restarts(tmp_path, log_entry):
+    store = open_store(tmp_path, max_segment_seconds=3600)
+    store.append([log_entry(0)])
+    store.append([log_entry(1800)])
+    assert store.segments() == [0]
+    store.close()
+    
+    # A new process measures the segment's age from its first record, not from when it opened it
+    reopened = open_store(tmp_path, max_segment_seconds=3600)
+    reopened.append([log_entry(3600)])
+    assert reopened.segments() == [0, 1]
+    assert len(reopened.read()) == 3
+
+
+def test_prunes_old_segments(tmp_path, log_entry):
+    store = open_store(tmp_path, max_segment_seconds=10, max_segments=2)
+    for second in range(0, 50, 10):
+        store.append([log_entry(second)])
+    
+    assert len(store.segments()) == 2
+    assert [entry["timestamp"] for entry in store.read()] == [log_entry(30)["timestamp"], log_entry(40)["timestamp"]]
+
+
+def test_adopts_legacy_file(tmp_path, log_entry):
+    legacy = tmp_path / "event_logs.jsonl"
+    legacy.write_text("".join(json.dumps(log_entry(second)) + "\n" for second in range(5)))
+    
+    store = open_store(tmp_path / "segments", legacy_file=str(legacy))
+    
+    assert not legacy.exists()
+    assert store.segments() == [0]
+    assert len(store.read(start=app.parse_timestamp(log_entry(3)["timestamp"]))) == 2
+
+
+def test_concurrent_adoption_is_tolerated(tmp_path, log_entry):
+    legacy = tmp_path / "event_logs.jsonl"
+    legacy.write_text(json.dumps(log_entry(0)) + "\n")
+    first = open_store(tmp_path / "segments", legacy_file=str(legacy))
+    
+    # A second worker that saw the legacy file before the first one moved it
+    second = open_store(tmp_path / "segments")
+    second._adopt_legacy_file(str(legacy))
+    legacy.write_text(json.dumps(log_entry(1)) + "\n")
+    second._adopt_legacy_file(str(legacy))
+    
+    assert first.segments() == [0]
+    assert len(second.read()) == 1
+    assert legacy.exists()  # Segments already existed, so the late file is left alone
+
+
+def test_indexed_reads(tmp_path, log_entry):
+    store = open_store(tmp_path, max_segment_seconds=100)
+    store.append([
+        log_entry(second, component=("Generator_G1", "Substation_S1")[second % 2],
+                  severity=("NORMAL", "CRITICAL")[second % 3 == 0])
+        for second in range(300)
+    ])
+    
+    assert [entry["timestamp"] for entry in store.read(limit=2)] == [log_entry(298)["timestamp"],
+                                                                     log_entry(299)["timestamp"]]
+    assert {entry["component"] for entry in store.read(component="Generator_G1")} == {"Generator_G1"}
+    assert len(store.read(severity="CRITICAL")) == 100
+    
+    start, end = (app.parse_timestamp(log_entry(second)["timestamp"]) for second in (100, 149))
+    window = store.read(start=start, end=end)
+    assert len(window) == 50
+    assert window[0]["timestamp"] == log_entry(100)["timestamp"]
+    assert len(store.read(start=start, end=end, component="Substation_S1", severity="CRITICAL")) == 8
+
+
+def test_crash_truncated_index_record_is_dropped(tmp_path, log_entry):
+    store = open_store(tmp_path)
+    store.append([log_entry(0), log_entry(1)])
+    store.close()
+    with open(os.path.join(tmp_path, "segment-000000.idx"), "ab") as f:
+        f.write(b"\0" * 5)
+    
+    reopened = open_store(tmp_path)
+    reopened.append([log_entry(2)])
+    assert len(reopened.read()) == 3
+
+
+def test_async_writer_flush_is_bounded_and_close_safe(tmp_path, log_entry):
+    store = open_store(tmp_path)
+    writer = app.AsyncLogWriter(store, flush_interval=5.0)
+    assert writer.flush(timeout=0.01) is True  # Nothing queued: no wait
+    
+    writer.submit([log_entry(0)])
+    assert writer.pending()
+    assert writer.flush(timeout=2.0) is True
+    assert len(store.read()) == 1
+    
+    writer.submit([log_entry(1)])
+    writer.close()
+    assert writer.flush() is True  # Never blocks after close
+    assert len(store.read()) == 2
+
+
+def test_interval_fsync_runs_once_the_writer_goes_idle(tmp_path, log_entry, monkeypatch):
+    store = open_store(tmp_path)
+    syncs = []
+    monkeypatch.setattr(store, "sync", lambda: syncs.append(time.monotonic()))
+    writer = app.AsyncLogWriter(store, flush_interval=0.0, fsync_policy="interval", fsync_interval=0.5)
+    try:
+        writer.submit([log_entry(0)])  # Inside the interval since the writer started: not synced yet
+        assert writer.flush(timeout=2.0)
+        assert syncs == []
+        
+        deadline = time.monotonic() + 2.0
+        while not syncs and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(syncs) == 1  # The last batch before idle is synced without another write
+        time.sleep(0.6)
+        assert len(syncs) == 1  # Nothing new: no further syncs
+    finally:
+        writer.close()
+
+
+def test_failed_append_is_counted_and_reported_to_flush(tmp_path, log_entry, monkeypatch):
+    store = open_store(tmp_path)
+    append = store.append
+    failing = [True]
+    
+    def flaky_append(entries):
+        if failing[0]:
+            raise OSError("No space left on device")
+        append(entries)
+    
+    monkeypatch.setattr(store, "append", flaky_append)
+    writer = app.AsyncLogWriter(store, flush_interval=5.0)
+    try:
+        writer.submit([log_entry(0), log_entry(1)])
+        assert writer.flush(timeout=2.0) is False
+        assert writer.failed_entries == 2 and not writer.pending()
+        
+        failing[0] = False
+        writer.submit([log_entry(2)])
+        assert writer.flush(timeout=2.0) is True
+        assert writer.failed_entries == 2
+        assert len(store.read()) == 1
+    finally:
+        writer.close()
+
+
+def test_sqlite_pages_through_equal_timestamps(tmp_path, log_entry, monkeypatch):
+    monkeypatch.setattr(app.SQLiteEventStore, "READ_CHUNK", 7)
+    store = app.SQLiteEventStore(str(tmp_path))
+    store.append([dict(log_entry(second // 10), voltage=float(second)) for second in range(100)])
+    
+    chunks = list(store.iter_record_chunks())
+    assert max(len(chunk) for chunk in chunks) == 7
+    assert [entry["voltage"] for chunk in chunks for entry in chunk] == [float(second) for second in range(100)]
+    assert [entry["voltage"] for entry in store.read(limit=3)] == [97.0, 98.0, 99.0]
+    store.close()
+
+
+def test_segment_logs_import_into_sqlite(tmp_path, log_entry):
+    import import_logs
+    
+    segments = open_store(tmp_path / "event_logs", max_segment_seconds=10)
+    segments.append([log_entry(second) for second in range(30)])
+    segments.close()
+    with open(tmp_path / "event_logs.jsonl", "w") as f:
+        f.write(json.dumps(log_entry(-1)) + "\n" + "not json\n")
+    
+    store = app.SQLiteEventStore(str(tmp_path / "event_store"))
+    imported, skipped = import_logs.import_logs([str(tmp_path / "event_logs.jsonl"), str(tmp_path / "event_logs")],
+                                                store)
+    
+    assert (imported, skipped) == (31, 1)
+    assert [entry["timestamp"] for entry in store.read()] == [log_entry(second)["timestamp"] for second in range(-1, 30)]
+    store.close()
@@ -0,0 +1,73 @@
+"""Alert coalescing into incidents"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+
+
+def result(seconds, code=2, component="Transformer_T1"):
+    timestamp = (datetime(2024, 1, 1) + timedelta(seconds=seconds)).isoformat()
+    return app.ProcessedEvent(app.GridEvent(timestamp, component, 230.0, 50.0, 20.0), None, app.DETECTIONS[code])
+
+
+@pytest.fixture
+def make_tracker(tmp_path):
+    def make(mode="events", window=60.0, max_open=100, log_path=str(tmp_path / "incidents.jsonl")):
+        return app.IncidentTracker(mode=mode, window=window, raw_events=False, max_open=max_open,
+                                   history=100, log_path=log_path)
+    return make
+
+
+def persisted(tmp_path):
+    path = tmp_path / "incidents.jsonl"
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_alerts_within_the_window_join_one_incident(make_tracker):
+    tracker = make_tracker()
+    tracker.coalesce([result(0), result(30), result(80), result(10, component="Substation_S1")])
+    
+    incidents = {incident["component"]: incident for incident in tracker.snapshot()["incidents"]}
+    assert incidents["Transformer_T1"]["count"] == 3
+    assert incidents["Transformer_T1"]["last_seen"] == "2024-01-01T00:01:20"
+    assert incidents["Substation_S1"]["count"] == 1
+    assert tracker.snapshot()["coalesced_alerts"] == 2
+
+
+def test_a_gap_closes_the_incident_and_opens_a_new_one(make_tracker, tmp_path):
+    tracker = make_tracker()
+    tracker.coalesce([result(0), result(200)])
+    
+    snapshot = tracker.snapshot()
+    assert [incident["status"] for incident in snapshot["incidents"]] == ["open", "closed"]
+    assert [incident["first_seen"] for incident in persisted(tmp_path)] == ["2024-01-01T00:00:00"]
+
+
+def test_normal_traffic_closes_idle_incidents(make_tracker, tmp_path):
+    tracker = make_tracker()
+    tracker.coalesce([result(0)])
+    tracker.coalesce([result(second, code=0) for second in range(1, 200, 10)])
+    
+    assert tracker.snapshot(status="open")["incidents"] == []
+    assert [incident["status"] for incident in persisted(tmp_path)] == ["closed"]
+
+
+def test_closed_incidents_are_persisted_once(make_tracker, tmp_path):
+    tracker = make_tracker(max_open=1)
+    tracker.coalesce([result(0), result(1, component="Substation_S1")])  # Evicts the stalest open incident
+    tracker.snapshot()
+    tracker.snapshot()
+    
+    assert [incident["component"] for incident in persisted(tmp_path)] == ["Transformer_T1"]
+
+
+def test_incidents_mode_publishes_only_opening_alerts(make_tracker):
+    tracker = make_tracker(mode="incidents")
+    results = [result(0), result(5), result(7, code=0), result(10, code=1)]
+    logged, published = tracker.coalesce(results)
+    
+    assert published == [results[0], results[2], results[3]]
+    assert logged == published
@@ -0,0 +1,29 @@
+"""Shared metrics/history backends"""
+
+import pytest
+
+import app
+
+
+@pytest.fixture(params=["local", "mmap", "sqlite"])
+def backend(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "METRICS_STATE_DIR", str(tmp_path / "grid_state"))
+    return app.create_metrics_backend(request.param)
+
+
+def test_backend_records_counters_and_history(backend):
+    backend.record(3, 1, [b'{"n":1}', b'{"n":2}', b'{"n":3}'])
+    
+    assert backend.snapshot() == {"total_events": 3, "total_anomalies": 1, "detection_rate": 33.33}
+    assert backend.history(2) == [{"n": 2}, {"n": 3}]
+    assert backend.sequence() == 3
+    assert backend.history_size() == 3
+
+
+def test_incomplete_backend_fails_at_construction():
+    class Partial(app.MetricsBackend):
+        def record(self, event_count, anomaly_count, payloads=()):
+            pass
+    
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,53 @@
+"""Event records: dict inputs and the JSON wire shape"""
+
+import json
+
+import pytest
+
+import app
+
+
+def reading(component, voltage=231.0, **fields):
+    return {"timestamp": "2024-01-01T00:00:00", "component": component, "voltage": voltage,
+            "frequency": 50.0, "network_latency": 20.0, **fields}
+
+
+@pytest.mark.parametrize("voltage", [231.0, 300.0])
+def test_dict_and_record_events_give_the_same_result(voltage):
+    from_record = app.PerceptualLayer.process_event(app.GridEvent(**reading("Transformer_R1", voltage)))
+    from_dict = app.PerceptualLayer.process_event(reading("Transformer_R2", voltage))
+    
+    assert isinstance(from_dict.event, app.GridEvent)
+    assert from_dict.detection == from_record.detection
+    assert from_dict.behavioral_metrics == from_record.behavioral_metrics
+
+
+def test_batch_accepts_records_and_dicts_together():
+    events = [app.GridEvent(**reading("Transformer_R3")), reading("Transformer_R4", 300.0, event_type="attack")]
+    results = app.PerceptualLayer.process_batch(events)
+    
+    assert [type(result.event) for result in results] == [app.GridEvent, app.GridEvent]
+    assert results[1].event.event_type == "attack"
+    assert results[1].detection.is_anomaly and not results[0].detection.is_anomaly
+
+
+@pytest.mark.parametrize("event, message", [
+    ({"component": "Transformer_R5", "voltage": 231.0}, "missing"),
+    ([231.0, 50.0, 20.0], "Expected a GridEvent or dict"),
+])
+def test_unusable_events_raise_type_error(event, message):
+    with pytest.raises(TypeError, match=message):
+        app.PerceptualLayer.process_event(event)
+
+
+def test_to_dict_is_the_wire_shape():
+    result = app.PerceptualLayer.process_event(reading("Transformer_R6", 300.0))
+    wire = result.to_dict()
+    
+    assert list(wire) == ["event", "behavioral_metrics", "detection", "temporal", "ml"]
+    assert wire["event"] == {**reading("Transformer_R6", 300.0), "event_type": "telemetry"}
+    assert wire["detection"] == {"is_anomaly": True, "severity": "HIGH", "alert_type": "Voltage Anomaly",
+                                 "voltage_anomaly": True, "latency_anomaly": False}
+    assert set(wire["behavioral_metrics"]) == {"voltage_deviation", "latency_deviation", "frequency",
+                                               "voltage_threshold", "latency_threshold"}
+    assert json.loads(app.json_dumps(result)) == json.loads(json.dumps(wire))
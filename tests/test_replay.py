@@ -0,0 +1,53 @@
+"""Re-scoring logged events with replay_logs.py"""
+
+import random
+
+import pytest
+
+import app
+import replay_logs
+
+
+@pytest.fixture
+def fresh_temporal_state(monkeypatch):
+    """Start stateful detection from scratch, as a new worker (and a replay) does"""
+    monkeypatch.setattr(app, "temporal_state", app.TemporalStateTable(
+        drift_slack=app.TEMPORAL_DRIFT_SLACK, drift_threshold=app.TEMPORAL_DRIFT_THRESHOLD,
+        window=app.PERSISTENCE_WINDOW, min_persistent=app.PERSISTENCE_MIN,
+        min_transitions=app.FLAPPING_MIN_TRANSITIONS, max_components=app.TEMPORAL_MAX_COMPONENTS
+    ))
+
+
+def test_unchanged_simulated_log_replays_without_changes(event_log, fresh_temporal_state, tmp_path):
+    client = app.app.test_client()
+    assert client.get('/simulate?count=2000&seed=1').status_code == 200
+    event_log.catch_up()
+    
+    report = replay_logs.replay(event_log.LOG_DIR, diff_output=str(tmp_path / "diff.jsonl"), workers=2,
+                                chunk_size=300)
+    assert report["events"] == 2000
+    assert report["original_severity"]["HIGH"] > 0
+    assert report["changed"] == 0
+    assert (tmp_path / "diff.jsonl").read_text() == ""
+
+
+def test_drift_state_carries_across_chunks(event_log, fresh_temporal_state):
+    rng = random.Random(0)
+    readings = [{"timestamp": f"2024-01-02T00:{i // 60:02d}:{i % 60:02d}", "component": f"Transformer_R{i % 3}",
+                 "voltage": 230.0 + 14.0 * i / 1200 + rng.uniform(-5, 5), "frequency": 50.0,
+                 "network_latency": 20.0} for i in range(1200)]
+    response = app.app.test_client().post('/ingest', json=readings).get_json()
+    assert any(result["detection"]["alert_type"] == "Voltage Drift" for result in response["results"])
+    event_log.catch_up()
+    
+    report = replay_logs.replay(event_log.LOG_DIR, workers=2, chunk_size=100)
+    assert report["events"] == 1200
+    assert report["changed"] == 0
+
+
+def test_lowered_threshold_is_reported(event_log, fresh_temporal_state):
+    assert app.app.test_client().get('/simulate?count=500&seed=2').status_code == 200
+    event_log.catch_up()
+    
+    report = replay_logs.replay(event_log.LOG_DIR, workers=2, voltage_threshold=1.0)
+    assert report["newly_flagged"] > 0 and report["cleared"] == 0
@@ -0,0 +1,62 @@
+"""Learned scoring configuration and micro-batching"""
+
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+import app
+
+from conftest import REPO_DIR
+
+
+class SumScorer(app.AnomalyScorer):
+    kind = "sum"
+    
+    def score(self, features):
+        return np.asarray(features, dtype=np.float64).sum(axis=1)
+
+
+@pytest.mark.parametrize("value, expected", [(None, "None"), ("", "None"), ("0", "0.0"), ("2.5", "2.5")])
+def test_score_threshold_zero_is_kept(tmp_path, value, expected):
+    env = {**os.environ, "PYTHONPATH": REPO_DIR}
+    env.pop("ML_SCORE_THRESHOLD", None)
+    if value is not None:
+        env["ML_SCORE_THRESHOLD"] = value
+    output = subprocess.run([sys.executable, "-c", "import app; print(app.ML_SCORE_THRESHOLD)"],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == expected
+
+
+def test_concurrent_readings_share_batches():
+    batcher = app.MicroBatcher(SumScorer({}), max_batch=256, max_wait=app.ML_BATCH_WAIT)
+    scores = {}
+    
+    def client(index):
+        scores[index] = [batcher.score([index, i, 0.0]) for i in range(20)]
+    
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert all(scores[index] == [float(index + i) for i in range(20)] for index in range(8))
+    stats = batcher.stats()
+    assert stats["scored"] == 160
+    assert stats["mean_batch_size"] > 2
+
+
+def test_full_batch_is_scored_without_waiting_out_the_timeout():
+    batcher = app.MicroBatcher(SumScorer({}), max_batch=4, max_wait=5.0)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(batcher.score([i, 0.0, 0.0]))) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=2.0)
+    
+    assert sorted(results) == [0.0, 1.0, 2.0, 3.0]
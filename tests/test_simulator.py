@@ -0,0 +1,28 @@
+"""Vectorized event generation"""
+
+from datetime import datetime, timedelta, timezone
+
+import app
+
+
+def test_batch_timestamps_are_spread_and_end_now():
+    before = datetime.now(timezone.utc).replace(tzinfo=None)
+    events = app.SmartGridSimulator.generate_batch(500, seed=1)
+    
+    timestamps = [datetime.fromisoformat(event.timestamp) for event in events]
+    assert len(set(timestamps)) == 500
+    assert timestamps == sorted(timestamps)
+    assert timestamps[1] - timestamps[0] == timedelta(seconds=app.SmartGridSimulator.BATCH_INTERVAL)
+    assert before - timedelta(seconds=1) <= timestamps[-1] <= datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_aware_start_is_converted_to_utc():
+    start = datetime(2024, 1, 1, 2, 0, tzinfo=timezone(timedelta(hours=2)))
+    events = app.SmartGridSimulator.generate_batch(2, seed=1, start=start, interval=1.0)
+    
+    assert [event.timestamp for event in events] == ["2024-01-01T00:00:00.000000", "2024-01-01T00:00:01.000000"]
+
+
+def test_same_seed_same_readings():
+    first, second = (app.SmartGridSimulator.generate_columns(100, seed=7) for _ in range(2))
+    assert first["voltage"].tolist() == second["voltage"].tolist()
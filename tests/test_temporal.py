@@ -0,0 +1,97 @@
+"""Stateful per-component detection: drift, frequency, persistence and flapping"""
+
+import random
+
+import pytest
+
+import app
+
+
+def make_table(**options):
+    options = {"drift_slack": 5.0, "drift_threshold": 50.0, "window": 10, "min_persistent": 3,
+               "min_transitions": 4, "max_components": 100, **options}
+    return app.TemporalStateTable(**options)
+
+
+def ramp(count, rise, seed=0):
+    """Voltage offsets rising linearly by `rise` volts over `count` readings, with ±5 V noise"""
+    rng = random.Random(seed)
+    return [rise * i / count + rng.uniform(-5, 5) for i in range(count)]
+
+
+def readings(component, voltages, frequency=50.0, start=0):
+    return [app.GridEvent(f"2024-01-01T{(start + i) // 3600:02d}:{(start + i) // 60 % 60:02d}:{(start + i) % 60:02d}",
+                          component, voltage, frequency, 20.0)
+            for i, voltage in enumerate(voltages)]
+
+
+def test_slow_ramp_is_flagged_as_drift():
+    offsets = ramp(1200, 14.0)
+    results = make_table().update(["T1"] * 1200, offsets, [50.0] * 1200, [0] * 1200)
+    
+    flagged = [i for i, result in enumerate(results) if result.drift_anomaly]
+    assert flagged and flagged[0] < 700
+    assert all(result.drift_anomaly for result in results[900:])
+
+
+@pytest.mark.parametrize("offset", [0.0, -3.0, 4.5])
+def test_noise_inside_the_slack_never_drifts(offset):
+    rng = random.Random(1)
+    offsets = [offset + rng.uniform(-0.5, 0.5) for _ in range(5000)]
+    results = make_table().update(["T1"] * 5000, offsets, [50.0] * 5000, [0] * 5000)
+    assert not any(result.drift_anomaly for result in results)
+
+
+def test_drift_clears_once_the_voltage_returns():
+    table = make_table()
+    table.update(["T1"] * 100, [-20.0] * 100, [50.0] * 100, [0] * 100)
+    results = table.update(["T1"] * 20, [0.0] * 20, [50.0] * 20, [0] * 20)
+    assert results[0].drift_anomaly and not results[-1].drift_anomaly
+
+
+def test_threshold_anomalies_do_not_feed_the_drift_sums():
+    results = make_table().update(["T1"] * 50, [40.0] * 50, [50.0] * 50, [2] * 50)
+    assert not any(result.drift_anomaly for result in results)
+
+
+def test_ramp_raises_drift_detections_through_the_pipeline():
+    events = readings("Ramp_R1", [app.BASELINE_VOLTAGE + offset for offset in ramp(1200, 14.0)])
+    results = app.PerceptualLayer.process_batch(events)
+    
+    drift = [result for result in results if result.detection.alert_type == "Voltage Drift"]
+    assert len(drift) > 100
+    assert all(result.detection.is_anomaly and result.detection.severity == "HIGH" for result in drift)
+
+
+def test_frequency_deviation_is_an_anomaly(event_log):
+    client = app.app.test_client()
+    before = client.get('/metrics').get_json()["total_anomalies"]
+    body = [{"timestamp": event.timestamp, "component": event.component, "voltage": event.voltage,
+             "frequency": event.frequency, "network_latency": event.network_latency}
+            for event in readings("Generator_F1", [230.0] * 50, frequency=51.5)]
+    
+    response = client.post('/ingest', json=body).get_json()
+    assert response["anomalies"] == 50
+    assert {result["detection"]["alert_type"] for result in response["results"]} == {"Frequency Anomaly"}
+    assert client.get('/metrics').get_json()["total_anomalies"] == before + 50
+    assert client.get('/incidents?component=Generator_F1').get_json()["incidents"][0]["count"] == 50
+
+
+def test_persistence_and_flapping_flags():
+    codes = [0, 3, 0, 0, 3, 3, 3, 0, 3, 0, 3]
+    results = make_table().update(["T1"] * len(codes), [0.0] * len(codes), [50.0] * len(codes), codes)
+    
+    assert [result.persistent for result in results] == [False, False, False, False, False,
+                                                         True, True, False, True, False, True]
+    assert [result.recent_anomalies for result in results][-1] == 6
+    assert results[-1].flapping and not results[4].flapping
+
+
+def test_persistent_alerts_only_suppresses_lone_anomalies(monkeypatch):
+    monkeypatch.setattr(app, "PERSISTENT_ALERTS_ONLY", True)
+    voltages = [230.0, 300.0] + [230.0] * 10 + [300.0] * 3
+    results = [app.PerceptualLayer.process_event(event) for event in readings("Transformer_P1", voltages)]
+    
+    assert [result.detection.is_anomaly for result in results] == [False] * 14 + [True]
+    assert results[1].temporal.recent_anomalies == 1
+    assert results[-1].detection.alert_type == "Voltage Anomaly"
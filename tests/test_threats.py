@@ -0,0 +1,148 @@
+"""Multi-step attack pattern matching over detection streams"""
+
+import random
+
+import pytest
+
+import app
+
+LATENCY, VOLTAGE, CRITICAL = 1, 2, 3  # Severity codes
+NEIGHBOURS = app.topology_cache.get(app.TopologyCache.DEFAULT_ID).neighbours()
+
+
+def anomaly(seconds, component, code):
+    return (1704067200.0 + seconds, f"t+{seconds}", component, code)
+
+
+def two_step(relation, window=60):
+    return {"pattern": {"window_seconds": window, "steps": [
+        {"kind": "latency"}, {"kind": "voltage", "relation": relation}
+    ]}}
+
+
+def matches(patterns, anomalies):
+    matcher = app.ThreatMatcher(patterns, NEIGHBOURS, history=None)
+    return [(threat["pattern"], threat["components"]) for threat in matcher.observe(anomalies)]
+
+
+@pytest.mark.parametrize("gap, expected", [(30, 1), (60, 1), (61, 0)])
+def test_steps_must_fall_within_the_window(gap, expected):
+    found = matches(app.ATTACK_PATTERNS, [anomaly(0, "Substation_S1", LATENCY),
+                                          anomaly(gap, "Transformer_T1", VOLTAGE)])
+    assert found == [("recon_then_injection", ["Substation_S1", "Transformer_T1"])] * expected
+
+
+@pytest.mark.parametrize("relation, second, expected", [
+    ("same", "Substation_S1", True),
+    ("same", "Substation_S2", False),
+    ("adjacent", "Transformer_T1", True),
+    ("adjacent", "Substation_S2", True),
+    ("adjacent", "Distribution_Line_D1", False),
+    ("adjacent", "Substation_S1", False),
+    ("other", "Distribution_Line_D2", True),
+    ("other", "Substation_S1", False),
+    ("any", "Substation_S1", True),
+])
+def test_step_relations(relation, second, expected):
+    found = matches(two_step(relation), [anomaly(0, "Substation_S1", LATENCY), anomaly(5, second, VOLTAGE)])
+    assert bool(found) == expected
+
+
+def test_kinds_and_minimum_severity_filter_steps():
+    anomalies = [anomaly(0, "Generator_G1", LATENCY), anomaly(1, "Generator_G1", LATENCY),
+                 anomaly(2, "Generator_G1", VOLTAGE), anomaly(3, "Generator_G1", CRITICAL)]
+    found = matches({"escalation": app.ATTACK_PATTERNS["comms_degradation_escalation"]}, anomalies)
+    assert found == [("escalation", ["Generator_G1"])]
+    assert matches({"escalation": app.ATTACK_PATTERNS["comms_degradation_escalation"]}, anomalies[:3]) == []
+
+
+def test_a_repeat_within_the_window_is_reported_once():
+    anomalies = [anomaly(0, "Substation_S1", LATENCY), anomaly(1, "Transformer_T1", VOLTAGE),
+                 anomaly(2, "Substation_S1", LATENCY), anomaly(3, "Transformer_T1", VOLTAGE),
+                 anomaly(100, "Substation_S1", LATENCY), anomaly(101, "Transformer_T1", VOLTAGE)]
+    assert len(matches({"recon": app.ATTACK_PATTERNS["recon_then_injection"]}, anomalies)) == 2
+
+
+@pytest.mark.parametrize("spec, message", [
+    ("not a pattern", "must be an object"),
+    ({"window_seconds": 10, "steps": [{"kind": "any"}]}, "at least two step objects"),
+    ({"window_seconds": 0, "steps": [{}, {}]}, "positive window_seconds"),
+    ({"window_seconds": True, "steps": [{}, {}]}, "positive window_seconds"),
+    ({"window_seconds": 10, "severity": "NORMAL", "steps": [{}, {}]}, "unknown severity"),
+    ({"window_seconds": 10, "steps": [{}, {"kind": "frequency"}]}, "step 1: kind must be one of"),
+    ({"window_seconds": 10, "steps": [{"min_severity": "LOW"}, {}]}, "step 0: unknown min_severity"),
+    ({"window_seconds": 10, "steps": [{}, {"relation": "upstream"}]}, "step 1: relation must be one of"),
+])
+def test_invalid_patterns_are_rejected(spec, message):
+    with pytest.raises(app.ThreatModelError, match=message):
+        app.ThreatMatcher({"bad": spec}, NEIGHBOURS)
+
+
+def test_analyze_runs_submitted_detections_in_time_order():
+    events = [
+        {"timestamp": "2024-01-01T00:00:30", "component": "Transformer_T1", "severity": "HIGH"},
+        {"timestamp": "2024-01-01T00:00:00", "component": "Substation_S1", "severity": "MEDIUM"},
+        {"timestamp": "2024-01-01T00:00:10", "component": "Generator_G1", "severity": "NORMAL"},
+        {"timestamp": "yesterday", "component": "Generator_G1", "severity": "HIGH"},
+    ]
+    result = app.ThreatModelingLayer.analyze({"events": events})
+    assert (result["analyzed_events"], result["anomalies"], result["skipped"]) == (4, 2, 1)
+    assert result["by_pattern"] == {"recon_then_injection": 1}
+    
+    with pytest.raises(app.ThreatModelError, match="patterns must be"):
+        app.ThreatModelingLayer.analyze({"events": events, "patterns": []})
+
+
+def naive_matches(patterns, anomalies):
+    """Reference matcher: scan every waiting partial match for every anomaly, without the indexes"""
+    patterns = [app.AttackPattern.compile(name, spec) for name, spec in patterns.items()]
+    waiting = {}  # (pattern, step, component of its last step) -> (start, last, chain)
+    reported, found = {}, []
+    
+    for current in anomalies:
+        ts, _, component, code = current
+        for p, pattern in enumerate(patterns):
+            for s in reversed(range(len(pattern.steps))):
+                if code not in pattern.codes[s]:
+                    continue
+                if s == 0:
+                    candidate = (ts, ts, (current,))
+                else:
+                    relation = pattern.relations[s]
+                    usable = [
+                        partial for (wp, ws, last), partial in waiting.items()
+                        if wp == p and ws == s and ts >= partial[1] and ts - partial[0] <= pattern.window
+                        and (relation != "same" or last == component)
+                        and (relation != "adjacent" or component in NEIGHBOURS.get(last, ()))
+                        and (relation not in ("adjacent", "other") or all(step[2] != component for step in partial[2]))
+                    ]
+                    if not usable:
+                        continue
+                    best = max(usable, key=lambda partial: partial[0])
+                    candidate = (best[0], ts, best[2] + (current,))
+                
+                if s + 1 < len(pattern.steps):
+                    key = (p, s + 1, component)
+                    if key not in waiting or waiting[key][0] <= candidate[0]:
+                        waiting[key] = candidate
+                    continue
+                components = list(dict.fromkeys(step[2] for step in candidate[2]))
+                last_report = reported.get((p, tuple(components)))
+                if last_report is None or ts - last_report > pattern.window:
+                    reported[(p, tuple(components))] = ts
+                    found.append((pattern.name, components))
+    return found
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_index_matches_a_naive_scan(seed):
+    rng = random.Random(seed)
+    components = sorted(NEIGHBOURS)
+    seconds, anomalies = 0.0, []
+    for _ in range(3000):
+        seconds += rng.choice((0.5, 1.0, 3.0, 20.0))  # Distinct times: ties between partials are unordered
+        anomalies.append(anomaly(seconds, rng.choice(components), rng.choice((LATENCY, VOLTAGE, CRITICAL))))
+    
+    expected = naive_matches(app.ATTACK_PATTERNS, anomalies)
+    assert len({name for name, _ in expected}) == len(app.ATTACK_PATTERNS)
+    assert sorted(matches(app.ATTACK_PATTERNS, anomalies)) == sorted(expected)
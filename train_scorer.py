@@ -0,0 +1,130 @@
+"""
+Train the Learned Anomaly Scorer from Event Logs
+Fits an Isolation Forest or autoencoder on logged readings, calibrates its
+score threshold and writes the model file the API loads on first use.
+
+Usage:
+    python train_scorer.py                                   # configured event store -> anomaly_model.npz (autoencoder)
+    python train_scorer.py event_logs.jsonl --kind isolation_forest --trees 200
+    python train_scorer.py event_logs/ --quantile 0.999 --output models/grid.npz
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+import app
+from replay_logs import iter_chunks
+
+DEFAULT_MAX_SAMPLES = 200000  # Training rows kept (uniform reservoir sample)
+DEFAULT_QUANTILE = 0.995  # Training-score quantile used as the threshold
+
+
+def load_features(source=None, include_anomalies=False, max_samples=DEFAULT_MAX_SAMPLES, seed=None):
+    """Read training rows (SCORER_FEATURES) from a log file, segment directory or the event store
+
+    Rows the threshold rules flagged are left out unless `include_anomalies`.
+    Returns the feature array, the logged severity of each row and the
+    number of skipped lines.
+    """
+    rng = np.random.default_rng(seed)
+    features, severities, seen, skipped = [], [], 0, 0
+    for lines in iter_chunks(source, 20000):
+        for line in lines:
+            try:
+                entry = app.json_loads(line)
+                row = tuple(float(entry.get(name, app.BASELINE_FREQUENCY if name == "frequency" else None))
+                            for name in app.SCORER_FEATURES)
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            if entry.get("is_anomaly") and not include_anomalies:
+                continue
+
+            # Reservoir sampling keeps a uniform sample of any log size
+            seen += 1
+            if len(features) < max_samples:
+                features.append(row)
+                severities.append(entry.get("severity", "UNKNOWN"))
+            else:
+                slot = rng.integers(seen)
+                if slot < max_samples:
+                    features[slot] = row
+                    severities[slot] = entry.get("severity", "UNKNOWN")
+    return np.array(features, dtype=np.float64).reshape(-1, len(app.SCORER_FEATURES)), severities, skipped
+
+
+def evaluate(scorer, source=None, limit=DEFAULT_MAX_SAMPLES):
+    """Compare the model's verdicts with the logged threshold-rule severities"""
+    features, severities, _ = load_features(source, include_anomalies=True, max_samples=limit, seed=1)
+    flagged = (scorer.score(features) > scorer.threshold).tolist() if len(features) else []
+    totals, hits = Counter(severities), Counter(severity for severity, hit in zip(severities, flagged) if hit)
+    return {severity: round(hits[severity] / count, 4) for severity, count in sorted(totals.items())}
+
+
+def train(source=None, kind="autoencoder", quantile=DEFAULT_QUANTILE, include_anomalies=False,
+          max_samples=DEFAULT_MAX_SAMPLES, seed=None, **params):
+    """Fit and calibrate a scorer; returns (scorer, report)"""
+    if kind not in app.SCORERS:
+        raise ValueError(f"kind must be one of {sorted(app.SCORERS)}")
+
+    started = time.perf_counter()
+    features, _, skipped = load_features(source, include_anomalies, max_samples, seed)
+    if len(features) < 2:
+        raise ValueError("Not enough logged readings to train on")
+    loaded = time.perf_counter()
+
+    scorer = app.SCORERS[kind].fit(features, seed=seed, **params)
+    scorer.calibrate(features, quantile)
+    trained = time.perf_counter()
+
+    return scorer, {
+        "source": source or f"event store ({app.EVENT_STORE})",
+        "training_rows": len(features),
+        "skipped_lines": skipped,
+        "include_anomalies": include_anomalies,
+        "quantile": quantile,
+        **scorer.describe(),
+        "load_seconds": round(loaded - started, 3),
+        "train_seconds": round(trained - loaded, 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the learned anomaly scorer from event logs")
+    parser.add_argument('source', nargs='?', help="Log file or segment directory (default: configured event store)")
+    parser.add_argument('--kind', default="autoencoder", choices=sorted(app.SCORERS), help="Model type")
+    parser.add_argument('--output', default=app.ML_MODEL_PATH, help=f"Model file (default: {app.ML_MODEL_PATH})")
+    parser.add_argument('--quantile', type=float, default=DEFAULT_QUANTILE,
+                        help="Training-score quantile used as the anomaly threshold")
+    parser.add_argument('--include-anomalies', action='store_true',
+                        help="Also train on readings the threshold rules flagged")
+    parser.add_argument('--max-samples', type=int, default=DEFAULT_MAX_SAMPLES, help="Training rows kept")
+    parser.add_argument('--trees', type=int, help="Isolation Forest: number of trees (default 100)")
+    parser.add_argument('--sample-size', type=int, help="Isolation Forest: rows per tree (default 256)")
+    parser.add_argument('--epochs', type=int, help="Autoencoder: training epochs (default 20)")
+    parser.add_argument('--seed', type=int, help="Random seed for a reproducible model")
+    parser.add_argument('--no-evaluate', action='store_true', help="Skip comparing verdicts with the logged severities")
+    args = parser.parse_args(argv)
+
+    params = {name: value for name, value in (("trees", args.trees), ("sample_size", args.sample_size),
+                                              ("epochs", args.epochs)) if value is not None}
+    try:
+        scorer, report = train(args.source, args.kind, args.quantile, args.include_anomalies,
+                               args.max_samples, args.seed, **params)
+    except (ValueError, TypeError, FileNotFoundError) as e:
+        sys.exit(f"Training failed: {e}")
+
+    scorer.save(args.output)
+    report["output"] = args.output
+    if not args.no_evaluate:
+        report["flagged_by_logged_severity"] = evaluate(scorer, args.source)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()